@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+fastapi-crud under concurrent load with the sync database path (psycopg2
+sessions in the threadpool) versus DB_ASYNC=true (AsyncSession over asyncpg).
+
+Starts one uvicorn worker per mode against the database configured by the
+DB_* variables (migrations applied), creates a throwaway user with some
+transactions, and drives an authenticated endpoint at each concurrency level.
+The auth cache is disabled by default so every request does the user lookup:
+    python3 benchmarks/bench_async_db.py -c 50,100,250,500 -s 10 [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import run_load
+from service import drop_user, seed_user, start_server, stop_server
+
+from app.auth import create_access_token
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", default="50,100,250,500", help="Comma-separated client counts")
+    parser.add_argument("-s", "--seconds", type=float, default=10.0)
+    parser.add_argument("--path", default="/api/transactions/list?limit=20")
+    parser.add_argument("--transactions", type=int, default=1000, help="Transactions for the bench user")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--auth-cache", action="store_true", help="Leave the token cache enabled")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    user_id, email = seed_user(args.transactions)
+    token = create_access_token({"sub": email}, timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    results = {}
+    try:
+        for mode, db_async in (("sync", False), ("async", True)):
+            server = start_server(args.port, DB_ASYNC=db_async, AUTH_CACHE_ENABLED=args.auth_cache)
+            try:
+                url = f"http://127.0.0.1:{args.port}{args.path}"
+                results[mode] = [asyncio.run(run_load(url, c, args.seconds, headers)) for c in levels]
+            finally:
+                stop_server(server)
+    finally:
+        drop_user(user_id)
+
+    print(f"{'mode':<7}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, runs in results.items():
+        for r in runs:
+            print(f"{mode:<7}{r['concurrency']:>8}{r['requests_per_sec']:>10}{r['p50_ms']:>10}"
+                  f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Throughput of the fastapi-crud auth dependency's token handling: the legacy
+path (unverified decode + verified decode + eager f-string DEBUG logging)
+versus app.auth.decode_access_token (one verified decode, lazy logging).
+
+Measures both in-process calls/sec and end-to-end requests/sec through a
+minimal FastAPI app (TestClient), without a database:
+    python3 benchmarks/bench_auth.py [--seconds 3] [--json out.json]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "fastapi-crud"))
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+from jose import JWTError, jwt
+
+from app import auth
+
+legacy_logger = logging.getLogger("bench.legacy_auth")
+
+def legacy_decode(token):
+    """The token handling get_current_user did before it was reworked"""
+    try:
+        legacy_logger.debug(f"Token received: {token[:50]}...")
+        try:
+            unverified = jwt.get_unverified_claims(token)
+            legacy_logger.debug(f"Unverified payload: {unverified}")
+        except Exception as e:
+            legacy_logger.debug(f"Could not get unverified claims: {e}")
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        legacy_logger.debug(f"Decoded payload: {payload}")
+        email = payload.get("sub") or payload.get("email")
+        legacy_logger.debug(f"Extracted email: {email}")
+        if email is None:
+            legacy_logger.debug("No email found in token")
+            return None
+        return email
+    except JWTError as e:
+        legacy_logger.debug(f"JWT Error: {e}")
+        return None
+
+def calls_per_second(fn, token, seconds):
+    calls = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            fn(token)
+        calls += 100
+    return calls / seconds
+
+def requests_per_second(decode, token, seconds):
+    app = FastAPI()
+
+    async def current_email(credentials: HTTPAuthorizationCredentials = Depends(auth.security)):
+        email = decode(credentials.credentials)
+        if email is None:
+            raise HTTPException(status_code=401)
+        return email
+
+    @app.get("/me")
+    async def me(email: str = Depends(current_email)):
+        return {"email": email}
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {token}"}
+    requests = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.get("/me", headers=headers)
+        requests += 1
+    return requests / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    # The legacy module forced DEBUG logging at import; emulate that with a
+    # handler writing to memory so formatting cost is counted but not I/O.
+    handler = logging.StreamHandler(io.StringIO())
+    legacy_logger.addHandler(handler)
+    legacy_logger.setLevel(logging.DEBUG)
+    legacy_logger.propagate = False
+    logging.getLogger("app").setLevel(logging.INFO)
+
+    token = auth.create_access_token({"sub": "bench@example.com"}, timedelta(minutes=30))
+    results = {
+        "legacy": {
+            "calls_per_sec": round(calls_per_second(legacy_decode, token, args.seconds)),
+            "requests_per_sec": round(requests_per_second(legacy_decode, token, args.seconds)),
+        },
+        "current": {
+            "calls_per_sec": round(calls_per_second(auth.decode_access_token, token, args.seconds)),
+            "requests_per_sec": round(requests_per_second(auth.decode_access_token, token, args.seconds)),
+        },
+    }
+
+    print(f"{'path':<10}{'calls/s':>12}{'requests/s':>14}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['calls_per_sec']:>12}{r['requests_per_sec']:>14}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
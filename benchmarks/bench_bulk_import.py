@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Import throughput of fastapi-crud: one POST /api/transactions/create per row
+versus POST /api/transactions/bulk (JSON) and /bulk/upload (CSV).
+
+Starts a uvicorn worker against the database configured by the DB_* variables
+(migrations applied), imports the same synthetic statement through each path
+for a throwaway user, and reports rows/sec:
+    python3 benchmarks/bench_bulk_import.py --rows 5000 [--json out.json]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from service import drop_user, seed_user, start_server, stop_server
+
+from app.auth import create_access_token
+
+def statement_rows(count):
+    return [
+        {
+            "name": f"Statement line {i}",
+            "amount": 1 + (i * 7919) % 5000,
+            "type": "income" if i % 5 == 0 else "expense",
+            "date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00",
+        }
+        for i in range(count)
+    ]
+
+def as_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["name", "amount", "type", "date"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def timed(fn):
+    started = time.perf_counter()
+    created = fn()
+    return created, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--single-rows", type=int, default=None,
+                        help="Rows to import one request at a time (default: same as --rows)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    rows = statement_rows(args.rows)
+    single_rows = rows[:args.single_rows or args.rows]
+    server = start_server(args.port)
+    results = {}
+    try:
+        base = f"http://127.0.0.1:{args.port}/api/transactions"
+        for path, run in (
+            ("create (per row)", lambda http: sum(
+                http.post(f"{base}/create", json=row).status_code == 201 for row in single_rows)),
+            ("bulk (JSON)", lambda http: http.post(f"{base}/bulk", json={"transactions": rows}).json()["created"]),
+            ("bulk/upload (CSV)", lambda http: http.post(
+                f"{base}/bulk/upload", files={"file": ("statement.csv", as_csv(rows), "text/csv")}
+            ).json()["created"]),
+        ):
+            # A fresh user per path so each import starts from the same state
+            user_id, email = seed_user()
+            token = create_access_token({"sub": email}, timedelta(hours=1))
+            try:
+                with httpx.Client(headers={"Authorization": f"Bearer {token}"}, timeout=300) as http:
+                    created, elapsed = timed(lambda: run(http))
+            finally:
+                drop_user(user_id)
+            results[path] = {
+                "rows": created,
+                "seconds": round(elapsed, 3),
+                "rows_per_sec": round(created / elapsed, 1) if elapsed else 0.0,
+            }
+    finally:
+        stop_server(server)
+
+    print(f"{'path':<20}{'rows':>8}{'seconds':>10}{'rows/s':>12}")
+    for path, r in results.items():
+        print(f"{path:<20}{r['rows']:>8}{r['seconds']:>10}{r['rows_per_sec']:>12}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Read latency of fastapi-crud during a burst of password changes, with bcrypt
+in the request threadpool (HASH_WORKERS=0, how the service used to hash)
+versus app.hashing's process pool.
+
+Starts one uvicorn worker per mode against the database configured by the
+DB_* variables (migrations applied). Readers list a user's transactions while
+writers change another user's password (PUT /api/users/me) back to back:
+    python3 benchmarks/bench_hashing.py [--readers 20] [--writers 8] [-s 10] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import connect
+from loadgen import run_load
+from service import drop_user, seed_user, start_server, stop_server
+
+from app.auth import create_access_token
+
+def bearer(email):
+    return {"Authorization": f"Bearer {create_access_token({'sub': email}, timedelta(hours=1))}"}
+
+def make_writer():
+    # PUT /me validates the email, and the bench users' .local domain is rejected
+    user_id, _ = seed_user()
+    email = f"bench-writer-{user_id}@example.com"
+    conn = connect(search_path="expense")
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE users SET email = %s WHERE user_id = %s", (email, user_id))
+    conn.commit()
+    conn.close()
+    return user_id, email
+
+async def burst(base, reader_headers, writer_email, readers, writers, seconds):
+    list_url = f"{base}/api/transactions/list?limit=20"
+    change = {
+        "method": "PUT",
+        "url": f"{base}/api/users/me",
+        "headers": bearer(writer_email),
+        "json": {"name": "Bench writer", "email": writer_email, "password": "bench-password"},
+    }
+    tasks = [run_load(list_url, readers, seconds, headers=reader_headers)]
+    if writers:
+        tasks.append(run_load(lambda: dict(change), writers, seconds))
+    results = await asyncio.gather(*tasks)
+    return results[0], results[1] if writers else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("-s", "--seconds", type=float, default=10.0)
+    parser.add_argument("--hash-workers", type=int, default=2, help="Process pool size for the pooled mode")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost for both modes")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    reader_id, reader_email = seed_user(1000)
+    writer_id, writer_email = make_writer()
+    reader_headers = bearer(reader_email)
+    base = f"http://127.0.0.1:{args.port}"
+
+    modes = [("threadpool", 0), ("process pool", args.hash_workers)]
+    results = []
+    print(f"{'mode':<14}{'writers':>8}{'read req/s':>12}{'read p50':>10}{'read p99':>10}{'changes/s':>11}{'errors':>8}")
+    try:
+        for mode, workers in modes:
+            server = start_server(args.port, HASH_WORKERS=workers, BCRYPT_ROUNDS=args.rounds)
+            try:
+                for writers in (0, args.writers):
+                    read, write = asyncio.run(burst(base, reader_headers, writer_email, args.readers, writers, args.seconds))
+                    row = {
+                        "mode": mode,
+                        "hash_workers": workers,
+                        "writers": writers,
+                        "read": read,
+                        "write": write,
+                    }
+                    results.append(row)
+                    print(f"{mode:<14}{writers:>8}{read['requests_per_sec']:>12}{read['p50_ms']:>10}{read['p99_ms']:>10}"
+                          f"{write['requests_per_sec'] if write else '-':>11}{write['errors'] if write else '-':>8}", flush=True)
+            finally:
+                stop_server(server)
+    finally:
+        drop_user(reader_id)
+        drop_user(writer_id)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"readers": args.readers, "rounds": args.rounds, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Query plans and latency of the transactions hot queries before and after the
+composite indexes from fastapi-crud/migrations/0003_transactions_user_indexes.sql.
+
+Seeds a scratch schema (dropped afterwards unless --keep) with synthetic data:
+    python3 benchmarks/bench_indexes.py --rows 1000000 --users 1000 [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect, explain, seed_transactions, summarize, time_query
+
+SCHEMA = "bench_indexes"
+MIGRATION = os.path.join(REPO_ROOT, "fastapi-crud", "migrations", "0003_transactions_user_indexes.sql")
+
+def hot_queries(user_id):
+    now = datetime.now()
+    month_start = datetime(now.year, now.month, 1)
+    return {
+        # fastapi-crud GET /api/transactions/list
+        "list": (
+            "SELECT * FROM transactions WHERE user_id = %s ORDER BY date DESC LIMIT 100",
+            (user_id,),
+        ),
+        # fastapi-crud GET /api/transactions/summary/monthly
+        "monthly_summary": (
+            "SELECT type, SUM(amount), COUNT(*) FROM transactions "
+            "WHERE user_id = %s AND date >= %s AND date < %s GROUP BY type",
+            (user_id, month_start, datetime(now.year + now.month // 12, now.month % 12 + 1, 1)),
+        ),
+        # flask-history GET /api/history/transactions (default: last 10 days)
+        "history_recent": (
+            "SELECT transaction_id, name, amount, date, type, emoji FROM transactions "
+            "WHERE user_id = %s AND date >= now() - interval '10 days' ORDER BY date DESC LIMIT 100",
+            (user_id,),
+        ),
+        # flask-history GET /api/history/income
+        "income_total": (
+            "SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE user_id = %s AND type = 'income'",
+            (user_id,),
+        ),
+    }
+
+def measure(cursor, user_id, repeat):
+    results = {}
+    for name, (query, params) in hot_queries(user_id).items():
+        results[name] = {
+            "latency": summarize(time_query(cursor, query, params, repeat=repeat)),
+            "plan": explain(cursor, query, params),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+
+    try:
+        print(f"Seeding {args.rows:,} transactions for {args.users:,} users...")
+        seed_transactions(cursor, args.rows, args.users)
+        user_id = args.users // 2
+
+        before = measure(cursor, user_id, args.repeat)
+        with open(MIGRATION) as f:
+            for statement in f.read().split(";"):
+                if "CREATE INDEX" in statement:
+                    cursor.execute(statement)
+        cursor.execute("ANALYZE transactions")
+        after = measure(cursor, user_id, args.repeat)
+
+        print(f"\n{'query':<18}{'before p50':>12}{'after p50':>12}{'before p95':>12}{'after p95':>12}  (ms)")
+        for name in before:
+            b, a = before[name]["latency"], after[name]["latency"]
+            print(f"{name:<18}{b['p50_ms']:>12}{a['p50_ms']:>12}{b['p95_ms']:>12}{a['p95_ms']:>12}")
+        for name in before:
+            print(f"\n=== {name}: before\n{before[name]['plan']}\n=== {name}: after\n{after[name]['plan']}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"rows": args.rows, "users": args.users, "before": before, "after": after}, f, indent=2)
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
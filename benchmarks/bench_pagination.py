@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Deep-page latency of OFFSET pagination (/api/transactions/list?skip=...) versus
+keyset pagination (/api/transactions/list/cursor, /api/history/transactions?cursor=...).
+
+Seeds a scratch schema (dropped afterwards unless --keep) with the migration
+indexes applied, then fetches one page at increasing depths for a single user:
+    python3 benchmarks/bench_pagination.py --rows 500000 --users 5 [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect, seed_transactions, summarize, time_query
+
+SCHEMA = "bench_pagination"
+MIGRATION = os.path.join(REPO_ROOT, "fastapi-crud", "migrations", "0003_transactions_user_indexes.sql")
+
+OFFSET_QUERY = """
+    SELECT * FROM transactions WHERE user_id = %s
+    ORDER BY date DESC, transaction_id DESC OFFSET %s LIMIT %s
+"""
+KEYSET_QUERY = """
+    SELECT * FROM transactions WHERE user_id = %s AND (date, transaction_id) < (%s, %s)
+    ORDER BY date DESC, transaction_id DESC LIMIT %s
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--depths", default="0,1000,10000,50000,90000", help="Comma-separated row offsets")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+
+    try:
+        print(f"Seeding {args.rows:,} transactions for {args.users:,} users...")
+        seed_transactions(cursor, args.rows, args.users)
+        with open(MIGRATION) as f:
+            for statement in f.read().split(";"):
+                if "CREATE INDEX" in statement:
+                    cursor.execute(statement)
+        cursor.execute("ANALYZE transactions")
+
+        user_id = 1
+        results = []
+        for depth in (int(d) for d in args.depths.split(",")):
+            offset = time_query(cursor, OFFSET_QUERY, (user_id, depth, args.page_size), repeat=args.repeat)
+
+            # The cursor a client would hold after reading ``depth`` rows
+            if depth:
+                cursor.execute(OFFSET_QUERY, (user_id, depth - 1, 1))
+                row = cursor.fetchone()
+                if row is None:
+                    print(f"depth {depth}: user has fewer rows, skipping")
+                    continue
+                position = (row[3], row[0])
+            else:
+                position = ("infinity", 2**31 - 1)
+            keyset = time_query(cursor, KEYSET_QUERY, (user_id, *position, args.page_size), repeat=args.repeat)
+
+            results.append({"depth": depth, "offset": summarize(offset), "keyset": summarize(keyset)})
+
+        print(f"\n{'depth':>8}{'offset p50':>12}{'keyset p50':>12}{'offset p95':>12}{'keyset p95':>12}  (ms)")
+        for r in results:
+            print(f"{r['depth']:>8}{r['offset']['p50_ms']:>12}{r['keyset']['p50_ms']:>12}"
+                  f"{r['offset']['p95_ms']:>12}{r['keyset']['p95_ms']:>12}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"rows": args.rows, "users": args.users, "page_size": args.page_size,
+                           "results": results}, f, indent=2)
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Query plans and latency of the transactions queries before and after
+converting the table to monthly range partitions on date with
+fastapi-crud/app/partitions.py (manage_partitions.py migrate).
+
+Seeds a scratch schema (dropped afterwards unless --keep) with synthetic data
+and the indexes from migration 0003, measures, migrates it online and
+measures again:
+    python3 benchmarks/bench_partitions.py --rows 2000000 --users 1000 [--json out.json]
+
+Recent-window queries (the current month, the last few days) should only
+touch the newest partitions; queries without a date bound are included to
+show what partitioning costs them.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect, explain, seed_transactions, summarize, time_query
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "fastapi-crud"))
+from sqlalchemy import create_engine
+
+from app.partitions import migrate
+
+SCHEMA = "bench_partitions"
+INDEX_MIGRATION = os.path.join(REPO_ROOT, "fastapi-crud", "migrations", "0003_transactions_user_indexes.sql")
+
+def queries(user_id, users):
+    now = datetime.now()
+    month_start = datetime(now.year, now.month, 1)
+    next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+    batch = list(range(1, users + 1, max(1, users // 50)))
+    return {
+        # fastapi-crud GET /api/transactions/summary/monthly
+        "monthly_summary": (
+            "SELECT type, SUM(amount), COUNT(*) FROM transactions "
+            "WHERE user_id = %s AND date >= %s AND date < %s GROUP BY type",
+            (user_id, month_start, next_month),
+        ),
+        # flask-history GET /api/history/transactions (default: last 10 days)
+        "history_recent": (
+            "SELECT transaction_id, name, amount, date, type, emoji FROM transactions "
+            "WHERE user_id = %s AND date >= %s ORDER BY date DESC, transaction_id DESC LIMIT 100",
+            (user_id, now - timedelta(days=10)),
+        ),
+        # flask-history GET /api/history/transactions?start_date=...&end_date=...
+        "history_range": (
+            "SELECT transaction_id, name, amount, date, type, emoji FROM transactions "
+            "WHERE user_id = %s AND date >= %s AND date <= %s ORDER BY date DESC, transaction_id DESC LIMIT 100",
+            (user_id, now - timedelta(days=60), now - timedelta(days=30)),
+        ),
+        # flask-history POST /api/history/summaries with a start_date, 50 users
+        "batch_summary_30d": (
+            "SELECT user_id, SUM(amount), COUNT(*) FROM transactions "
+            "WHERE user_id = ANY(%s::int[]) AND date >= %s GROUP BY user_id",
+            (batch, now - timedelta(days=30)),
+        ),
+        # All users over the last week (reporting / exports)
+        "all_users_7d": (
+            "SELECT type, SUM(amount), COUNT(*) FROM transactions WHERE date >= %s GROUP BY type",
+            (now - timedelta(days=7),),
+        ),
+        # No date bound: every partition is visited
+        "list": (
+            "SELECT * FROM transactions WHERE user_id = %s ORDER BY date DESC LIMIT 100",
+            (user_id,),
+        ),
+        "get_by_id": (
+            "SELECT * FROM transactions WHERE transaction_id = %s AND user_id = %s",
+            (user_id * 7, user_id),
+        ),
+    }
+
+def measure(cursor, user_id, users, repeat):
+    results = {}
+    for name, (query, params) in queries(user_id, users).items():
+        results[name] = {
+            "latency": summarize(time_query(cursor, query, params, repeat=repeat)),
+            "plan": explain(cursor, query, params),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=5 * 365, help="History covered by the seeded rows")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Rows per batch of the online copy")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+    engine = create_engine("postgresql+psycopg2://", creator=connect)
+
+    try:
+        print(f"Seeding {args.rows:,} transactions for {args.users:,} users over {args.days} days...")
+        seed_transactions(cursor, args.rows, args.users, days=args.days)
+        user_id = args.users // 2
+        with open(INDEX_MIGRATION) as f:
+            for statement in f.read().split(";"):
+                if "CREATE INDEX" in statement:
+                    cursor.execute(statement)
+        cursor.execute("ANALYZE transactions")
+
+        before = measure(cursor, user_id, args.users, args.repeat)
+
+        started = time.perf_counter()
+        result = migrate(engine, batch_size=args.batch_size, schema=SCHEMA)
+        migrate_seconds = round(time.perf_counter() - started, 1)
+        print(f"Migrated {result['rows']:,} rows into {result['partitions']} partitions in {migrate_seconds}s")
+
+        after = measure(cursor, user_id, args.users, args.repeat)
+
+        print(f"\n{'query':<20}{'before p50':>12}{'after p50':>12}{'before p95':>12}{'after p95':>12}  (ms)")
+        for name in before:
+            b, a = before[name]["latency"], after[name]["latency"]
+            print(f"{name:<20}{b['p50_ms']:>12}{a['p50_ms']:>12}{b['p95_ms']:>12}{a['p95_ms']:>12}")
+        for name in before:
+            print(f"\n=== {name}: before\n{before[name]['plan']}\n=== {name}: after\n{after[name]['plan']}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"rows": args.rows, "users": args.users, "days": args.days,
+                           "migrate_seconds": migrate_seconds, "partitions": result["partitions"],
+                           "before": before, "after": after}, f, indent=2)
+    finally:
+        engine.dispose()
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
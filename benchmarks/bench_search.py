@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Query plans and latency of fastapi-crud GET /api/transactions/search for a
+user with a long history, with the word-prefix index from
+fastapi-crud/migrations/0005_transactions_name_search.sql, next to the
+ILIKE scan it replaces.
+
+Seeds a scratch schema (dropped afterwards unless --keep) with synthetic data,
+varied transaction names, and one heavy user holding --user-rows of them:
+    python3 benchmarks/bench_search.py --rows 1000000 --users 1000 --user-rows 100000 [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect, explain, seed_transactions, summarize, time_query
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "fastapi-crud"))
+from sqlalchemy.dialects import postgresql
+
+from app.migrations import _split_statements
+from app.search import search_query
+
+SCHEMA = "bench_search"
+MIGRATION = os.path.join(REPO_ROOT, "fastapi-crud", "migrations", "0005_transactions_name_search.sql")
+PAGE_SIZE = 20
+
+MERCHANTS = [
+    "Starbucks", "Costco", "Coffee Bean", "Whole Foods Market", "Trader Joe's", "Walmart", "Target",
+    "Amazon", "Netflix", "Spotify", "Uber", "Lyft", "Shell", "Chevron", "Comcast", "Verizon",
+    "Home Depot", "IKEA", "Apple Store", "Best Buy", "CVS Pharmacy", "Walgreens", "McDonald's",
+    "Chipotle", "Subway", "Domino's Pizza", "Delta Air Lines", "Airbnb", "Marriott", "Planet Fitness",
+    "City Water", "Electric Co", "Rent", "Salary", "Freelance", "Dividends", "Tax Refund", "Gift",
+]
+DETAILS = ["", "", "", "refund", "subscription", "online", "groceries", "lunch", "dinner", "monthly", "card"]
+
+def rename_transactions(cursor):
+    """Replace the handful of seeded names with merchant/detail/reference combinations"""
+    cursor.execute("""
+        UPDATE transactions SET name = concat_ws(' ',
+            (%s::text[])[1 + (transaction_id::bigint * 31) %% %s],
+            NULLIF((%s::text[])[1 + (transaction_id::bigint * 17) %% %s], ''),
+            CASE WHEN transaction_id %% 7 = 0 THEN '#' || transaction_id %% 500 END)
+    """, (MERCHANTS, len(MERCHANTS), DETAILS, len(DETAILS)))
+
+def search_sql(user_id, q, **filters):
+    """The endpoint's query (app.search.search_query) as SQL for the scratch schema"""
+    sql = str(search_query(user_id, q, **filters).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    ))
+    # search_path points at the scratch schema
+    return sql.replace("expense.transactions", "transactions")
+
+def queries(user_id):
+    """Unpaginated queries; each is timed for its first page"""
+    month_ago = date.today() - timedelta(days=30)
+    return {
+        # Two-letter prefix shared by several merchants: the most rows to rank
+        "prefix_2_chars": (search_sql(user_id, "co"), None),
+        "word": (search_sql(user_id, "coffee"), None),
+        "two_prefixes": (search_sql(user_id, "whol mark"), None),
+        "reference": (search_sql(user_id, "#42"), None),
+        "last_30_days": (search_sql(user_id, "co", from_date=month_ago), None),
+        "expenses_only": (search_sql(user_id, "star", transaction_type="expense"), None),
+        "no_match": (search_sql(user_id, "zzz"), None),
+        # Without the index: a substring match walks the user's rows newest
+        # first, through all of them when matches are rare or missing
+        "ilike_reference": (
+            "SELECT * FROM transactions WHERE user_id = %s AND name ILIKE %s "
+            "ORDER BY date DESC, transaction_id DESC",
+            (user_id, "%#42%"),
+        ),
+        "ilike_no_match": (
+            "SELECT * FROM transactions WHERE user_id = %s AND name ILIKE %s "
+            "ORDER BY date DESC, transaction_id DESC",
+            (user_id, "%zzz%"),
+        ),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--user-rows", type=int, default=100_000, help="Extra transactions for the searched user")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--parallel", action="store_true",
+                        help="Keep the server's max_parallel_workers_per_gather (the endpoint sets it to 0)")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = connect()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+
+    try:
+        print(f"Seeding {args.rows:,} transactions for {args.users:,} users, "
+              f"plus {args.user_rows:,} for user 1...")
+        seed_transactions(cursor, args.rows, args.users)
+        user_id = 1
+        cursor.execute("""
+            INSERT INTO transactions (name, amount, date, type, user_id)
+            SELECT 'x', 1 + g %% 5000, now() - make_interval(mins => g * 13), 'expense', %s
+            FROM generate_series(1, %s) g
+        """, (user_id, args.user_rows))
+        rename_transactions(cursor)
+        cursor.execute("CREATE INDEX ix_transactions_user_date ON transactions "
+                       "(user_id, date DESC, transaction_id DESC) INCLUDE (type, amount)")
+
+        started = time.perf_counter()
+        with open(MIGRATION) as f:
+            for statement in _split_statements(f.read()):
+                cursor.execute(statement)
+        build_seconds = round(time.perf_counter() - started, 1)
+        cursor.execute("ANALYZE transactions")
+        cursor.execute("SELECT pg_size_pretty(pg_relation_size('ix_transactions_name_search')), "
+                       "pg_size_pretty(pg_relation_size('transactions'))")
+        index_size, table_size = cursor.fetchone()
+        cursor.execute("SELECT count(*) FROM transactions WHERE user_id = %s", (user_id,))
+        user_rows = cursor.fetchone()[0]
+        print(f"Index built in {build_seconds}s: {index_size} (table {table_size}); user 1 has {user_rows:,} rows")
+
+        if not args.parallel:
+            cursor.execute("SET max_parallel_workers_per_gather = 0")
+        results = {}
+        for name, (query, params) in queries(user_id).items():
+            cursor.execute(f"SELECT count(*) FROM ({query}) matches", params)
+            # One extra row, like the endpoint, to know whether there is a next page
+            query = f"{query} LIMIT {PAGE_SIZE + 1}"
+            results[name] = {
+                "matches": cursor.fetchone()[0],
+                "latency": summarize(time_query(cursor, query, params, repeat=args.repeat)),
+                "plan": explain(cursor, query, params),
+            }
+
+        print(f"\n{'query':<18}{'matches':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+        for name, result in results.items():
+            latency = result["latency"]
+            print(f"{name:<18}{result['matches']:>9}{latency['p50_ms']:>9}{latency['p95_ms']:>9}{latency['p99_ms']:>9}")
+        for name, result in results.items():
+            print(f"\n=== {name}\n{result['plan']}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"rows": args.rows, "users": args.users, "user_rows": user_rows,
+                           "parallel": args.parallel, "build_seconds": build_seconds, "index_size": index_size,
+                           "results": results}, f, indent=2)
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Cost of turning a page of transactions into a JSON response body, in both
+services, before and after the orjson fast path (JSON_SERIALIZER=orjson):
+
+- fastapi-crud: FastAPI's response_model path (validate ORM rows into
+  TransactionResponse, dump them, json.dumps) versus app.serialization's
+  row_dicts + ORJSONResponse.
+- flask-history: copying each row into a new dict with an isoformat() date,
+  then Flask's json provider, versus handing the rows to ORJSONProvider.
+
+Runs in-process on synthetic rows, without a database or server:
+    python3 benchmarks/bench_serialization.py [--rows 10,100,1000] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "fastapi-crud"))
+# Appended, so fastapi-crud's app package wins over flask-history's app.py
+sys.path.append(os.path.join(REPO_ROOT, "flask-history"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from pydantic import TypeAdapter
+
+from app.models import Transaction, TransactionResponse
+from app.serialization import row_dicts
+from utils.json_provider import ORJSONProvider
+
+def make_rows(count):
+    """ORM rows (as fastapi-crud loads them) and dict rows (as flask-history's RealDictCursor returns them)"""
+    start = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    orm_rows, dict_rows = [], []
+    for i in range(count):
+        values = {
+            "transaction_id": 100000 + i,
+            "name": f"Groceries {i}",
+            "amount": 1000 + i * 7,
+            "date": start - timedelta(hours=i),
+            "type": "expense" if i % 3 else "income",
+            "emoji": "🛒" if i % 2 else None,
+        }
+        orm_rows.append(Transaction(user_id=42, **values))
+        dict_rows.append(values)
+    return orm_rows, dict_rows
+
+def fastapi_stock(adapter):
+    def render(rows):
+        # What serialize_response + JSONResponse do for response_model=List[TransactionResponse]
+        value = adapter.validate_python(rows, from_attributes=True)
+        return JSONResponse(adapter.dump_python(value, mode="json")).body
+    return render
+
+def fastapi_fast(rows):
+    return ORJSONResponse(row_dicts(rows, TransactionResponse)).body
+
+def flask_renderer(app, copy_rows):
+    def render(rows):
+        if copy_rows:
+            # The per-row reformatting get_transactions did before the JSON provider handled dates
+            rows = [{
+                "transaction_id": row["transaction_id"],
+                "name": row["name"],
+                "amount": int(row["amount"]),
+                "date": row["date"].isoformat() if row["date"] else None,
+                "type": row["type"],
+                "emoji": row["emoji"],
+            } for row in rows]
+        with app.app_context():
+            return app.json.response({"transactions": rows, "count": len(rows)}).get_data()
+    return render
+
+def time_per_call(render, rows, min_seconds):
+    """Mean microseconds per call, repeating until min_seconds have elapsed"""
+    render(rows)
+    calls, started = 0, time.perf_counter()
+    while True:
+        render(rows)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10,100,1000", help="Comma-separated page sizes")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Measured seconds per case")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    stock_flask = Flask("bench-stock")
+    stock_flask.json = DefaultJSONProvider(stock_flask)
+    fast_flask = Flask("bench-orjson")
+    fast_flask.json = ORJSONProvider(fast_flask)
+
+    cases = [
+        ("fastapi-crud", fastapi_stock(TypeAdapter(List[TransactionResponse])), fastapi_fast, 0),
+        ("flask-history", flask_renderer(stock_flask, True), flask_renderer(fast_flask, False), 1),
+    ]
+
+    results = []
+    print(f"{'service':<14} {'rows':>6} {'stock us':>10} {'orjson us':>10} {'speedup':>8}")
+    for size in (int(n) for n in args.rows.split(",")):
+        rows = make_rows(size)
+        for service, stock, fast, rows_index in cases:
+            if json.loads(stock(rows[rows_index])) != json.loads(fast(rows[rows_index])):
+                raise SystemExit(f"{service}: stock and orjson output differ for {size} rows")
+            stock_us = time_per_call(stock, rows[rows_index], args.seconds)
+            fast_us = time_per_call(fast, rows[rows_index], args.seconds)
+            results.append({
+                "service": service,
+                "rows": size,
+                "stock_us": round(stock_us, 1),
+                "orjson_us": round(fast_us, 1),
+                "speedup": round(stock_us / fast_us, 2),
+            })
+            print(f"{service:<14} {size:>6} {stock_us:>10.1f} {fast_us:>10.1f} {stock_us / fast_us:>7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
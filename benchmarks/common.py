@@ -0,0 +1,110 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Connection settings come from BENCH_DSN, or from the same DB_* variables the
+services use. Benchmarks only ever write to their own scratch schema.
+"""
+
+import os
+import statistics
+import time
+
+import psycopg2
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def connect(search_path=None):
+    """Open a psycopg2 connection to the benchmark database"""
+    dsn = os.getenv("BENCH_DSN")
+    if dsn:
+        conn = psycopg2.connect(dsn)
+    else:
+        conn = psycopg2.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=os.getenv("DB_PORT", "5432"),
+            dbname=os.getenv("DB_NAME", "expense_db"),
+            user=os.getenv("DB_USER", "expense_user"),
+            password=os.getenv("DB_PASSWORD", "expense_pass"),
+        )
+    if search_path:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SET search_path TO {search_path}")
+        conn.commit()
+    return conn
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(samples_ms):
+    """p50/p95/p99/mean of latency samples in milliseconds"""
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+def time_query(cursor, query, params=None, repeat=20, warmup=2):
+    """Run a query ``repeat`` times and return latency samples in milliseconds"""
+    for _ in range(warmup):
+        cursor.execute(query, params)
+        cursor.fetchall()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def explain(cursor, query, params=None):
+    """EXPLAIN (ANALYZE, BUFFERS) output for a query as a single string"""
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+    return "\n".join(row[0] for row in cursor.fetchall())
+
+def seed_transactions(cursor, rows, users, days=5 * 365):
+    """
+    Create users/transactions tables in the current schema and fill them with
+    synthetic data: ``rows`` transactions spread over ``users`` users and the
+    last ``days`` days.
+    """
+    cursor.execute("""
+        CREATE TABLE users (
+            user_id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE transactions (
+            transaction_id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            amount INT NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            type VARCHAR(20) CHECK (type IN ('income', 'expense')) NOT NULL,
+            emoji VARCHAR(10),
+            user_id INT REFERENCES users(user_id) ON DELETE CASCADE
+        );
+    """)
+    cursor.execute("""
+        INSERT INTO users (name, email, password)
+        SELECT 'User ' || g, 'user' || g || '@bench.local', 'x'
+        FROM generate_series(1, %s) g
+    """, (users,))
+    cursor.execute("""
+        INSERT INTO transactions (name, amount, date, type, emoji, user_id)
+        SELECT (ARRAY['Coffee', 'Groceries', 'Rent', 'Salary', 'Fuel', 'Dinner', 'Movies', 'Gym'])[1 + g %% 8],
+               1 + (g::bigint * 7919) %% 5000,
+               now() - make_interval(secs => ((g::bigint * 104729) %% (%s * 86400))::double precision),
+               CASE WHEN g %% 5 = 0 THEN 'income' ELSE 'expense' END,
+               NULL,
+               1 + (g %% %s)
+        FROM generate_series(1, %s) g
+    """, (days, users, rows))
+    cursor.execute("ANALYZE users; ANALYZE transactions;")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare two run.py result files and flag regressions.
+
+A scenario/concurrency pair regresses when a latency percentile grows, or
+throughput drops, by more than --threshold percent. Latency changes smaller
+than --min-ms are ignored as noise, and new errors always count. Exits 1 when
+anything regressed, so it can gate CI:
+    python3 benchmarks/compare.py baseline.json candidate.json [--threshold 10]
+"""
+
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r["scenario"], r["concurrency"]): r for r in report["results"]}
+
+def change(before, after):
+    """Relative change in percent (positive means the value grew)"""
+    if not before:
+        return 0.0 if not after else float("inf")
+    return (after - before) / before * 100
+
+def compare(baseline, candidate, threshold, min_ms):
+    """One row per scenario/concurrency present in both runs, with the regressions found"""
+    rows = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        regressions = []
+        for metric in LATENCY_KEYS:
+            delta = change(before[metric], after[metric])
+            if delta > threshold and after[metric] - before[metric] >= min_ms:
+                regressions.append(f"{metric} +{delta:.1f}%")
+        delta = change(before["requests_per_sec"], after["requests_per_sec"])
+        if -delta > threshold:
+            regressions.append(f"req/s {delta:.1f}%")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"errors {before['errors']} -> {after['errors']}")
+        rows.append((key, before, after, regressions))
+    return rows
+
+def describe(report):
+    return report.get("label") or report.get("git_revision") or "?"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Ignore latency changes below this many ms")
+    parser.add_argument("--json", help="Write the comparison to this file")
+    args = parser.parse_args()
+
+    baseline_report, baseline = load(args.baseline)
+    candidate_report, candidate = load(args.candidate)
+    # The create scenario adds rows, so only a real difference in volume is worth a warning
+    before_data, after_data = baseline_report.get("dataset", {}), candidate_report.get("dataset", {})
+    if (before_data.get("users") != after_data.get("users")
+            or abs(change(before_data.get("transactions", 0), after_data.get("transactions", 0))) > 1):
+        print(f"warning: datasets differ: {before_data} vs {after_data}")
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"warning: {key[0]} at {key[1]} clients is only in one run, skipped")
+
+    rows = compare(baseline, candidate, args.threshold, args.min_ms)
+
+    print(f"{describe(baseline_report)} -> {describe(candidate_report)}")
+    print(f"{'scenario':<22}{'clients':>8}{'req/s':>21}{'p50 ms':>21}{'p95 ms':>21}{'p99 ms':>21}  result")
+    for (scenario, level), before, after, regressions in rows:
+        cells = "".join(
+            f"{f'{before[metric]} -> {after[metric]}':>21}" for metric in ("requests_per_sec",) + LATENCY_KEYS
+        )
+        print(f"{scenario:<22}{level:>8}{cells}  {'REGRESSED: ' + ', '.join(regressions) if regressions else 'ok'}")
+
+    regressed = [row for row in rows if row[3]]
+    print(f"\n{len(regressed)} of {len(rows)} regressed (threshold {args.threshold}%, min {args.min_ms} ms)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([
+                {"scenario": scenario, "concurrency": level, "baseline": before, "candidate": after,
+                 "regressions": regressions}
+                for (scenario, level), before, after, regressions in rows
+            ], f, indent=2)
+
+    sys.exit(1 if regressed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Closed-loop HTTP load generator: ``concurrency`` clients each send requests
+back to back for ``seconds`` and the run reports throughput and latency
+percentiles. Used by the service benchmarks, or directly:
+    python3 benchmarks/loadgen.py http://localhost:5000/health -c 100 -s 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import summarize
+
+async def _client(http, target, headers, deadline, samples, errors):
+    while time.perf_counter() < deadline:
+        request = target() if callable(target) else {"method": "GET", "url": target}
+        request["headers"] = {**(headers or {}), **request.get("headers", {})}
+        started = time.perf_counter()
+        try:
+            response = await http.request(**request)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        samples.append((time.perf_counter() - started) * 1000)
+
+async def run_load(target, concurrency=50, seconds=10.0, headers=None, warmup=1.0):
+    """
+    Drive ``target`` with ``concurrency`` concurrent clients and return
+    summarize() of the successful latencies plus requests/sec and errors.
+
+    ``target`` is a URL to GET, or a callable returning the keyword arguments
+    of one httpx request (method, url, headers, json, ...) so every request
+    can differ.
+    """
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as http:
+        if warmup > 0:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(_client(http, target, headers, deadline, [], []) for _ in range(concurrency)))
+
+        samples, errors = [], []
+        started = time.perf_counter()
+        deadline = started + seconds
+        await asyncio.gather(*(_client(http, target, headers, deadline, samples, errors) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    result = summarize(samples)
+    result.update({
+        "concurrency": concurrency,
+        "requests_per_sec": round(len(samples) / elapsed, 1),
+        "errors": len(errors),
+    })
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("-s", "--seconds", type=float, default=10.0)
+    parser.add_argument("-H", "--header", action="append", default=[], help="'Name: value', repeatable")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    headers = dict(h.split(":", 1) for h in args.header)
+    headers = {k.strip(): v.strip() for k, v in headers.items()}
+    result = asyncio.run(run_load(args.url, args.concurrency, args.seconds, headers))
+    print(json.dumps(result, indent=2))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
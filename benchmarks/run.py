@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Load-test suite for fastapi-crud and flask-history against the dataset from
+seed.py.
+
+Each scenario drives one endpoint with a fixed number of closed-loop clients
+(loadgen.run_load), picking a random seeded user per request, and records
+p50/p95/p99 latency and throughput. Both services are started from this
+checkout unless --fastapi-url / --flask-url point at running instances:
+    python3 benchmarks/seed.py --users 10000 --transactions 50000000
+    python3 benchmarks/run.py -c 1,10,50 -s 20 --json before.json
+    python3 benchmarks/compare.py before.json after.json
+
+The create scenario adds rows to the seeded users; seed.py --drop removes
+them with everything else.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect
+from loadgen import run_load
+from seed import LOAD_DOMAIN, seeded_users
+from service import FLASK_SERVERS, start_flask_server, start_server, stop_server
+
+from app.auth import create_access_token
+
+def load_sample(users, seed_value):
+    """Up to ``users`` random seeded users as (user_id, auth header, one of their transaction_ids)"""
+    conn = connect(search_path="expense")
+    try:
+        with conn.cursor() as cursor:
+            user_ids = seeded_users(cursor)
+            if not user_ids:
+                raise SystemExit("No load-test users found; run benchmarks/seed.py first")
+            chosen = random.Random(seed_value).sample(user_ids, min(users, len(user_ids)))
+            cursor.execute("""
+                SELECT u.user_id, u.email,
+                       (SELECT transaction_id FROM transactions t WHERE t.user_id = u.user_id LIMIT 1)
+                FROM users u WHERE u.user_id = ANY(%s)
+            """, (chosen,))
+            rows = cursor.fetchall()
+            cursor.execute(
+                "SELECT count(*) FROM transactions t JOIN users u USING (user_id) WHERE u.email LIKE %s",
+                (f"%@{LOAD_DOMAIN}",)
+            )
+            total = cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+    sample = [
+        (user_id, {"Authorization": f"Bearer {create_access_token({'sub': email}, timedelta(hours=12))}"}, txn)
+        for user_id, email, txn in rows if txn is not None
+    ]
+    return sample, {"users": len(user_ids), "transactions": total, "sampled_users": len(sample)}
+
+def scenarios(fastapi_url, flask_url, sample):
+    """name -> (service, callable returning one httpx request)"""
+    today = datetime.now()
+
+    def pick():
+        return random.choice(sample)
+
+    def fastapi(path):
+        def request():
+            _, headers, txn = pick()
+            return {"method": "GET", "url": fastapi_url + path.format(txn=txn), "headers": headers}
+        return request
+
+    def flask(path):
+        def request():
+            user_id, _, _ = pick()
+            return {"method": "GET", "url": flask_url + path.format(user_id=user_id)}
+        return request
+
+    def create():
+        _, headers, _ = pick()
+        return {
+            "method": "POST", "url": fastapi_url + "/api/transactions/create", "headers": headers,
+            "json": {"name": "Load create", "amount": random.randint(1, 500), "type": "expense"},
+        }
+
+    return {
+        "list": ("fastapi-crud", fastapi("/api/transactions/list?limit=50")),
+        "get": ("fastapi-crud", fastapi("/api/transactions/get/{txn}")),
+        "create": ("fastapi-crud", create),
+        "monthly_summary": ("fastapi-crud", fastapi(
+            f"/api/transactions/summary/monthly?year={today.year}&month={today.month}")),
+        "balance": ("flask-history", flask("/api/history/balance?user_id={user_id}")),
+        "history_transactions": ("flask-history", flask("/api/history/transactions?user_id={user_id}&limit=50")),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", default="1,10,50", help="Comma-separated client counts")
+    parser.add_argument("-s", "--seconds", type=float, default=15.0, help="Measured seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--scenarios", help="Comma-separated subset of scenarios (default: all)")
+    parser.add_argument("--users", type=int, default=500, help="Seeded users to spread requests over")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fastapi-url", help="Use a running fastapi-crud instead of starting one")
+    parser.add_argument("--flask-url", help="Use a running flask-history instead of starting one")
+    parser.add_argument("--fastapi-port", type=int, default=8770)
+    parser.add_argument("--flask-port", type=int, default=8771)
+    parser.add_argument("--flask-server", choices=FLASK_SERVERS, default="dev",
+                        help="How to start flask-history (gunicorn reads the GUNICORN_* variables)")
+    parser.add_argument("--label", help="Free-form name for this run, stored in the results")
+    parser.add_argument("--json", help="Write machine-readable results to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    levels = [int(c) for c in args.concurrency.split(",")]
+    sample, dataset = load_sample(args.users, args.seed)
+
+    servers = []
+    try:
+        if not args.fastapi_url:
+            servers.append(start_server(args.fastapi_port))
+        if not args.flask_url:
+            servers.append(start_flask_server(args.flask_port, args.flask_server))
+        fastapi_url = (args.fastapi_url or f"http://127.0.0.1:{args.fastapi_port}").rstrip("/")
+        flask_url = (args.flask_url or f"http://127.0.0.1:{args.flask_port}").rstrip("/")
+
+        available = scenarios(fastapi_url, flask_url, sample)
+        selected = args.scenarios.split(",") if args.scenarios else list(available)
+        unknown = set(selected) - set(available)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(available)})")
+
+        print(f"{'scenario':<22}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        results = []
+        for name in selected:
+            service, request = available[name]
+            for level in levels:
+                result = asyncio.run(run_load(request, level, args.seconds, warmup=args.warmup))
+                results.append({"scenario": name, "service": service, **result})
+                print(f"{name:<22}{level:>8}{result['requests_per_sec']:>10}{result['p50_ms']:>10}"
+                      f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['errors']:>8}", flush=True)
+    finally:
+        for server in servers:
+            stop_server(server)
+
+    report = {
+        "label": args.label,
+        "git_revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {"concurrency": levels, "seconds": args.seconds, "warmup": args.warmup, "seed": args.seed,
+                     "flask_server": None if args.flask_url else args.flask_server},
+        "dataset": dataset,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
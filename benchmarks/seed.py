@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Seed the services' own schema with a synthetic load-test dataset for run.py.
+
+Users are created as load<N>@load.bench so they never collide with real
+accounts and can be removed again with --drop. Transactions are skewed the
+way real usage is: a few heavy users hold most rows (--user-skew) and recent
+months are busier than old ones (--date-skew). Income is mostly monthly
+salary-sized amounts, expenses mostly small. Generation is deterministic for
+a given --seed, and rows are inserted in committed batches so tens of
+millions of rows don't need one huge transaction:
+    python3 benchmarks/seed.py --users 10000 --transactions 50000000
+    python3 benchmarks/seed.py --drop
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import connect
+from service import SERVICE_DIR  # noqa: F401 (puts fastapi-crud on sys.path)
+
+LOAD_DOMAIN = "load.bench"
+
+def seeded_users(cursor):
+    """user_ids of the seeded load-test users, in creation order"""
+    cursor.execute("SELECT user_id FROM users WHERE email LIKE %s ORDER BY user_id", (f"%@{LOAD_DOMAIN}",))
+    return [row[0] for row in cursor.fetchall()]
+
+def drop(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE email LIKE %s", (f"%@{LOAD_DOMAIN}",))
+        print(f"Removed {cursor.rowcount:,} load-test users and their transactions")
+    conn.commit()
+
+def seed(conn, users, transactions, months, user_skew, date_skew, batch_size, seed_value):
+    with conn.cursor() as cursor:
+        if seeded_users(cursor):
+            raise SystemExit("Load-test users already exist; run with --drop first")
+
+        cursor.execute("""
+            INSERT INTO users (name, email, password)
+            SELECT 'Load user ' || g, 'load' || g || '@' || %s, 'x'
+            FROM generate_series(1, %s) g
+        """, (LOAD_DOMAIN, users))
+        # Rank -> user_id, so skewed ranks can be joined back to real ids
+        cursor.execute("""
+            CREATE TEMP TABLE load_users AS
+            SELECT row_number() OVER (ORDER BY user_id) AS n, user_id
+            FROM users WHERE email LIKE %s
+        """, (f"%@{LOAD_DOMAIN}",))
+        cursor.execute("CREATE INDEX ON load_users (n); ANALYZE load_users")
+        conn.commit()
+
+        cursor.execute("SELECT setseed(%s)", (seed_value,))
+        started = time.perf_counter()
+        inserted = 0
+        while inserted < transactions:
+            rows = min(batch_size, transactions - inserted)
+            # random()^skew concentrates ranks (and dates) near 0: low ranks are the
+            # heavy users, small ages are recent months
+            cursor.execute("""
+                INSERT INTO transactions (name, amount, date, type, emoji, user_id)
+                SELECT CASE WHEN r.income THEN (ARRAY['Salary', 'Freelance', 'Refund'])[1 + (r.pick * 3)::int %% 3]
+                            ELSE (ARRAY['Coffee', 'Groceries', 'Rent', 'Fuel', 'Dinner', 'Movies', 'Gym',
+                                        'Pharmacy', 'Taxi', 'Utilities'])[1 + (r.pick * 10)::int %% 10] END,
+                       CASE WHEN r.income THEN 1000 + (r.pick * 4000)::int
+                            ELSE 1 + (exp(r.pick * 6.5))::int END,
+                       now() - make_interval(secs => r.age * %(months)s * 30 * 86400),
+                       CASE WHEN r.income THEN 'income' ELSE 'expense' END,
+                       NULL,
+                       u.user_id
+                FROM (
+                    SELECT 1 + floor(power(random(), %(user_skew)s) * %(users)s)::int AS n,
+                           power(random(), %(date_skew)s) AS age,
+                           random() < 0.1 AS income,
+                           random() AS pick
+                    FROM generate_series(1, %(rows)s)
+                ) r
+                JOIN load_users u USING (n)
+            """, {"months": months, "user_skew": user_skew, "date_skew": date_skew, "users": users, "rows": rows})
+            conn.commit()
+            inserted += rows
+            elapsed = time.perf_counter() - started
+            print(f"  {inserted:,}/{transactions:,} transactions ({inserted / elapsed:,.0f} rows/s)")
+
+    # Bulk inserts bypass app.rollups, so recompute the balance rollups once at the end
+    from app.database import SessionLocal
+    from app.rollups import rebuild_rollups
+
+    print("Rebuilding balance rollups and analyzing...")
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("ANALYZE users; ANALYZE transactions")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--months", type=int, default=36, help="History length")
+    parser.add_argument("--user-skew", type=float, default=2.0,
+                        help="1 spreads rows evenly over users; higher gives a few users most of the rows")
+    parser.add_argument("--date-skew", type=float, default=1.5,
+                        help="1 spreads rows evenly over time; higher makes recent months busier")
+    parser.add_argument("--batch-size", type=int, default=1_000_000, help="Rows per committed INSERT")
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() value, between -1 and 1")
+    parser.add_argument("--drop", action="store_true", help="Remove the load-test users instead of seeding")
+    args = parser.parse_args()
+
+    conn = connect(search_path="expense")
+    try:
+        if args.drop:
+            drop(conn)
+        else:
+            print(f"Seeding {args.users:,} users and {args.transactions:,} transactions...")
+            seed(conn, args.users, args.transactions, args.months, args.user_skew, args.date_skew,
+                 args.batch_size, args.seed)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
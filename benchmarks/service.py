@@ -0,0 +1,100 @@
+"""
+Helpers for benchmarks that drive the running services: a throwaway user in
+the service's own schema, and fastapi-crud (uvicorn) or flask-history started
+as subprocesses.
+"""
+
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import REPO_ROOT, connect
+
+SERVICE_DIR = os.path.join(REPO_ROOT, "fastapi-crud")
+FLASK_DIR = os.path.join(REPO_ROOT, "flask-history")
+sys.path.insert(0, SERVICE_DIR)
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+def seed_user(transactions=0):
+    """Create a bench user with ``transactions`` synthetic rows; returns (user_id, email)"""
+    email = f"bench-{uuid.uuid4().hex[:8]}@bench.local"
+    conn = connect(search_path="expense")
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO users (name, email, password) VALUES ('Bench', %s, 'x') RETURNING user_id",
+            (email,),
+        )
+        user_id = cursor.fetchone()[0]
+        cursor.execute("""
+            INSERT INTO transactions (name, amount, date, type, user_id)
+            SELECT 'Bench ' || g, 1 + g %% 500, now() - make_interval(days => g %% 365),
+                   CASE WHEN g %% 4 = 0 THEN 'income' ELSE 'expense' END, %s
+            FROM generate_series(1, %s) g
+        """, (user_id, transactions))
+    conn.commit()
+    conn.close()
+    return user_id, email
+
+def drop_user(user_id):
+    """Delete a bench user and (by cascade) its transactions and rollups"""
+    conn = connect(search_path="expense")
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+    conn.commit()
+    conn.close()
+
+def _settings(env):
+    return {key: str(value).lower() if isinstance(value, bool) else str(value) for key, value in env.items()}
+
+def _wait_healthy(server, url, name):
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(url).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    stop_server(server)
+    raise RuntimeError(f"{name} did not become healthy")
+
+def start_server(port, **env):
+    """Start one uvicorn worker with extra environment ``env`` and wait until /health answers"""
+    settings = _settings(env)
+    settings.setdefault("RUN_MIGRATIONS", "false")
+    settings.setdefault("LOG_LEVEL", "WARNING")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--no-access-log"],
+        cwd=SERVICE_DIR, env=dict(os.environ, **settings),
+    )
+    return _wait_healthy(server, f"http://127.0.0.1:{port}/health", "uvicorn")
+
+FLASK_SERVERS = {
+    # Flask's development server, as started by python app.py
+    "dev": [sys.executable, "app.py"],
+    # The production setup from the Dockerfile, tuned by the GUNICORN_* variables
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+}
+
+def start_flask_server(port, server="dev", **env):
+    """Start flask-history under ``server`` (see FLASK_SERVERS) and wait until its health check answers"""
+    settings = _settings(env)
+    settings["PORT_FLASK"] = str(port)
+    server = subprocess.Popen(
+        FLASK_SERVERS[server], cwd=FLASK_DIR, env=dict(os.environ, **settings),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return _wait_healthy(server, f"http://127.0.0.1:{port}/api/history/health", "flask-history")
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
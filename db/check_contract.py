@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Check that fastapi-crud and flask-history still agree on what they share
+beyond the schema: the write notifications, the ETag format and the replica
+lag query (README.md, "Cross-service contract").
+
+Each service keeps its own copy of that code, so this imports both, each in
+its own interpreter (both have a top-level `app`), and compares them with
+the definition:
+    python3 db/check_contract.py
+Exits 1 on any mismatch. Needs both services' requirements installed; no
+database is used.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The contract, as README.md defines it
+CACHE_CONTROL = 'private, no-cache'
+PAYLOADS = ('42:7', '42:deleted')  # "<user_id>:<version>" and "<user_id>:deleted"
+RESOURCE_PATH, RESOURCE_QUERY = '/p', 'b=2&a=1'
+REPLICA_LAG_SQL = 'SELECT replica_lag_seconds()'  # migration 0006
+
+def reference_resource(path, query):
+    return f"{path}?{'&'.join(sorted(query.split('&')))}"
+
+def reference_etag(user_id, version, resource):
+    return f'"{user_id}-{version}-{hashlib.sha1(resource.encode()).hexdigest()[:16]}"'
+
+# Run inside each service; prints what the service's own code does
+PROBES = {
+    'fastapi-crud': """
+from starlette.requests import Request
+from app.result_cache import INVALIDATION_CHANNEL, InvalidationListener
+from app.replica import REPLICA_LAG_SQL
+from app.versions import CACHE_CONTROL, _resource, user_etag
+resource = _resource(Request({'type': 'http', 'method': 'GET', 'path': PATH, 'query_string': QUERY.encode(), 'headers': []}))
+channel, listener = INVALIDATION_CHANNEL, InvalidationListener(cache, '')
+""",
+    'flask-history': """
+from flask import Flask
+from database import Config
+from replica import REPLICA_LAG_SQL
+from result_cache import InvalidationListener
+from utils.etag import CACHE_CONTROL, _resource, user_etag
+with Flask('probe').test_request_context(f'{PATH}?{QUERY}'):
+    resource = _resource()
+channel, listener = Config.RESULT_CACHE_CHANNEL, InvalidationListener(cache, Config.RESULT_CACHE_CHANNEL)
+""",
+}
+
+PROBE_PREAMBLE = """
+import json, sys
+PATH, QUERY, PAYLOADS = sys.argv[1], sys.argv[2], sys.argv[3:]
+class Cache:
+    enabled = True
+    def __init__(self):
+        self.invalidated = []
+    def invalidate_user(self, user_id):
+        self.invalidated.append(user_id)
+cache = Cache()
+"""
+
+PROBE_REPORT = """
+for payload in PAYLOADS:
+    listener._handle(payload)
+print(json.dumps({
+    'channel': channel,
+    'cache_control': CACHE_CONTROL,
+    'resource': resource,
+    'etag': user_etag(42, 7, resource),
+    'invalidated': cache.invalidated,
+    'replica_lag_sql': REPLICA_LAG_SQL,
+}))
+"""
+
+def probe(service):
+    env = dict(os.environ, JWT_SECRET=os.getenv('JWT_SECRET', 'contract-check'))
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE_PREAMBLE + PROBES[service] + PROBE_REPORT,
+         RESOURCE_PATH, RESOURCE_QUERY, *PAYLOADS],
+        cwd=os.path.join(REPO_ROOT, service), env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f'{service}: probe failed\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    resource = reference_resource(RESOURCE_PATH, RESOURCE_QUERY)
+    expected = {
+        'cache_control': CACHE_CONTROL,
+        'resource': resource,
+        'etag': reference_etag(42, 7, resource),
+        'invalidated': [42] * len(PAYLOADS),
+        'replica_lag_sql': REPLICA_LAG_SQL,
+    }
+    reports = {service: probe(service) for service in PROBES}
+
+    problems = []
+    for service, report in reports.items():
+        for key, value in expected.items():
+            if report[key] != value:
+                problems.append(f'{service}: {key} is {report[key]!r}, the contract says {value!r}')
+    channels = {service: report['channel'] for service, report in reports.items()}
+    if len(set(channels.values())) > 1:
+        problems.append(f'RESULT_CACHE_CHANNEL differs: {channels}')
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        sys.exit(1)
+    print(f"Both services match the contract (channel {channels['fastapi-crud']!r})")
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ CREATE TABLE users (
     created_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Can be converted to monthly range partitions on date, online, with
+-- fastapi-crud/manage_partitions.py migrate (opt-in)
 CREATE TABLE transactions (
     transaction_id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
@@ -14,4 +16,66 @@ CREATE TABLE transactions (
     type VARCHAR(20) CHECK (type IN ('income', 'expense')) NOT NULL,
     emoji VARCHAR(10),
     user_id INT REFERENCES users(user_id) ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- Running totals maintained by fastapi-crud alongside every transaction write
+CREATE TABLE user_balances (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    total_income BIGINT NOT NULL DEFAULT 0,
+    total_expenses BIGINT NOT NULL DEFAULT 0,
+    income_count INT NOT NULL DEFAULT 0,
+    expense_count INT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE user_monthly_balances (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    total_income BIGINT NOT NULL DEFAULT 0,
+    total_expenses BIGINT NOT NULL DEFAULT 0,
+    income_count INT NOT NULL DEFAULT 0,
+    expense_count INT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month)
+);
+
+-- Per-user hot query indexes (fastapi-crud migration 0003)
+CREATE INDEX ix_transactions_user_date
+    ON transactions (user_id, date DESC, transaction_id DESC) INCLUDE (type, amount);
+CREATE INDEX ix_transactions_user_type
+    ON transactions (user_id, type) INCLUDE (amount);
+
+-- Per-user data version behind both services' ETags (fastapi-crud migration 0004)
+CREATE TABLE user_versions (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Word-prefix search over transaction names (fastapi-crud migration 0005)
+CREATE FUNCTION transaction_search_keys(owner INT, name TEXT) RETURNS TEXT[]
+LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+DECLARE
+    keys TEXT[] := '{}';
+    word TEXT;
+BEGIN
+    FOREACH word IN ARRAY regexp_split_to_array(lower(name), '[^[:alnum:]]+') LOOP
+        FOR len IN 2..least(length(word), 16) LOOP
+            keys := keys || (owner::text || ':' || left(word, len));
+        END LOOP;
+    END LOOP;
+    RETURN keys;
+END
+$$;
+
+CREATE INDEX ix_transactions_name_search
+    ON transactions USING gin (transaction_search_keys(user_id, name));
+
+-- Replica lag behind both services' replica routing (fastapi-crud migration 0006)
+CREATE FUNCTION replica_lag_seconds() RETURNS DOUBLE PRECISION
+LANGUAGE sql AS $$
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= pg_last_wal_receive_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - COALESCE(pg_last_xact_replay_timestamp(), pg_postmaster_start_time()))
+    END::double precision
+$$;
@@ -3,6 +3,9 @@ const jwt = require('jsonwebtoken');
 const { validationResult } = require('express-validator');
 const pool = require('../config/db');
 
+// bcrypt cost for new hashes; stored hashes with fewer rounds are upgraded on login
+const BCRYPT_ROUNDS = parseInt(process.env.BCRYPT_ROUNDS || '12', 10);
+
 const generateToken = (payload) => {
   return jwt.sign(payload, process.env.JWT_SECRET, { expiresIn: '24h' });
 };
@@ -37,8 +40,7 @@ const signup = async (req, res) => {
     }
 
     // Hash password
-    const saltRounds = 12;
-    const hashedPassword = await bcrypt.hash(password, saltRounds);
+    const hashedPassword = await bcrypt.hash(password, BCRYPT_ROUNDS);
 
     // Create user
     const newUser = await pool.query(
@@ -79,6 +81,15 @@ const signup = async (req, res) => {
   }
 };
 
+const rehashPassword = async (user, password) => {
+  const newHash = await bcrypt.hash(password, BCRYPT_ROUNDS);
+  // Only replace the hash that was verified, never a password changed in the meantime
+  await pool.query(
+    'UPDATE users SET password = $1 WHERE user_id = $2 AND password = $3',
+    [newHash, user.user_id, user.password]
+  );
+};
+
 const login = async (req, res) => {
   try {
     // Check validation errors
@@ -136,6 +147,13 @@ const login = async (req, res) => {
       refreshToken
     });
 
+    // Upgrade a hash stored with an older cost, after responding so the login isn't slowed down
+    if (bcrypt.getRounds(user.password) < BCRYPT_ROUNDS) {
+      rehashPassword(user, password).catch((error) => {
+        console.error('Password rehash error:', error);
+      });
+    }
+
   } catch (error) {
     console.error('Login error:', error);
     res.status(500).json({
@@ -2,17 +2,18 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, TokenData
+from sqlalchemy import update
+from sqlalchemy.orm import Session, make_transient_to_detached
+from app.database import get_db, run_db, sync_session
+from app.hashing import password_hasher
+from app.models import User
+from app.token_cache import token_cache
 import os
 from dotenv import load_dotenv
 import logging
 
-# Add logging for debugging
-logging.basicConfig(level=logging.DEBUG)
+# Level and handlers are configured by the application (LOG_LEVEL in app.main)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
@@ -22,27 +23,43 @@ SECRET_KEY = os.getenv("JWT_SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Debug log the secret key
-logger.debug(f"JWT_SECRET loaded: {SECRET_KEY is not None}")
+if SECRET_KEY is None:
+    logger.warning("JWT_SECRET is not set; all tokens will be rejected")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt runs in app.hashing's process pool, never in a request worker
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def verify_password(plain_password, hashed_password):
+    valid, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+    return valid
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
+def save_password_hash(db: Session, user_id: int, old_hash: str, new_hash: str):
+    # Only replaces the hash that was verified, never a password changed in the meantime
+    db.execute(
+        update(User)
+        .where(User.user_id == user_id, User.password == old_hash)
+        .values(password=new_hash)
+    )
+    db.commit()
+
+async def authenticate_user(db, email: str, password: str):
+    user = await run_db(db, get_user_by_email, email)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password)
+    if not valid:
         return False
+    if new_hash is not None:
+        # Stored with an older cost: upgrade it now that the plain password is at hand
+        await run_db(db, save_password_hash, user.user_id, user.password, new_hash)
+        user.password = new_hash
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -55,9 +72,43 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def verify_access_token(token: str) -> Optional[dict]:
+    """Verify a JWT once and return its claims, or None if the token is invalid"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.debug("JWT rejected: %s", e)
+        return None
+    
+def email_from_claims(payload: dict) -> Optional[str]:
+    # Handle both FastAPI format (sub: email) and Express format (email field)
+    email = payload.get("sub") or payload.get("email")
+    if email is None:
+        logger.debug("JWT has no sub or email claim")
+    return email
+
+def decode_access_token(token: str) -> Optional[str]:
+    """Verify a JWT once and return the user's email, or None if the token is invalid"""
+    payload = verify_access_token(token)
+    return email_from_claims(payload) if payload is not None else None
+
+def user_snapshot(user: User) -> dict:
+    """Column values of a user, as stored in the token cache"""
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+def get_user_snapshot(db: Session, email: str) -> Optional[dict]:
+    user = get_user_by_email(db, email)
+    return user_snapshot(user) if user is not None else None
+
+def user_from_snapshot(db: Session, snapshot: dict) -> User:
+    """Attach a cached user to the session as a persistent object, without a SELECT"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -65,40 +116,23 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        token = credentials.credentials
-        logger.debug(f"Token received: {token[:50]}...")
-        
-        # First try to get unverified claims to see token structure
-        try:
-            unverified = jwt.get_unverified_claims(token)
-            logger.debug(f"Unverified payload: {unverified}")
-        except Exception as e:
-            logger.debug(f"Could not get unverified claims: {e}")
-        
-        # Now decode with verification
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        logger.debug(f"Decoded payload: {payload}")
-        
-        # Handle both FastAPI format (sub: email) and Express format (email field)
-        email: str = payload.get("sub") or payload.get("email")
-        logger.debug(f"Extracted email: {email}")
-        
-        if email is None:
-            logger.debug("No email found in token")
-            raise credentials_exception
-            
-        token_data = TokenData(email=email)
-    except JWTError as e:
-        logger.debug(f"JWT Error: {e}")
-        raise credentials_exception
+    token = credentials.credentials
+    snapshot = token_cache.get(token)
+    if snapshot is not None:
+        # merge(load=False) never touches the database, so no threadpool hop is needed
+        return user_from_snapshot(sync_session(db), snapshot)
     
-    user = get_user_by_email(db, email=token_data.email)
-    logger.debug(f"User lookup result: {user.email if user else 'None'}")
+    payload = verify_access_token(token)
+    email = email_from_claims(payload) if payload is not None else None
+    if email is None:
+        raise credentials_exception
     
-    if user is None:
-        logger.debug("User not found in database")
+    # The lookup returns a snapshot rather than the row: run_db releases the
+    # session's connection when it returns, and the user is re-attached below
+    snapshot = await run_db(db, get_user_snapshot, email)
+    if snapshot is None:
+        logger.debug("No user found for authenticated email")
         raise credentials_exception
     
-    logger.debug("Authentication successful")
-    return user
\ No newline at end of file
+    token_cache.put(token, snapshot["user_id"], snapshot, token_exp=payload.get("exp"))
+    return user_from_snapshot(sync_session(db), snapshot)
\ No newline at end of file
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+from typing import Any, Dict
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models import Transaction, UserMonthlyBalance
+from app.result_cache import closed_month_cache, result_cache
+from app.utils import month_range
+
+BREAKDOWN_DIMENSIONS = ("name", "emoji")
+
+# Most names/emojis a breakdown lists before folding the rest into "other"
+MAX_BREAKDOWN_ITEMS = 20
+
+def get_breakdown(db: Session, user_id: int, year: int, month: int, by: str, transaction_type: str, limit: int) -> Dict[str, Any]:
+    """
+    The user's top ``limit`` names (or emojis) by amount among a month's
+    ``transaction_type`` transactions, with everything else summed as "other".
+
+    The current (and any future) month is cached like the monthly summary,
+    until the user's next write. Closed months go to closed_month_cache under
+    the updated_on of the month's rollup row, which every write to that month
+    moves (app.rollups), so a backdated edit makes the next request recompute
+    while writes to other months leave the entry alone.
+    """
+    name = f"breakdown:{year}-{month:02d}:{by}:{transaction_type}:{limit}"
+    month_start, _ = month_range(year, month)
+    today = date.today()
+    compute = lambda: _compute_breakdown(db, user_id, year, month, by, transaction_type, limit)
+    if month_start >= datetime(today.year, today.month, 1):
+        return result_cache.get_or_compute(user_id, name, compute)
+
+    # Read before the data: a write landing in between can only make the
+    # stored result newer than its key, never older
+    written = db.query(UserMonthlyBalance.updated_on).filter(
+        UserMonthlyBalance.user_id == user_id,
+        UserMonthlyBalance.month == month_start.date()
+    ).scalar()
+    stamp = written.isoformat() if written is not None else "none"
+    return closed_month_cache.get_or_compute(user_id, f"{name}:{stamp}", compute)
+
+def _compute_breakdown(db: Session, user_id: int, year: int, month: int, by: str, transaction_type: str, limit: int) -> Dict[str, Any]:
+    month_start, next_month_start = month_range(year, month)
+    key = getattr(Transaction, by)
+    amount = func.sum(Transaction.amount)
+    count = func.count()
+
+    # One GROUP BY with LIMIT; the window sums run over every group before
+    # the LIMIT, so the month's totals (and "other") come from the same scan
+    rows = db.execute(
+        select(key, amount, count, func.sum(amount).over(), func.sum(count).over())
+        .where(
+            Transaction.user_id == user_id,
+            Transaction.type == transaction_type,
+            Transaction.date >= month_start,
+            Transaction.date < next_month_start
+        )
+        .group_by(key)
+        .order_by(amount.desc(), key)
+        .limit(limit)
+    ).all()
+
+    total = int(rows[0][3]) if rows else 0
+    total_count = int(rows[0][4]) if rows else 0
+    items = [
+        {"key": group, "amount": int(group_amount), "count": group_count, "share": _share(group_amount, total)}
+        for group, group_amount, group_count, _, _ in rows
+    ]
+    other_amount = total - sum(item["amount"] for item in items)
+    other_count = total_count - sum(item["count"] for item in items)
+
+    return {
+        "year": year,
+        "month": month,
+        "by": by,
+        "type": transaction_type,
+        "total": total,
+        "count": total_count,
+        "items": items,
+        "other": {"amount": other_amount, "count": other_count, "share": _share(other_amount, total)}
+    }
+
+def _share(amount: int, total: int) -> float:
+    """``amount`` as a fraction of ``total``, rounded to 4 places (0 when there is no total)"""
+    return round(amount / total, 4) if total else 0.0
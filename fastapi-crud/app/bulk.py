@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.models import Transaction, TransactionFilter, TransactionImport
+from app.rollups import RollupDelta
+from app.versions import bump_user_version
+from app.utils import validate_transaction_type
+
+# Rows accepted by one bulk request / upload, and rows per INSERT statement
+MAX_BULK_ROWS = 10000
+BULK_BATCH_SIZE = 500
+
+UPLOAD_FORMATS = ("csv", "ndjson")
+
+class BulkImport:
+    """
+    Validates and inserts a list of transaction rows for one user.
+
+    Rows are addressed by their position in the request (0-based ``index``).
+    Invalid rows are reported in ``errors`` and never reach the database; the
+    rest are inserted in batches, and a batch the database rejects is retried
+    row by row so only the offending rows fail.
+    """
+
+    def __init__(self, user_id: int, batch_size: int = BULK_BATCH_SIZE):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.transaction_ids: Dict[int, int] = {}
+        self.errors: Dict[int, str] = {}
+        self._rows: List[Tuple[int, Dict[str, Any]]] = []
+
+    def add_error(self, index: int, error: str):
+        self.errors[index] = error
+
+    def add_row(self, index: int, data: Any):
+        """Validate one raw row with the same rules as POST /create"""
+        try:
+            row = TransactionImport.model_validate(data)
+        except ValidationError as e:
+            self.add_error(index, _format_validation_error(e))
+            return
+        if not validate_transaction_type(row.type):
+            self.add_error(index, "Transaction type must be 'income' or 'expense'")
+            return
+
+        self._rows.append((index, {
+            "name": row.name,
+            "amount": row.amount,
+            "type": row.type.lower(),
+            "emoji": row.emoji,
+            "date": row.date,
+            "user_id": self.user_id,
+        }))
+
+    def run(self, db: Session):
+        """Insert the valid rows and update the rollups in the caller's transaction (does not commit)"""
+        if not self._rows:
+            return
+
+        # Rows without a date get the time the server default would have given them
+        now = db.execute(select(func.localtimestamp())).scalar()
+        for _, values in self._rows:
+            if values["date"] is None:
+                values["date"] = now
+
+        rollup = RollupDelta(self.user_id)
+        for start in range(0, len(self._rows), self.batch_size):
+            batch = self._rows[start:start + self.batch_size]
+            try:
+                with db.begin_nested():
+                    ids = _insert(db, [values for _, values in batch])
+            except DBAPIError:
+                ids = self._insert_one_by_one(db, batch)
+
+            for (index, values), inserted in zip(batch, ids):
+                if inserted is not None:
+                    transaction_id, when = inserted
+                    self.transaction_ids[index] = transaction_id
+                    # Bucketed by the date as stored, like the other rollup updates
+                    rollup.add(when, values["type"], values["amount"])
+        rollup.apply(db)
+
+    def _insert_one_by_one(self, db: Session, batch) -> List[Any]:
+        ids = []
+        for index, values in batch:
+            try:
+                with db.begin_nested():
+                    ids.extend(_insert(db, [values]))
+            except DBAPIError as e:
+                self.add_error(index, _format_db_error(e))
+                ids.append(None)
+        return ids
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "created": len(self.transaction_ids),
+            "failed": len(self.errors),
+            "transaction_ids": [self.transaction_ids[i] for i in sorted(self.transaction_ids)],
+            "errors": [{"index": i, "error": self.errors[i]} for i in sorted(self.errors)],
+        }
+
+def _insert(db: Session, rows: List[Dict[str, Any]]) -> List[Tuple[int, Any]]:
+    """(transaction_id, date) of each inserted row, in the order of ``rows``"""
+    # executemany with RETURNING is sent as multi-row INSERT ... VALUES statements;
+    # sort_by_parameter_order keeps the returned rows aligned with the input rows
+    result = db.execute(
+        insert(Transaction).returning(Transaction.transaction_id, Transaction.date, sort_by_parameter_order=True),
+        rows,
+    )
+    return [tuple(row) for row in result]
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()
+    )
+
+def _format_db_error(e: DBAPIError) -> str:
+    message = str(e.orig).strip().splitlines()[0]
+    # asyncpg errors are wrapped as "<class '...'>: message"
+    if message.startswith("<class ") and ">: " in message:
+        message = message.split(">: ", 1)[1]
+    return message
+
+def parse_csv(content: str) -> List[Dict[str, Any]]:
+    """Rows of a CSV file with a header (name, amount, type and optionally emoji, date)"""
+    rows = []
+    for record in csv.DictReader(io.StringIO(content)):
+        # Empty optional cells mean "not given"
+        rows.append({key.strip(): value for key, value in record.items()
+                     if key is not None and value not in (None, "")})
+    return rows
+
+def parse_ndjson(content: str) -> List[Any]:
+    """One JSON object per line; unparseable lines become ValueError entries"""
+    rows = []
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError as e:
+            rows.append(ValueError(f"Invalid JSON: {e}"))
+    return rows
+
+def import_transactions(db: Session, user_id: int, rows: List[Any]) -> Dict[str, Any]:
+    """Validate and insert ``rows`` for a user, commit, and return the per-row outcome"""
+    bulk = BulkImport(user_id)
+    for index, row in enumerate(rows):
+        if isinstance(row, ValueError):
+            bulk.add_error(index, str(row))
+        else:
+            bulk.add_row(index, row)
+
+    bulk.run(db)
+    result = bulk.result()
+    if result["created"]:
+        bump_user_version(db, user_id)
+    db.commit()
+    return result
+
+# ----------------------------
+# Batch update and delete
+# ----------------------------
+
+def filter_conditions(user_id: int, criteria: TransactionFilter) -> List[Any]:
+    """
+    WHERE conditions for a batch filter, always scoped to ``user_id``.
+
+    Raises ValueError when the filter selects nothing more specific than
+    "every transaction of the user".
+    """
+    conditions = []
+    if criteria.transaction_ids is not None:
+        conditions.append(Transaction.transaction_id.in_(criteria.transaction_ids))
+    if criteria.from_date is not None:
+        conditions.append(Transaction.date >= criteria.from_date)
+    if criteria.to_date is not None:
+        conditions.append(Transaction.date < criteria.to_date + timedelta(days=1))
+    if criteria.type is not None:
+        conditions.append(Transaction.type == criteria.type.lower())
+    if criteria.name_contains:
+        conditions.append(Transaction.name.icontains(criteria.name_contains, autoescape=True))
+
+    if not conditions:
+        raise ValueError("filter needs at least one of transaction_ids, from_date, to_date, type, name_contains")
+    return [Transaction.user_id == user_id] + conditions
+
+def _batch_result(criteria: TransactionFilter, transaction_ids: List[int]) -> Dict[str, Any]:
+    matched = set(transaction_ids)
+    return {
+        "count": len(transaction_ids),
+        "transaction_ids": sorted(transaction_ids),
+        "not_found": sorted(set(criteria.transaction_ids or ()) - matched),
+    }
+
+def update_transactions(db: Session, user_id: int, criteria: TransactionFilter, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply ``changes`` to every matching transaction in one UPDATE ... RETURNING and commit.
+
+    The matching rows are locked and their previous date/type/amount read in
+    the same statement, so the rollups can be adjusted without re-reading them.
+    """
+    old = select(
+        Transaction.transaction_id, Transaction.date, Transaction.type, Transaction.amount
+    ).where(*filter_conditions(user_id, criteria)).with_for_update().cte("old")
+
+    rows = db.execute(
+        update(Transaction)
+        .where(Transaction.transaction_id == old.c.transaction_id)
+        .values(**changes)
+        .returning(
+            Transaction.transaction_id, old.c.date, old.c.type, old.c.amount, Transaction.type, Transaction.amount
+        )
+    ).all()
+
+    rollup = RollupDelta(user_id)
+    for _, when, old_type, old_amount, new_type, new_amount in rows:
+        rollup.remove(when, old_type, old_amount)
+        rollup.add(when, new_type, new_amount)
+    rollup.apply(db)
+    if rows:
+        bump_user_version(db, user_id)
+    db.commit()
+
+    return _batch_result(criteria, [row[0] for row in rows])
+
+def delete_transactions(db: Session, user_id: int, criteria: TransactionFilter) -> Dict[str, Any]:
+    """Delete every matching transaction in one DELETE ... RETURNING and commit"""
+    rows = db.execute(
+        delete(Transaction)
+        .where(*filter_conditions(user_id, criteria))
+        .returning(Transaction.transaction_id, Transaction.date, Transaction.type, Transaction.amount)
+    ).all()
+
+    rollup = RollupDelta(user_id)
+    for _, when, transaction_type, amount in rows:
+        rollup.remove(when, transaction_type, amount)
+    rollup.apply(db)
+    if rows:
+        bump_user_version(db, user_id)
+    db.commit()
+
+    return _batch_result(criteria, [row[0] for row in rows])
@@ -0,0 +1,134 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, AsyncIterator, Iterable, Optional
+from anyio import CancelScope
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from app.database import REPLICA_ERRORS, async_engine, engine, replica_async_engine, replica_engine
+from app.models import Transaction
+from app.replica import replica_router
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ("transaction_id", "date", "type", "name", "amount", "emoji")
+
+# Rows fetched from the server-side cursor (and written to the response) at a time
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# An export holds a pooled connection for as long as the client keeps reading,
+# so only this many run at once per worker; the rest wait for a slot
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", "2"))
+_export_slots: Optional[asyncio.Semaphore] = None
+
+def export_query(
+    user_id: int,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    transaction_type: Optional[str] = None
+):
+    """A user's transactions in chronological order, optionally limited to the days [from_date, to_date] and a type"""
+    query = select(*(getattr(Transaction, column) for column in EXPORT_COLUMNS)).where(
+        Transaction.user_id == user_id
+    )
+    if from_date is not None:
+        query = query.where(Transaction.date >= from_date)
+    if to_date is not None:
+        query = query.where(Transaction.date < to_date + timedelta(days=1))
+    if transaction_type is not None:
+        query = query.where(Transaction.type == transaction_type)
+    return query.order_by(Transaction.date, Transaction.transaction_id)
+
+def format_rows(rows: Iterable[Any], export_format: str) -> str:
+    """Render rows (tuples in EXPORT_COLUMNS order) as CSV lines or NDJSON"""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        return buffer.getvalue()
+
+    return "".join(
+        json.dumps({
+            column: value.isoformat() if isinstance(value, datetime) else value
+            for column, value in zip(EXPORT_COLUMNS, row)
+        }) + "\n"
+        for row in rows
+    )
+
+async def stream_export(
+    query, export_format: str, chunk_size: int = EXPORT_CHUNK_SIZE, replica: bool = False
+) -> AsyncIterator[str]:
+    """
+    Yield the export chunk by chunk from a server-side cursor.
+
+    Only one chunk of rows is in memory at a time. If the client disconnects,
+    Starlette cancels the response and the connection is closed here and
+    returned to the pool; the close is shielded from that cancellation, and
+    on the sync engine only runs once an in-flight fetch has returned.
+
+    With ``replica`` the rows come from the read replica, or from the primary
+    when the replica can't be connected to. Nothing is sent before the
+    connection is open; a failure after that ends the response early.
+    """
+    global _export_slots
+    if _export_slots is None:
+        _export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+    async with _export_slots:
+        query = query.execution_options(yield_per=chunk_size)
+        if async_engine is not None:
+            conn = await _connect_async(replica)
+            try:
+                if export_format == "csv":
+                    yield format_rows([EXPORT_COLUMNS], "csv")
+                result = await conn.stream(query)
+                async for rows in result.partitions():
+                    yield format_rows(rows, export_format)
+            finally:
+                with CancelScope(shield=True):
+                    await conn.close()
+            return
+
+        # psycopg2 runs yield_per through a named cursor; checkout, execute
+        # and every fetch happen in the threadpool so the event loop never blocks
+        conn = await run_in_threadpool(_connect, replica)
+        try:
+            if export_format == "csv":
+                yield format_rows([EXPORT_COLUMNS], "csv")
+            partitions = (await run_in_threadpool(conn.execute, query)).partitions()
+            while True:
+                rows = await run_in_threadpool(next, partitions, None)
+                if rows is None:
+                    break
+                yield format_rows(rows, export_format)
+        finally:
+            # A cancelled run_in_threadpool still waits for its thread, so no
+            # fetch is using the connection by now; closing the named cursor is
+            # a round trip to the server, so it goes to the threadpool as well
+            with CancelScope(shield=True):
+                await run_in_threadpool(conn.close)
+
+def _connect(replica: bool):
+    if replica:
+        try:
+            return replica_engine.connect()
+        except REPLICA_ERRORS:
+            logger.warning("Read replica failed; exporting from the primary", exc_info=True)
+            replica_router.replica_failed()
+    return engine.connect()
+
+async def _connect_async(replica: bool):
+    if replica:
+        try:
+            return await replica_async_engine.connect()
+        except REPLICA_ERRORS:
+            logger.warning("Read replica failed; exporting from the primary", exc_info=True)
+            replica_router.replica_failed()
+    return await async_engine.connect()
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost: a fixed BCRYPT_ROUNDS, or (when unset) the most rounds that hash
+# within BCRYPT_TARGET_MS on this host, measured at startup. Never below
+# BCRYPT_MIN_ROUNDS, which matches express-auth's signup cost
+BCRYPT_ROUNDS = os.getenv("BCRYPT_ROUNDS")
+BCRYPT_TARGET_MS = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", "12"))
+BCRYPT_MAX_ROUNDS = int(os.getenv("BCRYPT_MAX_ROUNDS", "16"))
+
+# Hashing runs in its own processes, so a burst of logins or password changes
+# can't starve the threadpool and event loop that serve everything else.
+# HASH_WORKERS=0 hashes in the request threadpool instead
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(2, os.cpu_count() or 1))))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", "32"))  # queued + running jobs per process
+HASH_QUEUE_TIMEOUT = float(os.getenv("HASH_QUEUE_TIMEOUT", "5"))  # seconds to wait for a slot before a 503
+
+CALIBRATION_ROUNDS = 10
+
+# Runs inside the pool's worker processes
+
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    # min_rounds makes needs_update() flag hashes weaker than the current cost
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed)
+
+def _time_hash(rounds: int) -> float:
+    started = time.perf_counter()
+    _context(rounds).hash("calibration")
+    return time.perf_counter() - started
+
+def rounds_for_target(seconds: float, measured_rounds: int, target_ms: float = BCRYPT_TARGET_MS,
+                      min_rounds: int = BCRYPT_MIN_ROUNDS, max_rounds: int = BCRYPT_MAX_ROUNDS) -> int:
+    """The most rounds that fit in ``target_ms``, given one hash at ``measured_rounds`` took ``seconds``"""
+    # Every extra round doubles bcrypt's cost
+    rounds = measured_rounds + math.floor(math.log2(target_ms / 1000 / seconds))
+    return max(min_rounds, min(max_rounds, rounds))
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification in a size-limited process pool (or the
+    request threadpool, with ``workers=0``).
+
+    At most ``max_pending`` jobs are queued or running per process; further
+    callers wait up to ``queue_timeout`` seconds for a slot and then get a
+    503 with Retry-After. The pool and the calibrated cost are set up by
+    start() (on startup), or lazily on first use.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 32, queue_timeout: float = 5.0,
+                 rounds: Optional[int] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.rounds = rounds
+        self.calibrated = rounds is None
+        self.calibration_ms: Optional[float] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._started = False
+        self.pending = 0
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+        self.rejected = 0
+
+    async def start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._started:
+                return
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._executor = self._new_executor() if self.workers > 0 else None
+            if self.rounds is None:
+                # Best of two, so the first job's process start-up isn't counted
+                seconds = min([await self._run(_time_hash, CALIBRATION_ROUNDS) for _ in range(2)])
+                self.calibration_ms = round(seconds * 1000, 1)
+                self.rounds = rounds_for_target(seconds, CALIBRATION_ROUNDS)
+                logger.info("bcrypt cost set to %d rounds (%.1f ms at %d rounds, target %.0f ms)",
+                            self.rounds, self.calibration_ms, CALIBRATION_ROUNDS, BCRYPT_TARGET_MS)
+            self._started = True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._started = False
+
+    async def hash(self, password: str) -> str:
+        """Hash a password at the current cost"""
+        await self._ensure_started()
+        hashed = await self._submit(_hash, password, self.rounds)
+        self.hashes += 1
+        return hashed
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against its stored hash.
+
+        Returns (valid, new_hash): new_hash is a fresh hash of the password
+        when it is valid but the stored hash uses outdated parameters (fewer
+        rounds than the current cost), to be saved in place of the old one.
+        """
+        await self._ensure_started()
+        valid, new_hash = await self._submit(_verify_and_update, password, hashed, self.rounds)
+        self.verifications += 1
+        self.rehashes += new_hash is not None
+        return valid, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "calibrated": self.calibrated,
+            "calibration_ms": self.calibration_ms,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "hashes": self.hashes,
+            "verifications": self.verifications,
+            "rehashes": self.rehashes,
+            "rejected": self.rejected,
+        }
+
+    async def _ensure_started(self):
+        if not self._started:
+            await self.start()
+
+    async def _submit(self, fn, *args):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, try again shortly",
+                headers={"Retry-After": str(max(1, math.ceil(self.queue_timeout)))},
+            )
+        try:
+            return await self._run(fn, *args)
+        finally:
+            self._slots.release()
+
+    async def _run(self, fn, *args):
+        self.pending += 1
+        try:
+            if self._executor is None:
+                return await run_in_threadpool(fn, *args)
+            try:
+                return await asyncio.wrap_future(self._executor.submit(fn, *args))
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); replace the pool and try once more
+                logger.warning("Password hashing pool broke; starting a new one", exc_info=True)
+                self._executor = self._new_executor()
+                return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            self.pending -= 1
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the service process runs threads (cache listener, DB pool)
+        # whose locks must not be copied mid-use into the workers
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+password_hasher = PasswordHasher(
+    HASH_WORKERS,
+    HASH_MAX_PENDING,
+    HASH_QUEUE_TIMEOUT,
+    rounds=int(BCRYPT_ROUNDS) if BCRYPT_ROUNDS else None,
+)
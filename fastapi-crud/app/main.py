@@ -1,19 +1,40 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import users, transactions
-from app.database import engine, Base
+from app.database import DATABASE_URL, engine, async_engine, replica_engine, replica_async_engine, get_pool_stats
+from app.migrations import run_migrations
+from app.token_cache import token_cache
+from app.hashing import password_hasher
+from app.result_cache import InvalidationListener, closed_month_cache, result_cache
+from app.replica import replica_router
+from app.serialization import DefaultResponse
+from app.metrics import (
+    MetricsMiddleware,
+    instrument_engine,
+    register_cache_collector,
+    register_pool_collector,
+    render_metrics
+)
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Logging level for the whole service (DEBUG, INFO, WARNING, ...)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
+# Apply pending schema migrations on startup (disable when migrating from a deploy step instead)
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "true").lower() == "true"
+
+# Prometheus metrics on /metrics (per worker process)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 app = FastAPI(
     title="Expense Tracker API",
     description="A FastAPI backend for expense tracking",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultResponse
 )
 
 origins = [
@@ -33,6 +54,68 @@ app.add_middleware(
     expose_headers=["*"],
     max_age=3600,  # Cache preflight requests for 1 hour
 )
+
+if METRICS_ENABLED:
+    instrument_engine(engine)
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine)
+    if replica_engine is not None:
+        instrument_engine(replica_engine)
+    if replica_async_engine is not None:
+        instrument_engine(replica_async_engine.sync_engine)
+    register_pool_collector(get_pool_stats)
+    register_cache_collector(result_cache.stats)
+    register_cache_collector(closed_month_cache.stats, "closed_month_cache")
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
+@app.on_event("startup")
+def apply_migrations():
+    if RUN_MIGRATIONS:
+        run_migrations(engine)
+
+# Drops cached aggregates and tokens, and keeps the user's reads off the
+# replica for a while, whenever any fastapi-crud worker commits a write for
+# their user
+cache_listener = InvalidationListener(result_cache, DATABASE_URL, replica_router=replica_router, token_cache=token_cache)
+
+@app.on_event("startup")
+def start_cache_listener():
+    cache_listener.start()
+
+@app.on_event("shutdown")
+def stop_cache_listener():
+    cache_listener.stop()
+
+@app.on_event("startup")
+def start_replica_router():
+    # Measures the replica's lag in the background (no-op without DB_REPLICA_URL)
+    replica_router.start()
+
+@app.on_event("shutdown")
+def stop_replica_router():
+    replica_router.stop()
+
+@app.on_event("startup")
+async def start_password_hasher():
+    # Starts the bcrypt worker processes and measures the cost before the first request
+    await password_hasher.start()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    if async_engine is not None:
+        await async_engine.dispose()
+    if replica_async_engine is not None:
+        await replica_async_engine.dispose()
+
 # Include routers
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(transactions.router, prefix="/api/transactions", tags=["Transactions"])
@@ -43,7 +126,15 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "auth_cache": token_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "closed_month_cache": closed_month_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "read_replica": replica_router.stats(),
+        "db_pool": get_pool_stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
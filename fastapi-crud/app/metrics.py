@@ -0,0 +1,169 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.pool_metrics import CHECKOUT_BUCKETS_MS
+
+# Route label for requests that matched no route, so unknown paths can't blow up label cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter("http_requests", "Requests by route and status code", ["method", "route", "status"])
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests currently being served")
+DB_QUERIES = Counter("db_queries", "Database queries by the route that issued them", ["route"])
+DB_QUERY_SECONDS = Counter("db_query_seconds", "Time spent in database queries by route", ["route"])
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Database queries issued while serving one request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Database time spent while serving one request",
+    ["route"], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+class _RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+# Set for the duration of each request; the object is shared (not copied) with
+# the threadpool and run_sync greenlets, so queries made there are counted too
+_request_db_stats: ContextVar[Optional[_RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+def instrument_engine(engine: Engine):
+    """Time every statement ``engine`` executes and attribute it to the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency, status codes, in-flight
+    requests and the DB queries/time each request caused.
+
+    Latency covers the whole response, including streamed bodies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = _RequestDbStats()
+        token = _request_db_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            _request_db_stats.reset(token)
+            method = scope["method"]
+            route = _route_label(scope)
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(route).observe(stats.seconds)
+            if stats.queries:
+                DB_QUERIES.labels(route).inc(stats.queries)
+                DB_QUERY_SECONDS.labels(route).inc(stats.seconds)
+
+class PoolCollector:
+    """Exports app.pool_metrics statistics for each engine at scrape time"""
+
+    def __init__(self, get_pool_stats):
+        self.get_pool_stats = get_pool_stats
+
+    def collect(self):
+        gauges = {
+            "size": GaugeMetricFamily("db_pool_size", "Connections kept open by the pool", labels=["engine"]),
+            "checked_out": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Open connections beyond pool_size", labels=["engine"]),
+        }
+        counters = {
+            "timeouts": CounterMetricFamily("db_pool_checkout_timeouts", "Checkouts that timed out", labels=["engine"]),
+            "overflow_connects": CounterMetricFamily(
+                "db_pool_overflow_connects", "Connections opened beyond pool_size", labels=["engine"]),
+            "invalidations": CounterMetricFamily(
+                "db_pool_invalidations", "Connections invalidated (dead or disconnected)", labels=["engine"]),
+        }
+        checkout = HistogramMetricFamily(
+            "db_pool_checkout_seconds", "Time to check out a connection, including waits", labels=["engine"])
+
+        for engine_name, stats in self.get_pool_stats().items():
+            for key, family in list(gauges.items()) + list(counters.items()):
+                family.add_metric([engine_name], stats[key])
+            buckets = [
+                (str(bound / 1000) if bound != "+Inf" else "+Inf", stats["checkout_ms_histogram"][f"le_{bound}"])
+                for bound in CHECKOUT_BUCKETS_MS + ("+Inf",)
+            ]
+            checkout.add_metric([engine_name], buckets, stats["checkout_ms_total"] / 1000)
+
+        yield from gauges.values()
+        yield from counters.values()
+        yield checkout
+
+def register_pool_collector(get_pool_stats):
+    REGISTRY.register(PoolCollector(get_pool_stats))
+
+class CacheCollector:
+    """Exports app.result_cache statistics at scrape time, as ``<prefix>_*`` metrics"""
+
+    def __init__(self, get_cache_stats, prefix: str = "result_cache"):
+        self.get_cache_stats = get_cache_stats
+        self.prefix = prefix
+
+    def collect(self):
+        stats = self.get_cache_stats()
+        if not stats["enabled"]:
+            return
+        for key, help_text in (
+            ("hits", "Result cache hits"),
+            ("misses", "Result cache misses"),
+            ("evictions", "Result cache entries evicted to stay within the size limit"),
+            ("invalidations", "Users whose cached results were invalidated"),
+            ("errors", "Result cache backend errors (served uncached)"),
+        ):
+            yield CounterMetricFamily(f"{self.prefix}_{key}", help_text, value=stats.get(key, 0))
+        if "size" in stats:
+            yield GaugeMetricFamily(f"{self.prefix}_size", "Entries in the result cache", value=stats["size"])
+
+def register_cache_collector(get_cache_stats, prefix: str = "result_cache"):
+    REGISTRY.register(CacheCollector(get_cache_stats, prefix))
+
+def render_metrics():
+    """The current metrics in the Prometheus text exposition format, and its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,147 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from app.partitions import create_index_concurrently
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Serialises migration runs across uvicorn workers and deploys
+MIGRATION_LOCK_ID = 724_001
+
+# First line of a migration that must run outside a transaction (e.g. CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_MARKER = "-- migrate:no-transaction"
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    path: str
+
+    @property
+    def sql(self) -> str:
+        with open(self.path) as f:
+            return f.read()
+
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+def discover_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """Return the versioned .sql migrations in ``directory`` ordered by version"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(match.group(1), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations, key=lambda m: int(m.version))
+
+_DOLLAR_QUOTE = re.compile(r"\$\w*\$")
+
+def _split_statements(sql: str) -> List[str]:
+    """
+    Split a script into statements (one per ``;`` at end of line), dropping
+    comment-only chunks. Semicolons inside dollar-quoted bodies ($$ ... $$,
+    e.g. function definitions) don't end a statement.
+    """
+    statements = []
+    pending = []
+    quote = None  # dollar-quote tag we are inside of, if any
+    for chunk in re.split(r";\s*$", sql, flags=re.MULTILINE):
+        for tag in _DOLLAR_QUOTE.findall(chunk):
+            if quote is None:
+                quote = tag
+            elif tag == quote:
+                quote = None
+        pending.append(chunk)
+        if quote is not None:
+            continue
+        lines = [line for line in ";".join(pending).strip().splitlines() if not line.strip().startswith("--")]
+        pending = []
+        if any(line.strip() for line in lines):
+            statements.append("\n".join(lines))
+    return statements
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(32) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+def applied_versions(engine: Engine) -> List[str]:
+    """Versions already recorded in schema_migrations"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    """Migrations that have not been applied yet"""
+    applied = set(applied_versions(engine))
+    return [m for m in discover_migrations() if m.version not in applied]
+
+def run_migrations(engine: Engine) -> List[str]:
+    """
+    Apply pending migrations in version order and return the versions applied.
+
+    Each migration runs in its own transaction together with its
+    schema_migrations row, unless it starts with the no-transaction marker, in
+    which case its statements run one by one in autocommit mode and must be
+    idempotent (IF NOT EXISTS) so an interrupted run can simply be retried.
+    An interrupted CREATE INDEX CONCURRENTLY leaves an invalid index that
+    IF NOT EXISTS would skip, so such statements drop that first
+    (app.partitions.create_index_concurrently).
+    """
+    applied_now = []
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            _ensure_version_table(conn)
+            applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+            for migration in discover_migrations():
+                if migration.version in applied:
+                    continue
+
+                logger.info("Applying migration %s_%s", migration.version, migration.name)
+                cursor = conn.connection.cursor()
+                try:
+                    if migration.transactional:
+                        cursor.execute("BEGIN")
+                        try:
+                            cursor.execute(migration.sql)
+                            cursor.execute(
+                                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                (migration.version, migration.name),
+                            )
+                            cursor.execute("COMMIT")
+                        except Exception:
+                            cursor.execute("ROLLBACK")
+                            raise
+                    else:
+                        for statement in _split_statements(migration.sql):
+                            # Drops an invalid leftover of the same index first; partitioned tables
+                            # (manage_partitions.py) can't be indexed concurrently in one go
+                            if not create_index_concurrently(conn, statement):
+                                cursor.execute(statement)
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (migration.version, migration.name),
+                        )
+                finally:
+                    cursor.close()
+                applied_now.append(migration.version)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    return applied_now
@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, TIMESTAMP, ForeignKey, CheckConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, field_validator
+from typing import Optional, List, Any
+from datetime import date, datetime, timezone
 
 # SQLAlchemy Models
 class User(Base):
@@ -35,6 +35,51 @@ class Transaction(Base):
     user_id = Column(Integer, ForeignKey("expense.users.user_id", ondelete="CASCADE"), nullable=False)
     
     user = relationship("User", back_populates="transactions")
+    
+    # Fetch the server-side date default on flush so rollups can be updated before commit
+    __mapper_args__ = {"eager_defaults": True}
+
+# Indexes for the per-user hot queries (created by migrations/0003_transactions_user_indexes.sql)
+Index(
+    "ix_transactions_user_date",
+    Transaction.user_id, Transaction.date.desc(), Transaction.transaction_id.desc(),
+    postgresql_include=["type", "amount"],
+)
+Index("ix_transactions_user_type", Transaction.user_id, Transaction.type, postgresql_include=["amount"])
+
+class UserBalance(Base):
+    """Running per-user totals, kept in sync with transactions by app.rollups"""
+    __tablename__ = "user_balances"
+    __table_args__ = {'schema': 'expense'}
+    
+    user_id = Column(Integer, ForeignKey("expense.users.user_id", ondelete="CASCADE"), primary_key=True)
+    total_income = Column(BigInteger, nullable=False, server_default="0")
+    total_expenses = Column(BigInteger, nullable=False, server_default="0")
+    income_count = Column(Integer, nullable=False, server_default="0")
+    expense_count = Column(Integer, nullable=False, server_default="0")
+    updated_on = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+class UserMonthlyBalance(Base):
+    """Running per-user, per-month totals, kept in sync with transactions by app.rollups"""
+    __tablename__ = "user_monthly_balances"
+    __table_args__ = {'schema': 'expense'}
+    
+    user_id = Column(Integer, ForeignKey("expense.users.user_id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    total_income = Column(BigInteger, nullable=False, server_default="0")
+    total_expenses = Column(BigInteger, nullable=False, server_default="0")
+    income_count = Column(Integer, nullable=False, server_default="0")
+    expense_count = Column(Integer, nullable=False, server_default="0")
+    updated_on = Column(TIMESTAMP, server_default=func.current_timestamp())
+
+class UserVersion(Base):
+    """Per-user data version, bumped by app.versions on every write and used for ETags"""
+    __tablename__ = "user_versions"
+    __table_args__ = {'schema': 'expense'}
+
+    user_id = Column(Integer, ForeignKey("expense.users.user_id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default="0")
+    updated_on = Column(TIMESTAMP, server_default=func.current_timestamp())
 
 # Pydantic Models for API
 class UserBase(BaseModel):
@@ -64,12 +109,65 @@ class TransactionBase(BaseModel):
 class TransactionCreate(TransactionBase):
     pass
 
+class TransactionImport(TransactionCreate):
+    """A row of a bulk import; imported rows may carry their own date"""
+    date: Optional[datetime] = None
+    
+    @field_validator("date", mode="before")
+    @classmethod
+    def date_only_means_midnight(cls, value):
+        # Bank statements usually carry plain dates (YYYY-MM-DD)
+        if isinstance(value, str) and len(value.strip()) == 10:
+            return value.strip() + "T00:00:00"
+        return value
+
+    @field_validator("date")
+    @classmethod
+    def naive_utc(cls, value):
+        # The column has no time zone: store an offset as the UTC time it
+        # denotes, rather than leave the conversion to the session's TimeZone
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+class TransactionBulkCreate(BaseModel):
+    # Rows are validated one by one so a bad row is reported instead of rejecting the request
+    transactions: List[Any]
+
+class TransactionBulkError(BaseModel):
+    index: int
+    error: str
+
+class TransactionBulkResult(BaseModel):
+    created: int
+    failed: int
+    transaction_ids: List[int]
+    errors: List[TransactionBulkError]
+
 class TransactionUpdate(BaseModel):
     name: Optional[str] = None
     amount: Optional[int] = None
     type: Optional[str] = None
     emoji: Optional[str] = None
 
+class TransactionFilter(BaseModel):
+    """Selects the current user's transactions for a batch update or delete; criteria are ANDed"""
+    transaction_ids: Optional[List[int]] = None
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    type: Optional[str] = None
+    name_contains: Optional[str] = None
+
+class TransactionBatchUpdate(BaseModel):
+    filter: TransactionFilter
+    changes: TransactionUpdate
+
+class TransactionBatchResult(BaseModel):
+    count: int
+    transaction_ids: List[int]
+    # Requested transaction_ids that matched nothing (missing, not the user's, or filtered out)
+    not_found: List[int] = []
+
 class TransactionResponse(TransactionBase):
     transaction_id: int
     date: datetime
@@ -78,6 +176,18 @@ class TransactionResponse(TransactionBase):
     class Config:
         from_attributes = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+class TransactionSearchResult(TransactionResponse):
+    # 3: the name is the query, 2: it starts with the query, 1: other match
+    relevance: int
+
+class TransactionSearchPage(BaseModel):
+    items: List[TransactionSearchResult]
+    next_cursor: Optional[str] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,425 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "expense"
+TABLE = "transactions"
+# Names used while migrating: the partitioned copy being filled, and where the
+# original table is kept once the copy has taken its name
+SHADOW_TABLE = "transactions_partitioned"
+RETIRED_TABLE = "transactions_unpartitioned"
+DEFAULT_PARTITION = "transactions_default"
+SYNC_TRIGGER = "transactions_partition_sync"
+
+# Serialises partition maintenance (cron create-ahead vs a running migration)
+PARTITION_LOCK_ID = 724_002
+
+_INDEX_DEF = re.compile(r"^CREATE (UNIQUE )?INDEX (\S+) ON (?:ONLY )?(\S+) (.*)$")
+_CONCURRENT_INDEX = re.compile(
+    r"^\s*CREATE INDEX CONCURRENTLY IF NOT EXISTS (\w+)\s+ON (\w+)\s+(.*?)\s*$", re.DOTALL | re.IGNORECASE
+)
+
+class PartitioningError(Exception):
+    """The transactions table is not in the state a partitioning step needs"""
+
+def month_start(when: date) -> date:
+    return date(when.year, when.month, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """Monthly partition holding [month, next month): transactions_pYYYY_MM"""
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+def _relkind(conn: Connection, schema: str, table: str) -> Optional[str]:
+    # 'r' plain table, 'p' partitioned table, None if it doesn't exist
+    return conn.execute(text("""
+        SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = :schema AND c.relname = :table
+    """), {"schema": schema, "table": table}).scalar()
+
+def is_partitioned(conn: Connection, schema: str = SCHEMA) -> bool:
+    return _relkind(conn, schema, TABLE) == "p"
+
+@contextmanager
+def maintenance_lock(engine: Engine) -> Iterator[None]:
+    """Hold the partition maintenance advisory lock, failing fast if another run has it"""
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": PARTITION_LOCK_ID}).scalar():
+            raise PartitioningError("Another partition maintenance run is in progress")
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": PARTITION_LOCK_ID})
+
+def list_partitions(conn: Connection, schema: str = SCHEMA, table: str = TABLE) -> List[Dict[str, Any]]:
+    """Partitions of ``table`` with their bounds and estimated row counts, oldest first"""
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), GREATEST(c.reltuples, 0)::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        JOIN pg_namespace n ON n.oid = p.relnamespace
+        WHERE n.nspname = :schema AND p.relname = :table
+        ORDER BY c.relname
+    """), {"schema": schema, "table": table})
+    return [{"name": name, "bounds": bounds, "estimated_rows": estimate} for name, bounds, estimate in rows]
+
+def _create_partition(conn: Connection, schema: str, table: str, month: date) -> bool:
+    """
+    Create and attach the partition for ``month`` unless it exists; returns
+    whether it was created.
+
+    The partition is built standalone and then attached, which only takes a
+    SHARE UPDATE EXCLUSIVE lock on the parent (CREATE TABLE ... PARTITION OF
+    would block every query on it). Rows that already landed in the default
+    partition for that month are moved over first, or the attach would fail.
+    """
+    name = partition_name(month)
+    if _relkind(conn, schema, name) is not None:
+        return False
+    lower, upper = month, add_months(month, 1)
+    conn.execute(text(
+        f"CREATE TABLE {schema}.{name} (LIKE {schema}.{table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    if _relkind(conn, schema, DEFAULT_PARTITION) is not None:
+        moved = conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {schema}.{DEFAULT_PARTITION} WHERE date >= :lower AND date < :upper RETURNING *
+            )
+            INSERT INTO {schema}.{name} SELECT * FROM moved
+        """), {"lower": lower, "upper": upper}).rowcount
+        if moved:
+            logger.info("Moved %d rows for %s out of %s", moved, name, DEFAULT_PARTITION)
+    conn.execute(text(
+        f"ALTER TABLE {schema}.{table} ATTACH PARTITION {schema}.{name} "
+        f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+    ))
+    return True
+
+def _create_partitions(conn: Connection, schema: str, table: str, first: date, last: date) -> List[str]:
+    created = []
+    month = month_start(first)
+    while month <= last:
+        if _create_partition(conn, schema, table, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+def create_ahead(engine: Engine, months: int = 3, schema: str = SCHEMA, today: Optional[date] = None) -> List[str]:
+    """
+    Make sure the partitioned transactions table has partitions for the
+    current month and the next ``months`` months; returns the ones created.
+
+    Run it regularly (e.g. daily from cron): rows for a month without a
+    partition are still accepted, but land in the default partition, where
+    no query can prune them.
+    """
+    current = month_start(today or date.today())
+    with maintenance_lock(engine), engine.begin() as conn:
+        if not is_partitioned(conn, schema):
+            raise PartitioningError(f"{schema}.{TABLE} is not partitioned; run 'migrate' first")
+        created = _create_partitions(conn, schema, TABLE, current, add_months(current, months))
+    for name in created:
+        logger.info("Created partition %s", name)
+    return created
+
+def _drop_invalid_index(conn: Connection, index: str):
+    """
+    Drop ``index`` if an interrupted CREATE INDEX CONCURRENTLY left it behind
+    invalid: IF NOT EXISTS would skip it on retry and it would never be used.
+    Partitioned (parent) indexes are left alone, they are invalid until every
+    partition's index is attached.
+    """
+    invalid = conn.execute(text("""
+        SELECT 1 FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+        WHERE x.indexrelid = to_regclass(:index) AND NOT x.indisvalid AND c.relkind = 'i'
+    """), {"index": index}).scalar()
+    if invalid:
+        logger.warning("Dropping invalid index %s left by an interrupted build", index)
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+
+def create_index_concurrently(conn: Connection, statement: str) -> bool:
+    """
+    Run a migration's ``CREATE INDEX CONCURRENTLY IF NOT EXISTS name ON table ...``
+    against a partitioned table, which Postgres refuses to index concurrently;
+    returns False for any other statement or table, which the caller runs itself.
+
+    The index is created on the parent alone (invalid until complete), built
+    concurrently on each partition, and attached partition by partition. Every
+    step is idempotent, so an interrupted migration can be retried: an invalid
+    index left by an interrupted concurrent build, on a plain table or a
+    partition, is dropped first so it gets rebuilt. ``conn`` must be in
+    autocommit mode.
+    """
+    match = _CONCURRENT_INDEX.match(statement)
+    if not match:
+        return False
+    name, table, definition = match.groups()
+    _drop_invalid_index(conn, name)
+    schema = conn.execute(text("""
+        SELECT n.nspname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.oid = to_regclass(:table) AND c.relkind = 'p'
+    """), {"table": table}).scalar()
+    if schema is None:
+        return False
+
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {schema}.{table} {definition}"))
+    # Partitions attached since (or by an earlier run) may already have theirs
+    indexed = {row[0] for row in conn.execute(text("""
+        SELECT t.relname FROM pg_inherits i
+        JOIN pg_index x ON x.indexrelid = i.inhrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE i.inhparent = CAST(:index AS regclass)
+    """), {"index": f"{schema}.{name}"})}
+    for partition in list_partitions(conn, schema, table):
+        if partition["name"] in indexed:
+            continue
+        child = _suffixed(partition["name"], f"_{name}")
+        logger.info("Building %s on %s", child, partition["name"])
+        _drop_invalid_index(conn, f"{schema}.{child}")
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {schema}.{partition['name']} {definition}"))
+        conn.execute(text(f"ALTER INDEX {schema}.{name} ATTACH PARTITION {schema}.{child}"))
+    return True
+
+# Online migration of an existing, unpartitioned table
+
+def _columns(conn: Connection, schema: str, table: str) -> List[str]:
+    return [row[0] for row in conn.execute(text("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """), {"table": f"{schema}.{table}"})]
+
+def _index_definitions(conn: Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    """(name, definition) of the table's indexes other than its primary key"""
+    return [tuple(row) for row in conn.execute(text("""
+        SELECT c.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = CAST(:table AS regclass) AND NOT i.indisprimary
+        ORDER BY c.relname
+    """), {"table": f"{schema}.{table}"})]
+
+def _suffixed(name: str, suffix: str) -> str:
+    # Identifiers are truncated at 63 bytes
+    return name[:63 - len(suffix)] + suffix
+
+def _create_shadow(conn: Connection, schema: str, months_ahead: int):
+    """Create the partitioned copy of the transactions table and start mirroring writes into it"""
+    null_dates = conn.execute(text(f"SELECT count(*) FROM {schema}.{TABLE} WHERE date IS NULL")).scalar()
+    if null_dates:
+        # The partition key becomes part of the primary key, so it can't be NULL
+        raise PartitioningError(
+            f"{null_dates} transaction(s) have no date; give them one before partitioning"
+        )
+
+    # The primary key of a partitioned table must include the partition key.
+    # transaction_id stays unique in practice: every row still takes it from
+    # the same sequence (INCLUDING DEFAULTS keeps the nextval() default)
+    conn.execute(text(f"""
+        CREATE TABLE {schema}.{SHADOW_TABLE} (
+            LIKE {schema}.{TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+            PRIMARY KEY (transaction_id, date)
+        ) PARTITION BY RANGE (date)
+    """))
+    for name, definition in conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = CAST(:table AS regclass) AND contype = 'f'
+    """), {"table": f"{schema}.{TABLE}"}):
+        conn.execute(text(f"ALTER TABLE {schema}.{SHADOW_TABLE} ADD CONSTRAINT {name} {definition}"))
+
+    # One partition per month of existing data, plus the months ahead, and a
+    # default partition so a write never fails for want of a partition
+    oldest = conn.execute(text(f"SELECT min(date) FROM {schema}.{TABLE}")).scalar()
+    current = month_start(date.today())
+    first = month_start(oldest.date()) if oldest and oldest.date() < current else current
+    _create_partitions(conn, schema, SHADOW_TABLE, first, add_months(current, months_ahead))
+    conn.execute(text(f"CREATE TABLE {schema}.{DEFAULT_PARTITION} PARTITION OF {schema}.{SHADOW_TABLE} DEFAULT"))
+
+    # Same secondary indexes, under temporary names until the swap. Built now,
+    # while the copy is empty: building them later would block the writes the
+    # sync trigger mirrors into it
+    for name, definition in _index_definitions(conn, schema, TABLE):
+        match = _INDEX_DEF.match(definition)
+        if match.group(1):
+            raise PartitioningError(f"Unique index {name} must include date to exist on a partitioned table")
+        conn.execute(text(
+            f"CREATE INDEX {_suffixed(name, '_part')} ON {schema}.{SHADOW_TABLE} {match.group(4)}"
+        ))
+
+    # Mirror every write to the original into the copy. An update is applied as
+    # delete + insert, so a row whose date changes moves to its new partition
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {schema}.{SYNC_TRIGGER}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {schema}.{SHADOW_TABLE}
+                WHERE transaction_id = OLD.transaction_id AND date = OLD.date;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {schema}.{SHADOW_TABLE} SELECT NEW.* ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """))
+    # Waits for in-flight writes to the original to finish, so every row is
+    # either visible to the batch copy or goes through the trigger
+    conn.execute(text(f"""
+        CREATE TRIGGER {SYNC_TRIGGER} AFTER INSERT OR UPDATE OR DELETE ON {schema}.{TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {schema}.{SYNC_TRIGGER}()
+    """))
+
+def _copy_batches(engine: Engine, schema: str, batch_size: int, pause: float) -> Iterator[Tuple[int, int]]:
+    """
+    Copy the original table into the partitioned one in transaction_id order,
+    one committed batch at a time; yields (rows copied, last transaction_id).
+
+    Each batch locks its source rows FOR SHARE, so a concurrent update or
+    delete either finishes first (and the batch copies its result) or waits
+    for the batch to commit (and the trigger then replaces the copied row).
+    """
+    with engine.connect() as conn:
+        columns = ", ".join(_columns(conn, schema, TABLE))
+        first_id, last_id = conn.execute(text(
+            f"SELECT min(transaction_id), max(transaction_id) FROM {schema}.{TABLE}"
+        )).one()
+    after, last_id = (first_id or 1) - 1, last_id or 0
+    while after < last_id:
+        upto = after + batch_size
+        with engine.begin() as conn:
+            copied = conn.execute(text(f"""
+                INSERT INTO {schema}.{SHADOW_TABLE} ({columns})
+                SELECT {columns} FROM {schema}.{TABLE}
+                WHERE transaction_id > :after AND transaction_id <= :upto
+                ORDER BY transaction_id
+                FOR SHARE
+                ON CONFLICT DO NOTHING
+            """), {"after": after, "upto": upto}).rowcount
+        after = upto
+        yield copied, min(upto, last_id)
+        if pause:
+            time.sleep(pause)
+
+def compare_tables(conn: Connection, schema: str = SCHEMA) -> Dict[str, Dict[str, int]]:
+    """Row count, transaction_id and amount totals of the original and the partitioned copy"""
+    # One statement, so both sides are read from the same snapshot
+    totals = "count(*), COALESCE(sum(transaction_id), 0), COALESCE(sum(amount), 0)"
+    row = conn.execute(text(f"""
+        SELECT * FROM (SELECT {totals} FROM {schema}.{TABLE}) original,
+                      (SELECT {totals} FROM {schema}.{SHADOW_TABLE}) partitioned
+    """)).one()
+    keys = ("rows", "transaction_id_sum", "amount_sum")
+    return {"original": dict(zip(keys, row[:3])), "partitioned": dict(zip(keys, row[3:]))}
+
+def _swap(conn: Connection, schema: str, lock_timeout: str):
+    """Put the partitioned copy in place of the original, in one short transaction"""
+    # Fail (and let the caller retry) rather than queue every query behind a
+    # lock that waits on a long-running transaction
+    conn.execute(text(f"SET LOCAL lock_timeout = '{lock_timeout}'"))
+    conn.execute(text(f"LOCK TABLE {schema}.{TABLE} IN ACCESS EXCLUSIVE MODE"))
+
+    indexes = _index_definitions(conn, schema, TABLE)
+    conn.execute(text(f"DROP TRIGGER {SYNC_TRIGGER} ON {schema}.{TABLE}"))
+    conn.execute(text(f"DROP FUNCTION {schema}.{SYNC_TRIGGER}()"))
+
+    conn.execute(text(f"ALTER TABLE {schema}.{TABLE} RENAME TO {RETIRED_TABLE}"))
+    conn.execute(text(f"ALTER TABLE {schema}.{RETIRED_TABLE} RENAME CONSTRAINT {TABLE}_pkey TO {RETIRED_TABLE}_pkey"))
+    for name, _ in indexes:
+        conn.execute(text(f"ALTER INDEX {schema}.{name} RENAME TO {_suffixed(name, '_old')}"))
+
+    conn.execute(text(f"ALTER TABLE {schema}.{SHADOW_TABLE} RENAME TO {TABLE}"))
+    conn.execute(text(f"ALTER TABLE {schema}.{TABLE} RENAME CONSTRAINT {SHADOW_TABLE}_pkey TO {TABLE}_pkey"))
+    for name, _ in indexes:
+        conn.execute(text(f"ALTER INDEX {schema}.{_suffixed(name, '_part')} RENAME TO {name}"))
+
+    # The sequence belongs to whichever table owns it; keep it when the old one is dropped
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:table, 'transaction_id')"),
+                            {"table": f"{schema}.{RETIRED_TABLE}"}).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {schema}.{TABLE}.transaction_id"))
+
+def migrate(engine: Engine, batch_size: int = 10_000, pause: float = 0.0, months_ahead: int = 3,
+            schema: str = SCHEMA, lock_timeout: str = "5s", progress=None) -> Dict[str, Any]:
+    """
+    Convert an unpartitioned transactions table into one range-partitioned
+    by month on ``date``, without taking the service down.
+
+    1. Create transactions_partitioned with the same columns, constraints and
+       indexes, a partition per month of data plus ``months_ahead``, and a
+       default partition; a trigger mirrors writes from here on.
+    2. Copy the existing rows across in batches of ``batch_size``
+       transaction_ids, each in its own transaction, sleeping ``pause``
+       seconds in between to leave the database room for live traffic.
+    3. Check that both tables hold the same rows, then rename the copy to
+       transactions in one short transaction. The original is kept as
+       transactions_unpartitioned (no longer updated) until dropped.
+
+    An interrupted run can be started again: it picks up the existing copy
+    and re-copies into it, skipping rows already there.
+    """
+    with maintenance_lock(engine):
+        with engine.begin() as conn:
+            if is_partitioned(conn, schema):
+                raise PartitioningError(f"{schema}.{TABLE} is already partitioned")
+            if _relkind(conn, schema, RETIRED_TABLE) is not None:
+                raise PartitioningError(f"{schema}.{RETIRED_TABLE} exists; drop it before migrating again")
+            resumed = _relkind(conn, schema, SHADOW_TABLE) is not None
+            if not resumed:
+                _create_shadow(conn, schema, months_ahead)
+
+        copied = 0
+        started = time.perf_counter()
+        for rows, last_id in _copy_batches(engine, schema, batch_size, pause):
+            copied += rows
+            if progress:
+                progress(copied, last_id)
+
+        with engine.begin() as conn:
+            totals = compare_tables(conn, schema)
+        if totals["original"] != totals["partitioned"]:
+            raise PartitioningError(f"Partitioned copy does not match the original: {totals}")
+
+        with engine.begin() as conn:
+            _swap(conn, schema, lock_timeout)
+        with engine.begin() as conn:
+            # Autovacuum analyzes the partitions but never a partitioned parent,
+            # whose statistics plan the queries that span partitions
+            conn.execute(text(f"ANALYZE {schema}.{TABLE}"))
+            partitions = list_partitions(conn, schema)
+
+    return {
+        "resumed": resumed,
+        "copied": copied,
+        "rows": totals["original"]["rows"],
+        "partitions": len(partitions),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+def drop_retired(engine: Engine, schema: str = SCHEMA) -> bool:
+    """Drop the original table kept by migrate(); returns whether there was one"""
+    with maintenance_lock(engine), engine.begin() as conn:
+        if _relkind(conn, schema, RETIRED_TABLE) is None:
+            return False
+        conn.execute(text(f"DROP TABLE {schema}.{RETIRED_TABLE}"))
+        return True
+
+def status(engine: Engine, schema: str = SCHEMA) -> Dict[str, Any]:
+    with engine.connect() as conn:
+        partitioned = is_partitioned(conn, schema)
+        return {
+            "partitioned": partitioned,
+            "partitions": list_partitions(conn, schema) if partitioned else [],
+            "migration_in_progress": _relkind(conn, schema, SHADOW_TABLE) is not None,
+            "retired_table": _relkind(conn, schema, RETIRED_TABLE) is not None,
+        }
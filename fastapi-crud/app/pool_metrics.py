@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import Any, Dict, Type
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; a final +Inf bucket is implied
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class PoolMetrics:
+    """
+    Counters for one SQLAlchemy connection pool: checkout latency histogram,
+    checkout timeouts, overflow connections opened and invalidated connections.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkout_buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.checkout_ms_total = 0.0
+        self.checkout_ms_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.overflow_connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+
+    def observe_checkout(self, elapsed_ms: float):
+        index = len(CHECKOUT_BUCKETS_MS)
+        for i, bound in enumerate(CHECKOUT_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.checkout_buckets[index] += 1
+            self.checkouts += 1
+            self.checkout_ms_total += elapsed_ms
+            self.checkout_ms_max = max(self.checkout_ms_max, elapsed_ms)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_overflow_connect(self):
+        with self._lock:
+            self.overflow_connects += 1
+
+    def listen(self, pool: Pool):
+        """Count connects and invalidations on ``pool`` (listeners survive engine.dispose())"""
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+        @event.listens_for(pool, "soft_invalidate")
+        def on_soft_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.soft_invalidations += 1
+
+    def stats(self, pool: Pool) -> Dict[str, Any]:
+        with self._lock:
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip(CHECKOUT_BUCKETS_MS + ("+Inf",), self.checkout_buckets):
+                cumulative += count
+                histogram[f"le_{bound}"] = cumulative
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "checkout_ms_total": round(self.checkout_ms_total, 3),
+                "checkout_ms_avg": round(self.checkout_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_ms_max": round(self.checkout_ms_max, 3),
+                "checkout_ms_histogram": histogram,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "overflow_connects": self.overflow_connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+            }
+
+def instrumented_pool_class(base: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """Subclass of ``base`` that times every checkout (including waits for a free connection)"""
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            overflow_before = self.overflow()
+            try:
+                connection = super()._do_get()
+                # QueuePool counts connections beyond pool_size as overflow
+                if self.overflow() > max(overflow_before, 0):
+                    metrics.record_overflow_connect()
+                return connection
+            except exc.TimeoutError:
+                metrics.record_timeout()
+                raise
+            finally:
+                metrics.observe_checkout((time.perf_counter() - started) * 1000)
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
@@ -0,0 +1,214 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+from fastapi import Depends
+from sqlalchemy import text
+from dotenv import load_dotenv
+from app.auth import get_current_user
+from app.database import (
+    DB_ASYNC,
+    AsyncReplicaSessionLocal,
+    AsyncSessionLocal,
+    ReplicaSessionLocal,
+    SessionLocal,
+    replica_engine
+)
+from app.models import User
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Routing of read-only handlers to DB_REPLICA_URL; flask-history reads the same variables
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "2"))  # seconds behind the primary before reads go back to it
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))  # seconds between lag checks
+REPLICA_READ_YOUR_WRITES = float(os.getenv("REPLICA_READ_YOUR_WRITES", "5"))  # seconds a user reads the primary after a write
+
+# Seconds the replica is behind; the definition lives in the database
+# (migrations/0006_replica_lag.sql) so flask-history measures the same thing
+REPLICA_LAG_SQL = "SELECT replica_lag_seconds()"
+
+# Lag checks missed in a row after which the last one no longer counts
+STALE_CHECKS = 3
+
+class ReplicaRouter:
+    """
+    Decides, per read, whether the replica may serve it.
+
+    A read goes to the primary while
+    - one of its users wrote less than ``read_your_writes`` seconds ago
+      (record_write), so users always see their own changes;
+    - the replica was more than ``max_lag`` seconds behind at the last check,
+      or the check or a request (replica_failed) couldn't use it;
+    - no check has completed for STALE_CHECKS intervals.
+
+    The lag is measured by a background thread every ``check_interval``
+    seconds, so requests never wait on the replica to be routed. Lag can grow
+    by ``check_interval`` between checks, so ``read_your_writes`` should stay
+    above ``max_lag + check_interval``.
+    """
+
+    def __init__(
+        self,
+        measure_lag: Optional[Callable[[], float]],
+        max_lag: float = 2.0,
+        check_interval: float = 1.0,
+        read_your_writes: float = 5.0
+    ):
+        self.measure_lag = measure_lag
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self._lock = threading.Lock()
+        self._written_until: Dict[int, float] = {}  # user_id -> monotonic deadline of their primary reads
+        self._everyone_until = 0.0
+        self._available = False
+        self._checked_at: Optional[float] = None
+        self._state: Optional[str] = None  # current, behind or unreachable, as of the last check
+        self.lag: Optional[float] = None
+        self.replica_reads = 0
+        self.primary_reads_after_write = 0
+        self.primary_reads_unavailable = 0
+        self.failures = 0
+        self.check_failures = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.enabled and read_your_writes <= max_lag + check_interval:
+            logger.warning(
+                "REPLICA_READ_YOUR_WRITES (%.1fs) should exceed REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL (%.1fs); "
+                "users may not see their own writes", read_your_writes, max_lag + check_interval
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self.measure_lag is not None
+
+    def record_write(self, user_id: int):
+        """Keep ``user_id``'s reads on the primary for the read-your-writes window"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._written_until[user_id] = time.monotonic() + self.read_your_writes
+
+    def record_unknown_writes(self):
+        """Keep everyone's reads on the primary for the window, for when writes may have gone unrecorded"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._everyone_until = time.monotonic() + self.read_your_writes
+
+    def use_replica(self, user_ids: Iterable[int]) -> bool:
+        """Whether a read of ``user_ids``' data may go to the replica"""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now < self._everyone_until or any(now < self._written_until.get(u, 0.0) for u in user_ids):
+                self.primary_reads_after_write += 1
+                return False
+            fresh = self._checked_at is not None and now - self._checked_at < STALE_CHECKS * self.check_interval
+            if not (self._available and fresh):
+                self.primary_reads_unavailable += 1
+                return False
+            self.replica_reads += 1
+            return True
+
+    def replica_failed(self):
+        """A read on the replica failed: use the primary until the next check succeeds"""
+        with self._lock:
+            self._available = False
+            self.failures += 1
+
+    def check(self):
+        """Measure the lag once and route by it until the next check"""
+        error = None
+        try:
+            lag = self.measure_lag()
+        except Exception as e:
+            lag, error = None, e
+        state = "unreachable" if lag is None else "behind" if lag > self.max_lag else "current"
+        if state != self._state:
+            # Logged on changes only, not on every check of a replica that stays down
+            if state == "current":
+                logger.info("Read replica is current; serving reads from it")
+            elif state == "behind":
+                logger.warning("Read replica is %.1fs behind (limit %.1fs); reading from the primary", lag, self.max_lag)
+            else:
+                logger.warning("Read replica is unreachable; reading from the primary", exc_info=error)
+            self._state = state
+        with self._lock:
+            self.lag = lag
+            self._available = state == "current"
+            self._checked_at = now = time.monotonic()
+            if lag is None:
+                self.check_failures += 1
+            self._written_until = {u: until for u, until in self._written_until.items() if until > now}
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-lag-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.check_interval)
+
+    def stats(self) -> Dict:
+        if not self.enabled:
+            return {"enabled": False}
+        with self._lock:
+            return {
+                "enabled": True,
+                "available": self._available,
+                "lag_seconds": round(self.lag, 3) if self.lag is not None else None,
+                "max_lag_seconds": self.max_lag,
+                "read_your_writes_seconds": self.read_your_writes,
+                "recent_writers": len(self._written_until),
+                "replica_reads": self.replica_reads,
+                "primary_reads_after_write": self.primary_reads_after_write,
+                "primary_reads_unavailable": self.primary_reads_unavailable,
+                "failures": self.failures,
+                "check_failures": self.check_failures
+            }
+
+def measure_replica_lag() -> float:
+    with replica_engine.connect() as conn:
+        return float(conn.execute(text(REPLICA_LAG_SQL)).scalar())
+
+replica_router = ReplicaRouter(
+    measure_replica_lag if replica_engine is not None else None,
+    max_lag=REPLICA_MAX_LAG,
+    check_interval=REPLICA_CHECK_INTERVAL,
+    read_your_writes=REPLICA_READ_YOUR_WRITES
+)
+
+def _read_session(user_id: int, primary, replica):
+    if replica is None or not replica_router.use_replica((user_id,)):
+        return primary()
+    db = replica()
+    db.info["on_replica_error"] = replica_router.replica_failed
+    return db
+
+def get_sync_read_db(current_user: User = Depends(get_current_user)):
+    db = _read_session(current_user.user_id, SessionLocal, ReplicaSessionLocal)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(current_user: User = Depends(get_current_user)):
+    async with _read_session(current_user.user_id, AsyncSessionLocal, AsyncReplicaSessionLocal) as db:
+        yield db
+
+# Dependency for read-only handlers: like get_db, but on the replica when
+# replica_router allows it for the current user. Handlers must only read, and
+# go through run_db, which retries on the primary if the replica fails.
+get_read_db = get_async_read_db if DB_ASYNC else get_sync_read_db
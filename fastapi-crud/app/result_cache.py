@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache of per-user aggregates (balances, monthly summaries); flask-history
+# keeps the same kind of cache and consumes the same invalidations
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "lru").lower()  # lru, redis or none
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "10000"))  # entries, lru backend only
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "60"))  # seconds; safety net if an invalidation is lost
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Results for closed months (app.breakdown) are keyed on the month's rollup row,
+# which every write to that month changes, so they are never invalidated and
+# only expire; same backend and size limit as the result cache
+CLOSED_MONTH_CACHE_TTL = float(os.getenv("CLOSED_MONTH_CACHE_TTL", "86400"))  # seconds
+
+# Postgres NOTIFY channel carrying "<user_id>:<version>" (or "<user_id>:deleted")
+# for every committed write, sent by app.versions; both services LISTEN on it.
+# Payload format: README.md, "Cross-service contract"
+INVALIDATION_CHANNEL = os.getenv("RESULT_CACHE_CHANNEL", "result_cache_invalidate")
+
+class LRUBackend:
+    """Bounded in-process LRU of (user_id, name) -> value with per-entry expiry"""
+
+    name = "lru"
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[int, str], tuple]" = OrderedDict()  # key -> (deadline, value)
+        self._names_by_user: Dict[int, set] = {}
+        self.evictions = 0
+
+    def get(self, user_id: int, name: str) -> Optional[Any]:
+        key = (user_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, user_id: int, name: str, value: Any):
+        key = (user_id, name)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._names_by_user.setdefault(user_id, set()).add(name)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for name in list(self._names_by_user.get(user_id, ())):
+                self._remove((user_id, name))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._names_by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "evictions": self.evictions}
+
+    def _remove(self, key: Tuple[int, str]):
+        self._entries.pop(key, None)
+        names = self._names_by_user.get(key[0])
+        if names is not None:
+            names.discard(key[1])
+            if not names:
+                del self._names_by_user[key[0]]
+
+class RedisBackend:
+    """
+    Networked backend shared by every worker, storing JSON values with a TTL.
+
+    ``client`` is anything with the redis-py interface (redis.Redis, or a
+    local stand-in such as fakeredis in tests). Each user has an index set of
+    cached names so invalidate_user() can delete them all. Evictions are
+    Redis' own (maxmemory policy) and are not counted here.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = "fastapi-crud:result-cache"):
+        self.client = client
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+
+    def _key(self, user_id: int, name: Optional[str] = None) -> str:
+        return f"{self.prefix}:{user_id}" + (f":{name}" if name is not None else "")
+
+    def get(self, user_id: int, name: str) -> Optional[Any]:
+        raw = self.client.get(self._key(user_id, name))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, user_id: int, name: str, value: Any):
+        index = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.set(self._key(user_id, name), json.dumps(value), ex=self.ttl)
+        pipe.sadd(index, name)
+        pipe.expire(index, self.ttl)
+        pipe.execute()
+
+    def invalidate_user(self, user_id: int):
+        index = self._key(user_id)
+        names = [n.decode() if isinstance(n, bytes) else n for n in self.client.smembers(index)]
+        self.client.delete(index, *(self._key(user_id, name) for name in names))
+
+    def clear(self):
+        # Shared entries are dropped per user as invalidations arrive; the TTL covers the rest
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class ResultCache:
+    """
+    Per-user cache of computed aggregates in front of a pluggable backend.
+
+    Values must be JSON-serializable and not None. Backend failures are
+    logged and counted, and the value is computed as if the cache were off.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.enabled = backend is not None
+        self._lock = threading.Lock()
+        self._invalidation_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def get_or_compute(self, user_id: int, name: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value of ``name`` for ``user_id``, computing and storing it on a miss"""
+        if not self.enabled:
+            return compute()
+
+        try:
+            value = self.backend.get(user_id, name)
+        except Exception:
+            self._record_error("get")
+            return compute()
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        invalidations_before = self._invalidation_count
+        value = compute()
+        # Don't store a value computed while an invalidation arrived: it may predate the write
+        if value is not None and self._invalidation_count == invalidations_before:
+            try:
+                self.backend.set(user_id, name, value)
+            except Exception:
+                self._record_error("set")
+        return value
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached value of ``user_id``"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._invalidation_count += 1
+            self.invalidations += 1
+        try:
+            self.backend.invalidate_user(user_id)
+        except Exception:
+            self._record_error("invalidate")
+
+    def clear(self):
+        """Drop everything this process cached (after missing invalidations)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._invalidation_count += 1
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        stats = {
+            "enabled": True,
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+    def _record_error(self, operation: str):
+        self.errors += 1
+        logger.warning("Result cache %s failed; serving uncached", operation, exc_info=True)
+
+def create_backend(kind: str = RESULT_CACHE_BACKEND, ttl: float = RESULT_CACHE_TTL, prefix: str = "fastapi-crud:result-cache"):
+    """The backend selected by RESULT_CACHE_BACKEND, or None when caching is off"""
+    if kind == "none":
+        return None
+    if kind == "lru":
+        return LRUBackend(RESULT_CACHE_SIZE, ttl)
+    if kind == "redis":
+        import redis  # only needed for this backend
+        return RedisBackend(redis.Redis.from_url(RESULT_CACHE_REDIS_URL), ttl, prefix)
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND {kind!r} (use lru, redis or none)")
+
+result_cache = ResultCache(create_backend())
+closed_month_cache = ResultCache(create_backend(ttl=CLOSED_MONTH_CACHE_TTL, prefix="fastapi-crud:closed-month-cache"))
+
+class InvalidationListener:
+    """
+    Background thread that LISTENs on INVALIDATION_CHANNEL and drops the
+    named users from ``cache``, and their tokens from ``token_cache``
+    (app.token_cache), so a profile change or deletion in one worker reaches
+    the others. With a ``replica_router`` (app.replica), each notification
+    also starts that user's read-your-writes window.
+
+    Uses its own connection outside the pool. After a (re)connect the whole
+    local caches are cleared, and every user reads from the primary for a
+    window, since notifications sent while disconnected are lost.
+    """
+
+    def __init__(
+        self,
+        cache: ResultCache,
+        dsn: str,
+        channel: str = INVALIDATION_CHANNEL,
+        poll_interval: float = 5.0,
+        replica_router=None,
+        token_cache=None
+    ):
+        self.cache = cache
+        self.replica_router = replica_router
+        self.token_cache = token_cache
+        self.dsn = dsn
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        routing = self.replica_router is not None and self.replica_router.enabled
+        tokens = self.token_cache is not None and self.token_cache.enabled
+        if not (self.cache.enabled or routing or tokens) or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="result-cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                self.cache.clear()
+                if self.token_cache is not None:
+                    self.token_cache.clear()
+                if self.replica_router is not None:
+                    self.replica_router.record_unknown_writes()
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+            except psycopg2.Error:
+                logger.warning("Result cache listener lost its connection; retrying in %.0fs", backoff, exc_info=True)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _handle(self, payload: str):
+        try:
+            user_id = int(payload.split(":", 1)[0])
+        except ValueError:
+            logger.warning("Ignoring malformed cache invalidation %r", payload)
+            return
+        self.cache.invalidate_user(user_id)
+        if self.token_cache is not None:
+            self.token_cache.invalidate_user(user_id)
+        if self.replica_router is not None:
+            self.replica_router.record_write(user_id)
@@ -0,0 +1,171 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, List, Optional, Any
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.models import UserBalance, UserMonthlyBalance
+
+ROLLUP_COLUMNS = ("total_income", "total_expenses", "income_count", "expense_count")
+
+def month_start(when: datetime) -> date:
+    """Return the first day of the month containing ``when``"""
+    return date(when.year, when.month, 1)
+
+class RollupDelta:
+    """
+    Accumulates changes to a user's balance rollups.
+
+    Call add()/remove() for every transaction row that is created, changed or
+    deleted, then apply() inside the same database transaction as the write.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._months: Dict[date, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(ROLLUP_COLUMNS, 0))
+
+    def add(self, when: datetime, transaction_type: str, amount: int, count: int = 1):
+        """Record a transaction being added to the user's totals"""
+        month = self._months[month_start(when)]
+        if transaction_type == "income":
+            month["total_income"] += amount
+            month["income_count"] += count
+        else:
+            month["total_expenses"] += amount
+            month["expense_count"] += count
+
+    def remove(self, when: datetime, transaction_type: str, amount: int):
+        """Record a transaction being removed from the user's totals"""
+        self.add(when, transaction_type, -amount, count=-1)
+
+    @property
+    def months(self) -> List[date]:
+        """Months whose totals change when this delta is applied"""
+        return sorted(m for m, values in self._months.items() if any(values.values()))
+
+    @property
+    def touched_months(self) -> List[date]:
+        """Months with a transaction added, changed or removed, including changes that net to zero"""
+        return sorted(self._months)
+
+    def apply(self, db: Session):
+        """Upsert the accumulated changes into the rollup tables (does not commit)"""
+        # Months whose totals net to zero (renames, emoji edits) are upserted
+        # too, so a month's updated_on moves on every write to it; cached
+        # breakdowns of closed months (app.breakdown) are keyed on it
+        months = self.touched_months
+        if not months:
+            return
+
+        totals = dict.fromkeys(ROLLUP_COLUMNS, 0)
+        for month in months:
+            for column, value in self._months[month].items():
+                totals[column] += value
+
+        # Rows are written in month order so concurrent writers for the same
+        # user always take row locks in the same order.
+        monthly = insert(UserMonthlyBalance).values([
+            {"user_id": self.user_id, "month": month, **self._months[month]} for month in months
+        ])
+        db.execute(monthly.on_conflict_do_update(
+            index_elements=[UserMonthlyBalance.user_id, UserMonthlyBalance.month],
+            set_=_increment_columns(UserMonthlyBalance, monthly),
+        ))
+
+        balance = insert(UserBalance).values(user_id=self.user_id, **totals)
+        db.execute(balance.on_conflict_do_update(
+            index_elements=[UserBalance.user_id],
+            set_=_increment_columns(UserBalance, balance),
+        ))
+
+def _increment_columns(model, stmt) -> Dict[str, Any]:
+    values = {column: getattr(model, column) + getattr(stmt.excluded, column) for column in ROLLUP_COLUMNS}
+    values["updated_on"] = func.current_timestamp()
+    return values
+
+# ----------------------------
+# Rebuild and consistency check
+# ----------------------------
+
+_AGGREGATES = """
+    COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0) AS total_income,
+    COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0) AS total_expenses,
+    COUNT(*) FILTER (WHERE type = 'income') AS income_count,
+    COUNT(*) FILTER (WHERE type = 'expense') AS expense_count
+"""
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Recompute the rollup tables from the raw transactions table and commit.
+
+    Transactions are locked in SHARE mode for the duration, so concurrent
+    writes wait until the rebuild finishes while reads carry on.
+    """
+    user_filter = "WHERE user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id}
+
+    db.execute(text("LOCK TABLE transactions IN SHARE MODE"))
+    db.execute(text(f"DELETE FROM user_monthly_balances {user_filter}"), params)
+    db.execute(text(f"DELETE FROM user_balances {user_filter}"), params)
+
+    monthly = db.execute(text(f"""
+        INSERT INTO user_monthly_balances (user_id, month, total_income, total_expenses, income_count, expense_count)
+        SELECT user_id, date_trunc('month', date)::date, {_AGGREGATES}
+        FROM transactions
+        {user_filter}
+        GROUP BY user_id, date_trunc('month', date)::date
+    """), params)
+    balances = db.execute(text(f"""
+        INSERT INTO user_balances (user_id, total_income, total_expenses, income_count, expense_count)
+        SELECT user_id, {_AGGREGATES}
+        FROM transactions
+        {user_filter}
+        GROUP BY user_id
+    """), params)
+    db.commit()
+
+    return {"user_balances": balances.rowcount, "user_monthly_balances": monthly.rowcount}
+
+def check_rollups(db: Session, user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Compare the rollup tables against the raw transactions table.
+
+    Returns one entry per mismatching user (month is None) or user-month;
+    an empty list means the rollups are consistent.
+    """
+    user_filter = "WHERE user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id}
+    comparison = """
+        SELECT COALESCE(a.user_id, r.user_id) AS user_id, {month_select} AS month,
+               a.total_income AS actual_income, r.total_income AS rollup_income,
+               a.total_expenses AS actual_expenses, r.total_expenses AS rollup_expenses,
+               a.income_count AS actual_income_count, r.income_count AS rollup_income_count,
+               a.expense_count AS actual_expense_count, r.expense_count AS rollup_expense_count
+        FROM ({actual}) a
+        FULL OUTER JOIN ({rollup}) r ON {join}
+        WHERE (a.total_income, a.total_expenses, a.income_count, a.expense_count)
+              IS DISTINCT FROM (r.total_income, r.total_expenses, r.income_count, r.expense_count)
+        ORDER BY 1, 2
+    """
+
+    # Rollup rows that have been netted back to zero are equivalent to missing rows
+    non_empty = "(income_count <> 0 OR expense_count <> 0 OR total_income <> 0 OR total_expenses <> 0)"
+    rollup_filter = f"{user_filter} AND {non_empty}" if user_filter else f"WHERE {non_empty}"
+
+    balances = db.execute(text(comparison.format(
+        month_select="NULL::date",
+        actual=f"SELECT user_id, {_AGGREGATES} FROM transactions {user_filter} GROUP BY user_id",
+        rollup=f"SELECT * FROM user_balances {rollup_filter}",
+        join="a.user_id = r.user_id",
+    )), params).mappings().all()
+
+    monthly = db.execute(text(comparison.format(
+        month_select="COALESCE(a.month, r.month)",
+        actual=f"""SELECT user_id, date_trunc('month', date)::date AS month, {_AGGREGATES}
+                   FROM transactions {user_filter} GROUP BY user_id, date_trunc('month', date)::date""",
+        rollup=f"SELECT * FROM user_monthly_balances {rollup_filter}",
+        join="a.user_id = r.user_id AND a.month = r.month",
+    )), params).mappings().all()
+
+    return [dict(row) for row in list(balances) + list(monthly)]
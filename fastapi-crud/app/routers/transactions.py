@@ -1,26 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, text, tuple_
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import date
+from app.database import get_db, run_db
 from app.models import (
     User, 
     Transaction, 
     TransactionCreate, 
     TransactionResponse, 
-    TransactionUpdate
+    TransactionUpdate,
+    TransactionPage,
+    TransactionSearchResult,
+    TransactionSearchPage,
+    TransactionBulkCreate,
+    TransactionBulkResult,
+    TransactionFilter,
+    TransactionBatchUpdate,
+    TransactionBatchResult
 )
 from app.auth import get_current_user
-from app.utils import validate_transaction_type
+from app.replica import get_read_db, replica_router
+from app.result_cache import result_cache
+from app.serialization import rows_response
+from app.rollups import RollupDelta
+from app.versions import bump_user_version, conditional_get
+from app.bulk import (
+    MAX_BULK_ROWS,
+    UPLOAD_FORMATS,
+    import_transactions,
+    parse_csv,
+    parse_ndjson,
+    filter_conditions,
+    update_transactions,
+    delete_transactions
+)
+from app.export import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, export_query, stream_export
+from app.search import is_searchable, search_query
+from app.breakdown import BREAKDOWN_DIMENSIONS, MAX_BREAKDOWN_ITEMS, get_breakdown
+from app.utils import (
+    validate_transaction_type,
+    encode_cursor,
+    decode_cursor,
+    encode_search_cursor,
+    decode_search_cursor,
+    add_months,
+    month_range,
+    parse_month,
+    build_monthly_summary
+)
 
 router = APIRouter()
 
+# Longest range /summary/range will aggregate in one request
+MAX_SUMMARY_MONTHS = 120
+
 @router.post("/create", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
-def create_transaction(
+async def create_transaction(
     transaction: TransactionCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Create a new transaction"""
+    return await run_db(db, _create_transaction, transaction, current_user)
+
+def _create_transaction(db: Session, transaction: TransactionCreate, current_user: User):
     # Validate transaction type
     if not validate_transaction_type(transaction.type):
         raise HTTPException(
@@ -38,20 +83,141 @@ def create_transaction(
     )
     
     db.add(db_transaction)
+    db.flush()
+    
+    # Keep the balance rollups in step within the same DB transaction
+    rollup = RollupDelta(current_user.user_id)
+    rollup.add(db_transaction.date, db_transaction.type, db_transaction.amount)
+    rollup.apply(db)
+    bump_user_version(db, current_user.user_id)
+    
     db.commit()
     db.refresh(db_transaction)
     
     return db_transaction
 
+@router.post("/bulk", response_model=TransactionBulkResult)
+async def create_transactions_bulk(
+    bulk: TransactionBulkCreate,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Create many transactions at once; invalid rows are reported per index instead of failing the request"""
+    _check_bulk_size(len(bulk.transactions))
+    return await run_db(db, import_transactions, current_user.user_id, bulk.transactions)
+
+@router.post("/bulk/upload", response_model=TransactionBulkResult)
+async def upload_transactions(
+    file: UploadFile = File(..., description="CSV with a header row (name, amount, type, emoji, date) or NDJSON"),
+    format: Optional[str] = Query(None, description="csv or ndjson; inferred from the file name when omitted"),
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Import transactions from a CSV or NDJSON file"""
+    upload_format = (format or _format_from_filename(file.filename) or "").lower()
+    if upload_format not in UPLOAD_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'csv' or 'ndjson'"
+        )
+    
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be UTF-8 encoded"
+        )
+    
+    rows = parse_csv(content) if upload_format == "csv" else parse_ndjson(content)
+    _check_bulk_size(len(rows))
+    return await run_db(db, import_transactions, current_user.user_id, rows)
+
+def _check_bulk_size(row_count: int):
+    if row_count > MAX_BULK_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A bulk import can contain at most {MAX_BULK_ROWS} rows"
+        )
+
+def _format_from_filename(filename: Optional[str]) -> Optional[str]:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}.get(extension)
+
+@router.put("/batch/update", response_model=TransactionBatchResult)
+async def update_transactions_batch(
+    batch: TransactionBatchUpdate,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Apply the same changes to every transaction of the user matching the filter, in one statement"""
+    _check_batch_filter(current_user, batch.filter)
+    
+    changes = batch.changes.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="changes must set at least one field"
+        )
+    if "type" in changes:
+        if not validate_transaction_type(changes["type"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Transaction type must be 'income' or 'expense'"
+            )
+        changes["type"] = changes["type"].lower()
+    
+    return await run_db(db, update_transactions, current_user.user_id, batch.filter, changes)
+
+@router.post("/batch/delete", response_model=TransactionBatchResult)
+async def delete_transactions_batch(
+    criteria: TransactionFilter,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    """Delete every transaction of the user matching the filter, in one statement"""
+    _check_batch_filter(current_user, criteria)
+    return await run_db(db, delete_transactions, current_user.user_id, criteria)
+
+def _check_batch_filter(current_user: User, criteria: TransactionFilter):
+    if criteria.type is not None and not validate_transaction_type(criteria.type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transaction type must be 'income' or 'expense'"
+        )
+    if criteria.transaction_ids is not None:
+        _check_bulk_size(len(criteria.transaction_ids))
+    try:
+        filter_conditions(current_user.user_id, criteria)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 @router.get("/list", response_model=List[TransactionResponse])
-def get_user_transactions(
+async def get_user_transactions(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Number of transactions to skip"),
     limit: int = Query(100, ge=1, le=100, description="Number of transactions to return"),
     transaction_type: Optional[str] = Query(None, description="Filter by transaction type (income/expense)")
 ):
     """Get user's transactions with pagination and filtering"""
+    return await conditional_get(
+        request, response, db, current_user.user_id,
+        _get_user_transactions, current_user, skip, limit, transaction_type
+    )
+
+def _get_user_transactions(
+    db: Session,
+    current_user: User,
+    skip: int,
+    limit: int,
+    transaction_type: Optional[str]
+):
     query = db.query(Transaction).filter(Transaction.user_id == current_user.user_id)
     
     # Filter by transaction type if provided
@@ -66,15 +232,181 @@ def get_user_transactions(
     # Order by date descending and apply pagination
     transactions = query.order_by(Transaction.date.desc()).offset(skip).limit(limit).all()
     
-    return transactions
+    return rows_response(transactions, TransactionResponse)
+
+@router.get("/list/cursor", response_model=TransactionPage)
+async def get_user_transactions_page(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_read_db),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; omit for the first page"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of transactions to return"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type (income/expense)")
+):
+    """Get user's transactions newest first using keyset (cursor) pagination"""
+    return await conditional_get(
+        request, response, db, current_user.user_id,
+        _get_user_transactions_page, current_user, cursor, limit, transaction_type
+    )
+
+def _get_user_transactions_page(
+    db: Session,
+    current_user: User,
+    cursor: Optional[str],
+    limit: int,
+    transaction_type: Optional[str]
+):
+    query = db.query(Transaction).filter(Transaction.user_id == current_user.user_id)
+    
+    if transaction_type:
+        if not validate_transaction_type(transaction_type):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Transaction type must be 'income' or 'expense'"
+            )
+        query = query.filter(Transaction.type == transaction_type.lower())
+    
+    # Continue strictly after the last row of the previous page
+    if cursor:
+        try:
+            after_date, after_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.filter(tuple_(Transaction.date, Transaction.transaction_id) < tuple_(after_date, after_id))
+    
+    # Fetch one extra row to know whether there is a next page
+    transactions = query.order_by(
+        Transaction.date.desc(), Transaction.transaction_id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.date, last.transaction_id)
+    
+    return rows_response(transactions, TransactionResponse, next_cursor=next_cursor)
+
+@router.get("/search", response_model=TransactionSearchPage)
+async def search_transactions(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_read_db),
+    q: str = Query(..., min_length=1, max_length=255, description="Words to find in transaction names; each matches the start of a word"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; omit for the first page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of transactions to return"),
+    from_date: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type (income/expense)")
+):
+    """Search the user's transactions by name, most relevant first, then newest first"""
+    return await conditional_get(
+        request, response, db, current_user.user_id,
+        _search_transactions, current_user, q, cursor, limit, from_date, to_date, transaction_type
+    )
+
+def _search_transactions(
+    db: Session,
+    current_user: User,
+    q: str,
+    cursor: Optional[str],
+    limit: int,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    transaction_type: Optional[str]
+):
+    if not is_searchable(q):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="q must contain a word of at least 2 letters or digits"
+        )
+    if transaction_type and not validate_transaction_type(transaction_type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transaction type must be 'income' or 'expense'"
+        )
+    
+    # Continue strictly after the last row of the previous page
+    after = None
+    if cursor:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    query = search_query(
+        current_user.user_id,
+        q,
+        from_date,
+        to_date,
+        transaction_type.lower() if transaction_type else None,
+        after
+    )
+    # The index lookup is fast enough alone; parallel workers only add their
+    # startup cost to it (SET LOCAL lasts until the session's transaction ends)
+    db.execute(text("SET LOCAL max_parallel_workers_per_gather = 0"))
+    # Fetch one extra row to know whether there is a next page
+    results = db.execute(query.limit(limit + 1)).all()
+    
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_search_cursor(last.relevance, last.date, last.transaction_id)
+    
+    return rows_response(results, TransactionSearchResult, next_cursor=next_cursor)
+
+@router.get("/export")
+async def export_transactions(
+    current_user: User = Depends(get_current_user),
+    format: str = Query("csv", description="csv or ndjson"),
+    from_date: Optional[date] = Query(None, description="First day to include (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, description="Last day to include (YYYY-MM-DD)"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type (income/expense)")
+):
+    """Stream the user's full transaction history, oldest first, as CSV or NDJSON"""
+    export_format = format.lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'csv' or 'ndjson'"
+        )
+    if transaction_type and not validate_transaction_type(transaction_type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transaction type must be 'income' or 'expense'"
+        )
+    
+    query = export_query(
+        current_user.user_id,
+        from_date,
+        to_date,
+        transaction_type.lower() if transaction_type else None
+    )
+    return StreamingResponse(
+        stream_export(query, export_format, replica=replica_router.use_replica((current_user.user_id,))),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{export_format}"'}
+    )
 
 @router.get("/get/{transaction_id}", response_model=TransactionResponse)
-def get_transaction(
+async def get_transaction(
     transaction_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_read_db)
 ):
     """Get a specific transaction by ID"""
+    return await run_db(db, _get_transaction, transaction_id, current_user)
+
+def _get_transaction(db: Session, transaction_id: int, current_user: User):
     transaction = db.query(Transaction).filter(
         Transaction.transaction_id == transaction_id,
         Transaction.user_id == current_user.user_id
@@ -89,18 +421,27 @@ def get_transaction(
     return transaction
 
 @router.put("/update/{transaction_id}", response_model=TransactionResponse)
-def update_transaction(
+async def update_transaction(
     transaction_id: int,
     transaction_update: TransactionUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Update a specific transaction"""
-    # Find the transaction
+    return await run_db(db, _update_transaction, transaction_id, transaction_update, current_user)
+
+def _update_transaction(
+    db: Session,
+    transaction_id: int,
+    transaction_update: TransactionUpdate,
+    current_user: User
+):
+    # Find the transaction, locked: the rollup delta is built from the values
+    # read here, so a concurrent update or delete must wait for this one
     transaction = db.query(Transaction).filter(
         Transaction.transaction_id == transaction_id,
         Transaction.user_id == current_user.user_id
-    ).first()
+    ).with_for_update().first()
     
     if not transaction:
         raise HTTPException(
@@ -108,6 +449,9 @@ def update_transaction(
             detail="Transaction not found"
         )
     
+    rollup = RollupDelta(current_user.user_id)
+    rollup.remove(transaction.date, transaction.type, transaction.amount)
+    
     # Update fields if provided
     if transaction_update.name is not None:
         transaction.name = transaction_update.name
@@ -126,22 +470,31 @@ def update_transaction(
     if transaction_update.emoji is not None:
         transaction.emoji = transaction_update.emoji
     
+    rollup.add(transaction.date, transaction.type, transaction.amount)
+    rollup.apply(db)
+    bump_user_version(db, current_user.user_id)
+    
     db.commit()
     db.refresh(transaction)
     
     return transaction
 
 @router.delete("/delete/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_transaction(
+async def delete_transaction(
     transaction_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Delete a specific transaction"""
+    return await run_db(db, _delete_transaction, transaction_id, current_user)
+
+def _delete_transaction(db: Session, transaction_id: int, current_user: User):
+    # Locked, so a concurrent delete of the same row waits and then finds
+    # nothing (404) instead of subtracting the amount from the rollups twice
     transaction = db.query(Transaction).filter(
         Transaction.transaction_id == transaction_id,
         Transaction.user_id == current_user.user_id
-    ).first()
+    ).with_for_update().first()
     
     if not transaction:
         raise HTTPException(
@@ -149,44 +502,155 @@ def delete_transaction(
             detail="Transaction not found"
         )
     
+    rollup = RollupDelta(current_user.user_id)
+    rollup.remove(transaction.date, transaction.type, transaction.amount)
+    rollup.apply(db)
+    bump_user_version(db, current_user.user_id)
+    
     db.delete(transaction)
     db.commit()
     
     return None
 
 @router.get("/summary/monthly")
-def get_monthly_summary(
+async def get_monthly_summary(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    year: int = Query(..., description="Year for the summary"),
+    db = Depends(get_read_db),
+    year: int = Query(..., ge=1, le=9998, description="Year for the summary"),
     month: int = Query(..., ge=1, le=12, description="Month for the summary")
 ):
     """Get monthly transaction summary"""
-    from sqlalchemy import extract, func
+    return await conditional_get(
+        request, response, db, current_user.user_id, _get_monthly_summary, current_user, year, month
+    )
+
+def _get_monthly_summary(db: Session, current_user: User, year: int, month: int):
+    return result_cache.get_or_compute(
+        current_user.user_id,
+        f"monthly_summary:{year}-{month:02d}",
+        lambda: _compute_monthly_summary(db, current_user, year, month)
+    )
+
+def _compute_monthly_summary(db: Session, current_user: User, year: int, month: int):
+    month_start, next_month_start = month_range(year, month)
+    
+    # Single GROUP BY type over a half-open date range so the (user_id, date) index applies
+    totals = db.query(
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count()
+    ).filter(
+        Transaction.user_id == current_user.user_id,
+        Transaction.date >= month_start,
+        Transaction.date < next_month_start
+    ).group_by(Transaction.type).all()
+    
+    return build_monthly_summary(year, month, totals)
+    
+@router.get("/summary/breakdown")
+async def get_breakdown_summary(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_read_db),
+    year: int = Query(..., ge=1, le=9998, description="Year for the breakdown"),
+    month: int = Query(..., ge=1, le=12, description="Month for the breakdown"),
+    by: str = Query("name", description="Group by name or emoji"),
+    transaction_type: str = Query("expense", description="Break down expense or income transactions"),
+    limit: int = Query(5, ge=1, le=MAX_BREAKDOWN_ITEMS, description="Number of names/emojis to list; the rest are summed as other")
+):
+    """Get the month's largest names or emojis by amount with their share of the total"""
+    return await conditional_get(
+        request, response, db, current_user.user_id,
+        _get_breakdown_summary, current_user, year, month, by, transaction_type, limit
+    )
+
+def _get_breakdown_summary(
+    db: Session,
+    current_user: User,
+    year: int,
+    month: int,
+    by: str,
+    transaction_type: str,
+    limit: int
+):
+    if by not in BREAKDOWN_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="by must be 'name' or 'emoji'"
+        )
+    if not validate_transaction_type(transaction_type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transaction type must be 'income' or 'expense'"
+        )
+    
+    return get_breakdown(db, current_user.user_id, year, month, by, transaction_type.lower(), limit)
+
+@router.get("/summary/range")
+async def get_range_summary(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db = Depends(get_read_db),
+    from_month: str = Query(..., alias="from", description="First month of the range (YYYY-MM)"),
+    to_month: str = Query(..., alias="to", description="Last month of the range, inclusive (YYYY-MM)")
+):
+    """Get monthly transaction summaries for every month in a range in one query"""
+    return await conditional_get(
+        request, response, db, current_user.user_id, _get_range_summary, current_user, from_month, to_month
+    )
+
+def _get_range_summary(db: Session, current_user: User, from_month: str, to_month: str):
+    try:
+        start_year, start_month = parse_month(from_month)
+        end_year, end_month = parse_month(to_month)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from and to must be months in YYYY-MM format"
+        )
+    
+    month_count = (end_year * 12 + end_month) - (start_year * 12 + start_month) + 1
+    if month_count < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from must not be after to"
+        )
+    if month_count > MAX_SUMMARY_MONTHS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A range can cover at most {MAX_SUMMARY_MONTHS} months"
+        )
+    
+    range_start, _ = month_range(start_year, start_month)
+    _, range_end = month_range(end_year, end_month)
+    month_bucket = func.date_trunc("month", Transaction.date)
     
-    # Get transactions for the specified month and year
-    transactions = db.query(Transaction).filter(
+    rows = db.query(
+        month_bucket,
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count()
+    ).filter(
         Transaction.user_id == current_user.user_id,
-        extract('year', Transaction.date) == year,
-        extract('month', Transaction.date) == month
-    ).all()
+        Transaction.date >= range_start,
+        Transaction.date < range_end
+    ).group_by(month_bucket, Transaction.type).all()
     
-    # Calculate summary
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-    net_amount = total_income - total_expenses
+    totals_by_month = {}
+    for bucket, transaction_type, total_amount, count in rows:
+        totals_by_month.setdefault((bucket.year, bucket.month), []).append((transaction_type, total_amount, count))
     
-    # Group by type for detailed breakdown
-    income_transactions = [t for t in transactions if t.type == 'income']
-    expense_transactions = [t for t in transactions if t.type == 'expense']
+    months = []
+    for offset in range(month_count):
+        year, month = add_months(start_year, start_month, offset)
+        months.append(build_monthly_summary(year, month, totals_by_month.get((year, month), [])))
     
     return {
-        "year": year,
-        "month": month,
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "net_amount": net_amount,
-        "transaction_count": len(transactions),
-        "income_count": len(income_transactions),
-        "expense_count": len(expense_transactions)
+        "from": from_month,
+        "to": to_month,
+        "months": months
     }
\ No newline at end of file
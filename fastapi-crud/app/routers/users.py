@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_db, run_db
 from app.models import User, UserCreate, UserResponse, UserLogin, Token
 from app.auth import (
     get_password_hash, 
@@ -11,18 +11,25 @@ from app.auth import (
     get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.token_cache import token_cache
 from app.utils import get_user_stats
+from app.versions import bump_user_version, notify_user_deleted
 
 router = APIRouter()
 
 
 @router.put("/me", response_model=UserResponse)
-def update_current_user(
+async def update_current_user(
     user_update: UserCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Update current user information"""
+    # Hashed before the session is used, so no connection is held while bcrypt runs
+    password_hash = await get_password_hash(user_update.password) if user_update.password else None
+    return await run_db(db, _update_current_user, user_update, current_user, password_hash)
+
+def _update_current_user(db: Session, user_update: UserCreate, current_user: User, password_hash: Optional[str]):
     # Check if email is already taken by another user
     if user_update.email != current_user.email:
         existing_user = db.query(User).filter(User.email == user_update.email).first()
@@ -35,20 +42,32 @@ def update_current_user(
     # Update user
     current_user.name = user_update.name
     current_user.email = user_update.email
-    if user_update.password:
-        current_user.password = get_password_hash(user_update.password)
+    if password_hash is not None:
+        current_user.password = password_hash
+    bump_user_version(db, current_user.user_id)
     
     db.commit()
     db.refresh(current_user)
     
+    # Cached tokens still carry the old name/email/password hash
+    token_cache.invalidate_user(current_user.user_id)
+    
     return current_user
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
-def delete_current_user(
+async def delete_current_user(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db = Depends(get_db)
 ):
     """Delete current user account"""
+    return await run_db(db, _delete_current_user, current_user)
+
+def _delete_current_user(db: Session, current_user: User):
+    user_id = current_user.user_id
     db.delete(current_user)
+    notify_user_deleted(db, user_id)
     db.commit()
+    
+    # Tokens issued before the deletion must stop resolving to the user
+    token_cache.invalidate_user(user_id)
     return None
\ No newline at end of file
@@ -0,0 +1,69 @@
+import re
+from datetime import date, datetime, timedelta
+from typing import Optional, Tuple
+from sqlalchemy import Integer, Text, case, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.models import Transaction
+
+# Words shorter than this aren't indexed, and only this many leading characters
+# of longer ones are (migrations/0005_transactions_name_search.sql)
+MIN_SEARCH_WORD = 2
+MAX_SEARCH_KEY = 16
+
+# Same word split as transaction_search_keys ([^[:alnum:]]+)
+_WORD_SEPARATOR = re.compile(r"[\W_]+")
+
+def is_searchable(q: str) -> bool:
+    """Whether ``q`` has at least one word long enough to be looked up in the index"""
+    return any(len(word) >= MIN_SEARCH_WORD for word in _WORD_SEPARATOR.split(q))
+
+def search_keys(user_id, name):
+    """transaction_search_keys(user_id, name): the owner-tagged word prefixes behind ix_transactions_name_search"""
+    return func.transaction_search_keys(user_id, name, type_=ARRAY(Text))
+
+def relevance(q: str):
+    """
+    3 when the name is the query (ignoring case), 2 when it starts with it,
+    1 for any other match (every query word starts a word of the name).
+    """
+    name, term = func.lower(Transaction.name), func.lower(literal(q.strip(), Text))
+    return case(
+        (name == term, 3),
+        (func.starts_with(name, term), 2),
+        else_=1
+    ).label("relevance")
+
+def search_query(
+    user_id: int,
+    q: str,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    transaction_type: Optional[str] = None,
+    after: Optional[Tuple[int, datetime, int]] = None
+):
+    """
+    A user's transactions whose name matches every word of ``q`` as a word
+    prefix, in any order, most relevant first, then newest first. ``after``
+    is the (relevance, date, transaction_id) of the last row already seen.
+
+    The keys carry the owner, so the index lookup alone is restricted to the
+    user: a ``user_id =`` condition would only make the planner intersect the
+    match with all of the user's rows from ix_transactions_user_date.
+    """
+    rank = relevance(q)
+    query = select(*Transaction.__table__.c, rank).where(
+        search_keys(Transaction.user_id, Transaction.name).contains(search_keys(literal(user_id, Integer), q))
+    )
+    # The keys stop at MAX_SEARCH_KEY characters, so a longer query word also
+    # matches names that only share its first ones: recheck those words
+    for word in {word.lower() for word in _WORD_SEPARATOR.split(q) if len(word) > MAX_SEARCH_KEY}:
+        query = query.where(func.lower(Transaction.name).op("~")(literal(f"(^|[^[:alnum:]]){word}", Text)))
+    if from_date is not None:
+        query = query.where(Transaction.date >= from_date)
+    if to_date is not None:
+        query = query.where(Transaction.date < to_date + timedelta(days=1))
+    if transaction_type is not None:
+        query = query.where(Transaction.type == transaction_type)
+    if after is not None:
+        query = query.where(tuple_(rank.element, Transaction.date, Transaction.transaction_id) < tuple_(*after))
+    return query.order_by(rank.desc(), Transaction.date.desc(), Transaction.transaction_id.desc())
@@ -0,0 +1,40 @@
+import os
+from typing import Any, Dict, Iterable, List, Type
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# orjson: encode every response with orjson, and let the list endpoints write
+# ORM rows straight out instead of re-validating them through Pydantic.
+# std: FastAPI's stock json path.
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson").lower()
+FAST_JSON = JSON_SERIALIZER == "orjson"
+
+DefaultResponse = ORJSONResponse if FAST_JSON else JSONResponse
+
+def row_dicts(rows: Iterable[Any], model: Type[BaseModel]) -> List[Dict[str, Any]]:
+    """
+    ``model``'s fields read off each row, in the model's field order.
+
+    Only for rows whose column types already match the model (ORM rows for
+    their own response model): nothing is validated or converted, and
+    datetimes are left for orjson to encode natively.
+    """
+    fields = tuple(model.model_fields)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+def rows_response(rows: Iterable[Any], model: Type[BaseModel], **envelope) -> Any:
+    """
+    A ready-made orjson response with ``rows`` as ``model`` (wrapped in
+    ``envelope`` under "items" when given), or the rows unchanged for FastAPI's
+    response_model path when JSON_SERIALIZER is std.
+
+    Building the response here means the encoding runs inside run_db's
+    worker, not on the event loop.
+    """
+    if not FAST_JSON:
+        return {"items": rows, **envelope} if envelope else rows
+    items = row_dicts(rows, model)
+    return ORJSONResponse({"items": items, **envelope} if envelope else items)
@@ -1,22 +1,97 @@
-from typing import Dict, Any
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Tuple, Iterable
 from sqlalchemy.orm import Session
-from app.models import User, Transaction
+from app.models import User, UserBalance
+from app.result_cache import result_cache
 
 def get_user_stats(db: Session, user_id: int) -> Dict[str, Any]:
     """Get user statistics including total income, expenses, and balance"""
-    transactions = db.query(Transaction).filter(Transaction.user_id == user_id).all()
-    
-    total_income = sum(t.amount for t in transactions if t.type == 'income')
-    total_expenses = sum(t.amount for t in transactions if t.type == 'expense')
-    balance = total_income - total_expenses
+    return result_cache.get_or_compute(user_id, "user_stats", lambda: _compute_user_stats(db, user_id))
+
+def _compute_user_stats(db: Session, user_id: int) -> Dict[str, Any]:
+    # Single-row lookup in the rollup table maintained by app.rollups
+    stats = db.get(UserBalance, user_id)
+    if stats is None:
+        return {
+            "total_income": 0,
+            "total_expenses": 0,
+            "balance": 0,
+            "total_transactions": 0
+        }
     
     return {
-        "total_income": total_income,
-        "total_expenses": total_expenses,
-        "balance": balance,
-        "total_transactions": len(transactions)
+        "total_income": stats.total_income,
+        "total_expenses": stats.total_expenses,
+        "balance": stats.total_income - stats.total_expenses,
+        "total_transactions": stats.income_count + stats.expense_count
     }
 
 def validate_transaction_type(transaction_type: str) -> bool:
     """Validate if transaction type is valid"""
-    return transaction_type.lower() in ['income', 'expense']
\ No newline at end of file
+    return transaction_type.lower() in ['income', 'expense']
+
+def encode_cursor(date: datetime, transaction_id: int) -> str:
+    """Encode the (date, transaction_id) keyset position of a row as an opaque cursor"""
+    payload = json.dumps({"d": date.isoformat(), "id": transaction_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["d"]), int(payload["id"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_search_cursor(relevance: int, date: datetime, transaction_id: int) -> str:
+    """Encode the (relevance, date, transaction_id) keyset position of a search result as an opaque cursor"""
+    payload = json.dumps({"r": relevance, "d": date.isoformat(), "id": transaction_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> Tuple[int, datetime, int]:
+    """Decode a cursor produced by encode_search_cursor, raising ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(payload["r"]), datetime.fromisoformat(payload["d"]), int(payload["id"])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    """Return the (year, month) that is ``months`` months after the given one"""
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+def month_range(year: int, month: int) -> Tuple[datetime, datetime]:
+    """Half-open [start, next_month_start) datetime range covering a calendar month"""
+    next_year, next_month = add_months(year, month, 1)
+    return datetime(year, month, 1), datetime(next_year, next_month, 1)
+
+def parse_month(value: str) -> Tuple[int, int]:
+    """Parse a 'YYYY-MM' string into (year, month), raising ValueError if it is malformed"""
+    parsed = datetime.strptime(value, "%Y-%m")
+    if parsed.year > 9998:
+        raise ValueError("year out of range")
+    return parsed.year, parsed.month
+
+def build_monthly_summary(year: int, month: int, totals: Iterable[Tuple[str, int, int]]) -> Dict[str, Any]:
+    """Build a monthly summary from (type, total_amount, count) aggregate rows"""
+    amounts = {"income": 0, "expense": 0}
+    counts = {"income": 0, "expense": 0}
+    for transaction_type, total_amount, count in totals:
+        amounts[transaction_type] = int(total_amount or 0)
+        counts[transaction_type] = count
+    
+    return {
+        "year": year,
+        "month": month,
+        "total_income": amounts["income"],
+        "total_expenses": amounts["expense"],
+        "net_amount": amounts["income"] - amounts["expense"],
+        "transaction_count": counts["income"] + counts["expense"],
+        "income_count": counts["income"],
+        "expense_count": counts["expense"]
+    }
@@ -0,0 +1,108 @@
+import hashlib
+from typing import Any, Callable, Optional
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from app.database import run_db
+from app.models import UserVersion
+from app.replica import replica_router
+from app.result_cache import INVALIDATION_CHANNEL, result_cache
+
+# Polling clients revalidate every time, but get a 304 while nothing changed.
+# This, the ETag format and the notifications are shared with flask-history
+# (README.md, "Cross-service contract"; db/check_contract.py)
+CACHE_CONTROL = "private, no-cache"
+
+_NOT_MODIFIED = object()
+
+def bump_user_version(db: Session, user_id: int):
+    """
+    Advance the user's data version (does not commit; call inside the write's transaction)
+
+    The same statement NOTIFYs INVALIDATION_CHANNEL, which Postgres only
+    delivers if the transaction commits, so other workers and flask-history
+    drop the user's cached aggregates. This process drops its own right
+    after the commit.
+    """
+    bumped = insert(UserVersion).values(user_id=user_id, version=1).on_conflict_do_update(
+        index_elements=[UserVersion.user_id],
+        set_={"version": UserVersion.version + 1, "updated_on": func.current_timestamp()},
+    ).returning(UserVersion.user_id, UserVersion.version).cte("bumped")
+    db.execute(select(func.pg_notify(INVALIDATION_CHANNEL, func.concat(bumped.c.user_id, ":", bumped.c.version))))
+    db.info.setdefault("changed_users", set()).add(user_id)
+
+def notify_user_deleted(db: Session, user_id: int):
+    """
+    NOTIFY INVALIDATION_CHANNEL for a user being deleted (does not commit)
+
+    The user's version row goes with the user, so there's nothing to bump;
+    other workers still need to drop the user's cached tokens and aggregates.
+    """
+    db.execute(select(func.pg_notify(INVALIDATION_CHANNEL, f"{user_id}:deleted")))
+    db.info.setdefault("changed_users", set()).add(user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session):
+    for user_id in session.info.pop("changed_users", ()):
+        result_cache.invalidate_user(user_id)
+        replica_router.record_write(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session):
+    session.info.pop("changed_users", None)
+
+def get_user_version(db: Session, user_id: int) -> int:
+    """The user's current data version; 0 for users that never wrote anything"""
+    version = db.query(UserVersion.version).filter(UserVersion.user_id == user_id).scalar()
+    return version or 0
+
+def user_etag(user_id: int, version: int, resource: str) -> str:
+    """
+    Strong ETag for ``resource`` (path and query string) of a user at a data version
+
+    The format is part of the cross-service contract (see CACHE_CONTROL).
+    """
+    digest = hashlib.sha1(resource.encode()).hexdigest()[:16]
+    return f'"{user_id}-{version}-{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored and * matches anything"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def _resource(request: Request) -> str:
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    return f"{request.url.path}?{query}"
+
+def _versioned(db: Session, user_id: int, resource: str, if_none_match: Optional[str], fn: Callable, *args):
+    # The version is read before the data, so a write landing in between can
+    # only make the body newer than its ETag, which just costs one more refetch
+    etag = user_etag(user_id, get_user_version(db, user_id), resource)
+    if etag_matches(if_none_match, etag):
+        return etag, _NOT_MODIFIED
+    return etag, fn(db, *args)
+
+async def conditional_get(request: Request, response: Response, db, user_id: int, fn: Callable, *args) -> Any:
+    """
+    Run ``fn(db, *args)`` behind the user's data version.
+
+    Answers 304 Not Modified from one user_versions lookup when If-None-Match
+    carries the current ETag; otherwise runs ``fn`` and tags its result.
+    """
+    etag, result = await run_db(
+        db, _versioned, user_id, _resource(request), request.headers.get("if-none-match"), fn, *args
+    )
+    if result is _NOT_MODIFIED:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    # A Response returned by fn is sent as is, without the injected response's headers
+    headers = result.headers if isinstance(result, Response) else response.headers
+    headers["ETag"] = etag
+    headers["Cache-Control"] = CACHE_CONTROL
+    return result
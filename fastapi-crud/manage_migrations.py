@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Apply or inspect the versioned schema migrations in migrations/
+Run from fastapi-crud directory:
+    python3 manage_migrations.py status
+    python3 manage_migrations.py upgrade
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.getcwd())
+
+from app.database import engine
+from app.migrations import applied_versions, discover_migrations, run_migrations
+
+def status():
+    applied = set(applied_versions(engine))
+    for migration in discover_migrations():
+        mark = "✅" if migration.version in applied else "⏳"
+        print(f"{mark} {migration.version}_{migration.name}")
+
+def upgrade():
+    applied = run_migrations(engine)
+    if applied:
+        print(f"✅ Applied {len(applied)} migration(s): {', '.join(applied)}")
+    else:
+        print("✅ Database is up to date")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage schema migrations")
+    parser.add_argument("command", choices=["status", "upgrade"])
+    args = parser.parse_args()
+
+    if args.command == "status":
+        status()
+    else:
+        upgrade()
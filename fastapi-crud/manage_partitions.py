@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Opt-in monthly range partitioning of the transactions table on date
+Run from fastapi-crud directory:
+    python3 manage_partitions.py status
+    python3 manage_partitions.py migrate [--batch-size 10000] [--pause 0.05]
+    python3 manage_partitions.py create-ahead [--months 3]
+    python3 manage_partitions.py drop-unpartitioned
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.getcwd())
+
+from app.database import engine
+from app.partitions import PartitioningError, create_ahead, drop_retired, migrate, status
+
+def show_status():
+    state = status(engine)
+    if state["migration_in_progress"]:
+        print("⏳ Migration in progress (transactions_partitioned exists); run 'migrate' to resume it")
+    if not state["partitioned"]:
+        print("ℹ️  transactions is not partitioned")
+    else:
+        print(f"✅ transactions is partitioned by month ({len(state['partitions'])} partitions)")
+        for partition in state["partitions"]:
+            print(f"   - {partition['name']}: {partition['bounds']} (~{partition['estimated_rows']} rows)")
+    if state["retired_table"]:
+        print("ℹ️  The original table is kept as transactions_unpartitioned; "
+              "run 'drop-unpartitioned' once it is no longer needed")
+    return 0
+
+def run_migrate(batch_size, pause, months):
+    def progress(copied, last_id):
+        print(f"   copied {copied} rows (up to transaction_id {last_id})", flush=True)
+
+    result = migrate(engine, batch_size=batch_size, pause=pause, months_ahead=months, progress=progress)
+    print(f"✅ transactions is now partitioned: {result['rows']} rows in {result['partitions']} partitions "
+          f"({result['copied']} copied in {result['seconds']}s{', resumed' if result['resumed'] else ''})")
+    print("ℹ️  The original table is kept as transactions_unpartitioned")
+    return 0
+
+def run_create_ahead(months):
+    created = create_ahead(engine, months)
+    if created:
+        print(f"✅ Created {len(created)} partition(s): {', '.join(created)}")
+    else:
+        print(f"✅ Partitions exist for the next {months} month(s)")
+    return 0
+
+def run_drop():
+    if drop_retired(engine):
+        print("✅ Dropped transactions_unpartitioned")
+    else:
+        print("ℹ️  There is no transactions_unpartitioned table")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the transactions table")
+    parser.add_argument("command", choices=["status", "migrate", "create-ahead", "drop-unpartitioned"])
+    parser.add_argument("--months", type=int, default=3, help="Months ahead of the current one to create partitions for")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="transaction_ids copied per batch (migrate)")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches (migrate)")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "status":
+            sys.exit(show_status())
+        if args.command == "migrate":
+            sys.exit(run_migrate(args.batch_size, args.pause, args.months))
+        if args.command == "create-ahead":
+            sys.exit(run_create_ahead(args.months))
+        sys.exit(run_drop())
+    except PartitioningError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
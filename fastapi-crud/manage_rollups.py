@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Rebuild or verify the per-user balance rollup tables
+Run from fastapi-crud directory:
+    python3 manage_rollups.py rebuild [--user-id ID]
+    python3 manage_rollups.py check [--user-id ID]
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.getcwd())
+
+from app.database import SessionLocal
+from app.rollups import rebuild_rollups, check_rollups
+
+def rebuild(user_id=None):
+    db = SessionLocal()
+    try:
+        counts = rebuild_rollups(db, user_id)
+        print(f"✅ Rebuilt rollups: {counts['user_balances']} user rows, "
+              f"{counts['user_monthly_balances']} user-month rows")
+        return 0
+    finally:
+        db.close()
+
+def check(user_id=None):
+    db = SessionLocal()
+    try:
+        mismatches = check_rollups(db, user_id)
+        if not mismatches:
+            print("✅ Rollups match the transactions table")
+            return 0
+
+        print(f"❌ {len(mismatches)} rollup mismatch(es):")
+        for row in mismatches:
+            scope = f"user {row['user_id']}" + (f" month {row['month']}" if row['month'] else "")
+            print(f"   - {scope}: "
+                  f"income {row['rollup_income']} (actual {row['actual_income']}), "
+                  f"expenses {row['rollup_expenses']} (actual {row['actual_expenses']}), "
+                  f"counts {row['rollup_income_count']}/{row['rollup_expense_count']} "
+                  f"(actual {row['actual_income_count']}/{row['actual_expense_count']})")
+        print("Run 'python3 manage_rollups.py rebuild' to repair them")
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the balance rollup tables")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int, default=None, help="Limit to a single user")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        sys.exit(rebuild(args.user_id))
+    sys.exit(check(args.user_id))
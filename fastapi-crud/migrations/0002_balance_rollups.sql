@@ -0,0 +1,47 @@
+-- Running totals maintained by app.rollups; `python3 manage_rollups.py check` compares
+-- them with the transactions table and `rebuild` recomputes them
+CREATE TABLE IF NOT EXISTS user_balances (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    total_income BIGINT NOT NULL DEFAULT 0,
+    total_expenses BIGINT NOT NULL DEFAULT 0,
+    income_count INT NOT NULL DEFAULT 0,
+    expense_count INT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_monthly_balances (
+    user_id INT REFERENCES users(user_id) ON DELETE CASCADE,
+    month DATE NOT NULL,
+    total_income BIGINT NOT NULL DEFAULT 0,
+    total_expenses BIGINT NOT NULL DEFAULT 0,
+    income_count INT NOT NULL DEFAULT 0,
+    expense_count INT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, month)
+);
+
+-- Backfill from the existing rows, so both services report full totals as
+-- soon as they read the rollups. SHARE mode makes concurrent writes wait
+-- until this transaction commits, so none fall between the backfill and the
+-- code that maintains the totals.
+LOCK TABLE transactions IN SHARE MODE;
+
+INSERT INTO user_monthly_balances (user_id, month, total_income, total_expenses, income_count, expense_count)
+SELECT user_id, date_trunc('month', date)::date,
+       COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0),
+       COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0),
+       COUNT(*) FILTER (WHERE type = 'income'),
+       COUNT(*) FILTER (WHERE type = 'expense')
+FROM transactions
+GROUP BY user_id, date_trunc('month', date)::date
+ON CONFLICT DO NOTHING;
+
+INSERT INTO user_balances (user_id, total_income, total_expenses, income_count, expense_count)
+SELECT user_id,
+       COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0),
+       COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0),
+       COUNT(*) FILTER (WHERE type = 'income'),
+       COUNT(*) FILTER (WHERE type = 'expense')
+FROM transactions
+GROUP BY user_id
+ON CONFLICT DO NOTHING;
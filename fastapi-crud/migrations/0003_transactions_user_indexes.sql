@@ -0,0 +1,12 @@
+-- migrate:no-transaction
+-- Built CONCURRENTLY so existing tables stay writable while the indexes are created.
+
+-- /list, /summary/monthly and flask-history /transactions: filter on user_id,
+-- order or range on date. type and amount are included so per-period
+-- aggregates can be answered with an index-only scan.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_date
+    ON transactions (user_id, date DESC, transaction_id DESC) INCLUDE (type, amount);
+
+-- Balance / income / expense totals: filter on user_id and type, sum amount
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_user_type
+    ON transactions (user_id, type) INCLUDE (amount);
@@ -0,0 +1,10 @@
+-- Per-user data version, bumped by fastapi-crud (app.versions) in the same
+-- transaction as every write to a user's transactions or profile. Both
+-- services derive ETags from it, so conditional GETs can be answered with a
+-- primary-key lookup instead of re-running the queries. Users without a row
+-- are at version 0.
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id INT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,28 @@
+-- migrate:no-transaction
+-- Built CONCURRENTLY so existing tables stay writable while the index is created.
+
+-- GET /api/transactions/search: word-prefix search over a user's transaction
+-- names. Names are lowercased and split into words on anything that isn't a
+-- letter or digit; the index keys are every prefix of 2 to 16 characters of
+-- every word, tagged with the owner ("42:co", "42:cof", ...). Each key's
+-- posting list only holds that user's rows, so a search never touches other
+-- users' matches, and a prefix lookup is an exact key lookup. Searches compute
+-- their keys with this same function. Only built-ins are called, as index
+-- expressions may be evaluated with any search_path.
+CREATE OR REPLACE FUNCTION transaction_search_keys(owner INT, name TEXT) RETURNS TEXT[]
+LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE AS $$
+DECLARE
+    keys TEXT[] := '{}';
+    word TEXT;
+BEGIN
+    FOREACH word IN ARRAY regexp_split_to_array(lower(name), '[^[:alnum:]]+') LOOP
+        FOR len IN 2..least(length(word), 16) LOOP
+            keys := keys || (owner::text || ':' || left(word, len));
+        END LOOP;
+    END LOOP;
+    RETURN keys;
+END
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transactions_name_search
+    ON transactions USING gin (transaction_search_keys(user_id, name));
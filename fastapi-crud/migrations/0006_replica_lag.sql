@@ -0,0 +1,16 @@
+-- Seconds a read replica is behind the primary, run on the replica by both
+-- services' replica routing (README.md, "Cross-service contract"). Created on
+-- the primary and replicated like any other object, so the two services can't
+-- measure lag differently.
+--
+-- 0 once the replica has replayed all the WAL it received, so an idle primary
+-- doesn't show up as lag; otherwise the age of the last transaction it
+-- replayed (or of the server itself, before the first). A server that isn't
+-- in recovery counts as current.
+CREATE OR REPLACE FUNCTION replica_lag_seconds() RETURNS DOUBLE PRECISION
+LANGUAGE sql AS $$
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= pg_last_wal_receive_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - COALESCE(pg_last_xact_replay_timestamp(), pg_postmaster_start_time()))
+    END::double precision
+$$;
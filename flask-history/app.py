@@ -1,11 +1,42 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from database import Config, execute_query
+from database import Config, execute_query, get_pool_stats, get_replica_pool_stats
+from metrics import init_metrics
+from result_cache import cache_listener, result_cache
+from replica import init_replica_routing, replica_router
+from queries import (
+    SUMMARY_BUCKETS,
+    TIMESERIES_BUCKETS,
+    DEFAULT_TIMESERIES_POINTS,
+    MAX_TIMESERIES_POINTS,
+    get_summaries,
+    get_summary,
+    get_timeseries,
+    stream_transactions
+)
+from utils.validators import (
+    validate_user_id,
+    validate_user_ids,
+    validate_choice,
+    validate_date_range,
+    validate_int,
+    MAX_PAGE_SIZE,
+    handle_errors
+)
+from utils.cursor import decode_cursor, encode_cursor
+from utils.export import EXPORT_FORMATS, EXPORT_MIMETYPES, export_chunks
+from utils.etag import conditional_on_user_version
+from utils.json_provider import JSON_PROVIDERS
 from datetime import datetime, timedelta
 
+def _user_id_arg():
+    user_id = request.args.get('user_id')
+    return int(user_id) if user_id else None
+
 def create_app():
     app = Flask(__name__)
     config = Config()
+    app.json = JSON_PROVIDERS[config.JSON_SERIALIZER](app)
     CORS(app, 
          resources={
              r"/api/*": {
@@ -21,6 +52,17 @@ def create_app():
              }
          })
 
+    if config.METRICS_ENABLED:
+        init_metrics(app, get_pool_stats, result_cache.stats)
+
+    # Read from DB_REPLICA_URL when it is caught up and the request's users haven't just written
+    init_replica_routing(app, replica_router)
+    replica_router.start()
+
+    # Drop cached balances (and read from the primary for a while) when
+    # fastapi-crud commits a write for their user
+    cache_listener.start()
+
     @app.route('/')
     def root():
         return {
@@ -32,7 +74,10 @@ def create_app():
                 'balance': '/api/history/balance?user_id={user_id}',
                 'income': '/api/history/income?user_id={user_id}',
                 'expenses': '/api/history/expenses?user_id={user_id}',
-                'transactions': '/api/history/transactions?user_id={user_id}&start_date={start_date}&end_date={end_date}'
+                'summary': '/api/history/summary?user_id={user_id}&bucket={day|month}',
+                'transactions': '/api/history/transactions?user_id={user_id}&start_date={start_date}&end_date={end_date}&cursor={next_cursor}',
+                'timeseries': '/api/history/timeseries?user_id={user_id}&bucket={day|week|month}&start_date={start_date}&end_date={end_date}&max_points={max_points}',
+                'export': '/api/history/export?user_id={user_id}&format={csv|ndjson}&start_date={start_date}&end_date={end_date}&type={income|expense}'
             }
         }
 
@@ -41,91 +86,185 @@ def create_app():
         return jsonify({
             "service": "flask-history",
             "status": "healthy",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now().isoformat(),
+            "pool": get_pool_stats(),
+            "replica_pool": get_replica_pool_stats(),
+            "replica": replica_router.stats(),
+            "cache": result_cache.stats()
         })
 
     @app.route('/api/history/balance', methods=['GET'])
+    @handle_errors
+    @conditional_on_user_version
     def get_balance():
         try:
-            user_id = request.args.get('user_id')
-            query = """
-                SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END), 0) as balance 
-                FROM transactions 
-                WHERE user_id = %s
-            """
-            result = execute_query(query, (user_id,), fetch=True)
-            return jsonify(result[0] if result else {'balance': 0})
+            summary = get_summary(_user_id_arg())
+            return jsonify({'balance': summary['balance']})
         except Exception as e:
             return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
     @app.route('/api/history/income', methods=['GET'])
+    @handle_errors
+    @conditional_on_user_version
     def get_income():
         try:
-            user_id = request.args.get('user_id')
-            query = """
-                SELECT COALESCE(SUM(amount), 0) as total_income 
-                FROM transactions 
-                WHERE user_id = %s AND type = 'income'
-            """
-            result = execute_query(query, (user_id,), fetch=True)
-            return jsonify(result[0] if result else {'total_income': 0})
+            summary = get_summary(_user_id_arg())
+            return jsonify({'total_income': summary['total_income']})
         except Exception as e:
             return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
     @app.route('/api/history/expenses', methods=['GET'])
+    @handle_errors
+    @conditional_on_user_version
     def get_expenses():
         try:
-            user_id = request.args.get('user_id')
-            query = """
-                SELECT COALESCE(SUM(amount), 0) as total_expenses 
-                FROM transactions 
-                WHERE user_id = %s AND type = 'expense'
-            """
-            result = execute_query(query, (user_id,), fetch=True)
-            return jsonify(result[0] if result else {'total_expenses': 0})
+            summary = get_summary(_user_id_arg())
+            return jsonify({'total_expenses': summary['total_expenses']})
         except Exception as e:
             return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
+    @app.route('/api/history/summary', methods=['GET'])
+    @handle_errors
+    @conditional_on_user_version
+    def get_summary_totals():
+        """Income, expenses, balance and counts for one user or a batch of users in one query"""
+        user_ids = validate_user_ids()
+        if isinstance(user_ids, tuple):  # Error response
+            return user_ids
+
+        bucket = validate_choice('bucket', SUMMARY_BUCKETS)
+        if isinstance(bucket, tuple):  # Error response
+            return bucket
+
+        date_validation = validate_date_range()
+        if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+            return date_validation
+        start_date, end_date = date_validation
+
+        summaries = get_summaries(user_ids, bucket, start_date, end_date)
+        if 'user_ids' not in request.args:
+            return jsonify(summaries[user_ids[0]])
+
+        return jsonify({
+            'summaries': [summaries[user_id] for user_id in user_ids],
+            'count': len(user_ids)
+        })
+
+    @app.route('/api/history/timeseries', methods=['GET'])
+    @handle_errors
+    @conditional_on_user_version(today_unless='end_date')
+    def get_transaction_timeseries():
+        """Income, expenses and net per day, week or month, gap-filled, for charts"""
+        user_id = validate_user_id()
+        if isinstance(user_id, tuple):  # Error response
+            return user_id
+
+        bucket = validate_choice('bucket', TIMESERIES_BUCKETS, default='day')
+        if isinstance(bucket, tuple):  # Error response
+            return bucket
+
+        max_points = validate_int('max_points', DEFAULT_TIMESERIES_POINTS, maximum=MAX_TIMESERIES_POINTS)
+        if isinstance(max_points, tuple):  # Error response
+            return max_points
+
+        date_validation = validate_date_range()
+        if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+            return date_validation
+        start_date, end_date = date_validation
+
+        try:
+            series = get_timeseries(
+                user_id,
+                bucket,
+                start_date.date() if start_date else None,
+                end_date.date() if end_date else None,
+                max_points
+            )
+        except ValueError as e:
+            return jsonify({"error": "Invalid parameter", "message": str(e)}), 400
+        return jsonify(series)
+
     @app.route('/api/history/transactions', methods=['GET'])
     def get_transactions():
         try:
             user_id = request.args.get('user_id')
             days = int(request.args.get('days', 30))
-            limit = int(request.args.get('limit', 10))
+            limit = validate_int('limit', 10, maximum=MAX_PAGE_SIZE)
+            if isinstance(limit, tuple):  # Error response
+                return limit
+            
+            # Optional keyset pagination: continue after the last row of the previous page
+            cursor = request.args.get('cursor')
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except ValueError:
+                return jsonify({"error": "Invalid parameter", "message": "cursor is not valid"}), 400
             
-            query = """
+            date_limit = datetime.now() - timedelta(days=days)
+            params = [user_id, date_limit]
+            keyset = ""
+            if after:
+                keyset = "AND (date, transaction_id) < (%s, %s)"
+                params.extend(after)
+            
+            query = f"""
                 SELECT transaction_id, name, amount, date, type, emoji
                 FROM transactions 
                 WHERE user_id = %s 
                 AND date >= %s 
-                ORDER BY date DESC 
+                {keyset}
+                ORDER BY date DESC, transaction_id DESC 
                 LIMIT %s
             """
-            date_limit = datetime.now() - timedelta(days=days)
-            result = execute_query(query, (user_id, date_limit, limit), fetch=True)
+            # Fetch one extra row to know whether there is a next page
+            params.append(limit + 1)
+            result = execute_query(query, tuple(params), fetch=True)
             
-            # Format the results to ensure proper JSON serialization
-            transactions = []
-            for row in result:
-                transactions.append({
-                    'transaction_id': row['transaction_id'],
-                    'name': row['name'],
-                    'amount': int(row['amount']),  # Convert to int as per your schema
-                    'date': row['date'].isoformat() if row['date'] else None,
-                    'type': row['type'],
-                    'emoji': row['emoji']
-                })
+            next_cursor = None
+            if len(result) > limit:
+                result = result[:limit]
+                next_cursor = encode_cursor(result[-1]['date'], result[-1]['transaction_id'])
             
+            # Rows go out as they are: the JSON provider writes their dates as ISO 8601
             return jsonify({
-                'transactions': transactions,
-                'count': len(transactions),
+                'transactions': result,
+                'count': len(result),
                 'user_id': int(user_id),
                 'days': days,
-                'limit': limit
+                'limit': limit,
+                'next_cursor': next_cursor
             })
         except Exception as e:
             return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
+    @app.route('/api/history/export', methods=['GET'])
+    @handle_errors
+    def export_transactions():
+        """Stream a user's full transaction history as CSV or NDJSON"""
+        user_id = validate_user_id()
+        if isinstance(user_id, tuple):  # Error response
+            return user_id
+
+        export_format = validate_choice('format', EXPORT_FORMATS, default='csv')
+        if isinstance(export_format, tuple):  # Error response
+            return export_format
+
+        transaction_type = validate_choice('type', ('income', 'expense'))
+        if isinstance(transaction_type, tuple):  # Error response
+            return transaction_type
+
+        date_validation = validate_date_range()
+        if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+            return date_validation
+        start_date, end_date = date_validation
+
+        rows = stream_transactions(user_id, start_date, end_date, transaction_type)
+        return Response(
+            export_chunks(rows, export_format),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers={'Content-Disposition': f'attachment; filename="transactions-{user_id}.{export_format}"'}
+        )
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,115 @@
+"""
+Gunicorn settings for serving flask-history in production:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Everything is configured through environment variables, next to the
+service's other settings in .env. Send HUP to the master for a graceful
+reload (new workers start, old ones finish their requests); with
+GUNICORN_PRELOAD=true that only reloads configuration, so use
+GUNICORN_PRELOAD=false when code is deployed in place.
+"""
+
+import glob
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path='./.env')
+
+logger = logging.getLogger('gunicorn.error')
+
+# /metrics adds up every worker's request metrics (metrics.MULTIPROCESS):
+# prometheus_client keeps each process's values in files here, and must see
+# the variable before it is first imported, i.e. before the app is loaded.
+# The directory is emptied when gunicorn starts (not on HUP)
+METRICS_DIR_PREFIX = 'flask-history-metrics-'
+if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix=METRICS_DIR_PREFIX)
+
+# sync: one request at a time per worker; gthread (or threaded): GUNICORN_THREADS
+# requests per worker; gevent: cooperative, needs `pip install gevent psycogreen`
+WORKER_CLASSES = {'sync': 'sync', 'gthread': 'gthread', 'threaded': 'gthread', 'gevent': 'gevent'}
+
+_worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync').lower()
+if _worker_class not in WORKER_CLASSES:
+    raise ValueError(f"Unknown GUNICORN_WORKER_CLASS {_worker_class!r} (use {', '.join(WORKER_CLASSES)})")
+
+bind = f"0.0.0.0:{os.getenv('PORT_FLASK', '6000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+worker_class = WORKER_CLASSES[_worker_class]
+# gthread only (gunicorn turns sync into gthread when threads > 1); keep
+# DB_POOL_MAX >= threads, or requests queue for a connection inside the worker
+threads = int(os.getenv('GUNICORN_THREADS', '4')) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))  # gevent only
+
+# Import the app once in the master and fork workers from it: faster starts and
+# shared memory pages, at the cost of HUP not reloading code
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle each worker after this many requests (0 disables), with jitter so
+# workers don't all restart at once. Off by default for gthread: its worker
+# resets connections it has accepted but not started when it recycles
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0' if worker_class == 'gthread' else '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None  # e.g. "-" for stdout
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+def on_starting(server):
+    # Values left by a previous run would be added to this one's. Runs after
+    # preloading, which only created the master's files: it serves no requests
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        os.remove(path)
+
+def pre_fork(server, worker):
+    # Nothing the master opened may be shared with a worker: a pooled
+    # connection used from two processes corrupts both sessions
+    from database import close_pool
+    close_pool()
+
+def post_worker_init(worker):
+    # Runs in each worker once the app is loaded, after gevent has patched the
+    # standard library, so the pool's locks and connections are the worker's own
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    from database import get_pool
+    from replica import replica_router
+    from result_cache import cache_listener
+    try:
+        get_pool().prefill()
+    except Exception:
+        # The pool connects lazily anyway; a database that is down must not stop the worker
+        logger.warning('Worker %s could not open its database connections', worker.pid, exc_info=True)
+    # The listener and lag monitor threads (started in the master when preloading) don't survive the fork
+    cache_listener.start()
+    replica_router.start()
+
+def child_exit(server, worker):
+    # A dead worker's requests stay in the counters and histograms, but its
+    # in-progress gauge must stop counting
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def when_ready(server):
+    if preload_app:
+        # Workers run their own listener and lag monitor; the master serves no requests
+        from replica import replica_router
+        from result_cache import cache_listener
+        cache_listener.stop()
+        replica_router.stop()
+
+def on_exit(server):
+    # Only a directory created above; one given in the environment is kept
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    if os.path.basename(metrics_dir).startswith(METRICS_DIR_PREFIX):
+        shutil.rmtree(metrics_dir, ignore_errors=True)
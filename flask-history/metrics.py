@@ -0,0 +1,165 @@
+import os
+import time
+from contextvars import ContextVar
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Same metric names as fastapi-crud so dashboards work for both services
+UNMATCHED_ROUTE = '<unmatched>'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS = Counter('http_requests', 'Requests by route and status code', ['method', 'route', 'status'])
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests currently being served', multiprocess_mode='livesum'
+)
+DB_QUERIES = Counter('db_queries', 'Database queries by the route that issued them', ['route'])
+DB_QUERY_SECONDS = Counter('db_query_seconds', 'Time spent in database queries by route', ['route'])
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request', 'Database queries issued while serving one request',
+    ['route'], buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    'db_time_per_request_seconds', 'Database time spent while serving one request',
+    ['route'], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+# Set by gunicorn.conf.py: each worker process writes the metrics above to
+# files in this directory, and /metrics adds them up across workers
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+# [queries, seconds] for the request being served by this thread/context
+_request_db_stats = ContextVar('request_db_stats', default=None)
+
+def observe_db_query(seconds):
+    """Attribute one query taking ``seconds`` to the current request (no-op outside a request)."""
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += seconds
+
+def _family(kind, name, help_text, value):
+    """
+    A one-sample metric family. With several workers the stats it comes from
+    are the scraped worker's own, so the sample carries its pid.
+    """
+    if not MULTIPROCESS:
+        return kind(name, help_text, value=value)
+    family = kind(name, help_text, labels=['pid'])
+    family.add_metric([str(os.getpid())], value)
+    return family
+
+class PoolCollector:
+    """Exports the connection pool statistics at scrape time."""
+
+    def __init__(self, get_pool_stats):
+        self.get_pool_stats = get_pool_stats
+
+    def collect(self):
+        stats = self.get_pool_stats()
+        yield _family(GaugeMetricFamily, 'db_pool_size', 'Open connections', stats['size'])
+        yield _family(GaugeMetricFamily, 'db_pool_checked_out', 'Connections in use', stats['in_use'])
+        yield _family(GaugeMetricFamily, 'db_pool_waiting', 'Threads waiting for a connection', stats['waiting'])
+        yield _family(CounterMetricFamily, 'db_pool_checkouts', 'Connection checkouts', stats['checkouts'])
+        yield _family(CounterMetricFamily, 'db_pool_checkout_timeouts', 'Checkouts that timed out', stats['checkout_timeouts'])
+        yield _family(
+            CounterMetricFamily, 'db_pool_checkout_wait_seconds', 'Time spent waiting for a connection',
+            stats['wait_time_total_ms'] / 1000
+        )
+        yield _family(
+            CounterMetricFamily, 'db_pool_invalidations', 'Connections discarded as broken or failing health checks',
+            stats['connections_discarded'] + stats['failed_health_checks']
+        )
+
+class CacheCollector:
+    """Exports the result cache statistics at scrape time."""
+
+    def __init__(self, get_cache_stats):
+        self.get_cache_stats = get_cache_stats
+
+    def collect(self):
+        stats = self.get_cache_stats()
+        if not stats['enabled']:
+            return
+        for key, help_text in (
+            ('hits', 'Result cache hits'),
+            ('misses', 'Result cache misses'),
+            ('evictions', 'Result cache entries evicted to stay within the size limit'),
+            ('invalidations', 'Users whose cached results were invalidated'),
+            ('errors', 'Result cache backend errors (served uncached)')
+        ):
+            yield _family(CounterMetricFamily, f'result_cache_{key}', help_text, stats.get(key, 0))
+        if 'size' in stats:
+            yield _family(GaugeMetricFamily, 'result_cache_size', 'Entries in the result cache', stats['size'])
+
+_pool_collector = None
+_cache_collector = None
+
+def init_metrics(app, get_pool_stats, get_cache_stats=None):
+    """
+    Record per-route latency, status codes, in-flight requests and DB
+    queries/time on ``app`` and serve them on /metrics.
+
+    For streamed responses the request is recorded when the view returns,
+    so rows fetched while the body streams are not included. Under gunicorn
+    (MULTIPROCESS) the request metrics cover all workers; the pool and cache
+    ones are the scraped worker's, labelled with its pid.
+    """
+    global _pool_collector, _cache_collector
+    if _pool_collector is None:
+        _pool_collector = PoolCollector(get_pool_stats)
+        REGISTRY.register(_pool_collector)
+    if get_cache_stats is not None and _cache_collector is None:
+        _cache_collector = CacheCollector(get_cache_stats)
+        REGISTRY.register(_cache_collector)
+
+    @app.before_request
+    def start_request_metrics():
+        REQUESTS_IN_PROGRESS.inc()
+        g.metrics_started = time.perf_counter()
+        g.metrics_status = 500
+        g.metrics_token = _request_db_stats.set([0, 0.0])
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if 'metrics_started' not in g:
+            return
+        REQUESTS_IN_PROGRESS.dec()
+        queries, seconds = _request_db_stats.get()
+        _request_db_stats.reset(g.metrics_token)
+
+        route = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+        REQUEST_LATENCY.labels(request.method, route).observe(time.perf_counter() - g.metrics_started)
+        REQUESTS.labels(request.method, route, str(g.metrics_status)).inc()
+        DB_QUERIES_PER_REQUEST.labels(route).observe(queries)
+        DB_TIME_PER_REQUEST.labels(route).observe(seconds)
+        if queries:
+            DB_QUERIES.labels(route).inc(queries)
+            DB_QUERY_SECONDS.labels(route).inc(seconds)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(generate_latest(_scrape_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+def _scrape_registry():
+    if not MULTIPROCESS:
+        return REGISTRY
+    # The metric objects in REGISTRY only hold this worker's values; the
+    # collector reads every worker's files instead
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in (_pool_collector, _cache_collector):
+        if collector is not None:
+            registry.register(collector)
+    return registry
@@ -0,0 +1,295 @@
+from datetime import date, timedelta
+from database import Config, execute_query, stream_query
+from result_cache import result_cache
+
+# date_trunc units accepted for summary buckets
+SUMMARY_BUCKETS = ('day', 'month')
+
+# Time series: period units, default range per unit (days back from end_date) and point limits
+TIMESERIES_BUCKETS = ('day', 'week', 'month')
+TIMESERIES_DEFAULT_DAYS = {'day': 30, 'week': 12 * 7, 'month': 365}
+DEFAULT_TIMESERIES_POINTS = 366
+MAX_TIMESERIES_POINTS = 1000
+# Dates the time series accepts: a default start a year before the end, and
+# the day after the end, must still fit in a date (years 1 to 9999)
+TIMESERIES_FIRST_DAY = date(2, 1, 1)
+TIMESERIES_LAST_DAY = date(9998, 12, 31)
+
+def _empty_totals():
+    return {
+        'total_income': 0,
+        'total_expenses': 0,
+        'balance': 0,
+        'income_count': 0,
+        'expense_count': 0,
+        'transaction_count': 0
+    }
+
+def _totals_from_row(row):
+    total_income = int(row['total_income'])
+    total_expenses = int(row['total_expenses'])
+    income_count = int(row['income_count'])
+    expense_count = int(row['expense_count'])
+    return {
+        'total_income': total_income,
+        'total_expenses': total_expenses,
+        'balance': total_income - total_expenses,
+        'income_count': income_count,
+        'expense_count': expense_count,
+        'transaction_count': income_count + expense_count
+    }
+
+def get_summaries(user_ids, bucket=None, start_date=None, end_date=None):
+    """
+    Compute income, expenses, balance and counts for many users in one grouped query.
+
+    All-time totals and monthly buckets are read from the rollup tables when
+    USE_ROLLUPS is enabled; date-filtered and daily summaries scan transactions.
+
+    :param user_ids: Iterable of user IDs
+    :param bucket: Optional 'day' or 'month' to also return per-period totals
+    :param start_date: Optional inclusive lower bound on transaction date
+    :param end_date: Optional inclusive upper bound on transaction date
+    :return: Dict of user_id -> summary dict (users without transactions get zeros)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if bucket is not None and bucket not in SUMMARY_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(SUMMARY_BUCKETS)}")
+
+    if Config.USE_ROLLUPS and not start_date and not end_date and bucket in (None, 'month'):
+        return _build_summaries(user_ids, bucket, _query_rollups(user_ids, bucket))
+
+    conditions = ["user_id = ANY(%s::int[])"]
+    params = [user_ids]
+    if start_date:
+        conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("date <= %s")
+        params.append(end_date)
+
+    aggregates = """
+            COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0) as total_income,
+            COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0) as total_expenses,
+            COUNT(*) FILTER (WHERE type = 'income') as income_count,
+            COUNT(*) FILTER (WHERE type = 'expense') as expense_count
+    """
+
+    if bucket:
+        # One scan produces both the per-user totals and the per-period rows;
+        # the unit is interpolated from SUMMARY_BUCKETS so the GROUP BY
+        # expression matches the select list exactly.
+        period = f"date_trunc('{bucket}', date)"
+        query = f"""
+            SELECT user_id, {period} as period, GROUPING({period}) as is_total, {aggregates}
+            FROM transactions
+            WHERE {' AND '.join(conditions)}
+            GROUP BY GROUPING SETS ((user_id), (user_id, {period}))
+            ORDER BY user_id, is_total DESC, period
+        """
+    else:
+        query = f"""
+            SELECT user_id, {aggregates}
+            FROM transactions
+            WHERE {' AND '.join(conditions)}
+            GROUP BY user_id
+        """
+
+    rows = execute_query(query, tuple(params), fetch_all=True) if user_ids else []
+    return _build_summaries(user_ids, bucket, rows)
+
+def _query_rollups(user_ids, bucket):
+    """Read totals (and monthly buckets) from the rollup tables: one indexed lookup per user."""
+    if not user_ids:
+        return []
+
+    totals = """
+        SELECT user_id, NULL::timestamp as period, 1 as is_total,
+               total_income, total_expenses, income_count, expense_count
+        FROM user_balances
+        WHERE user_id = ANY(%s::int[])
+    """
+    if not bucket:
+        return execute_query(totals, (user_ids,), fetch_all=True)
+
+    query = totals + """
+        UNION ALL
+        SELECT user_id, month::timestamp, 0,
+               total_income, total_expenses, income_count, expense_count
+        FROM user_monthly_balances
+        WHERE user_id = ANY(%s::int[]) AND (income_count <> 0 OR expense_count <> 0)
+        ORDER BY user_id, is_total DESC, period
+    """
+    return execute_query(query, (user_ids, user_ids), fetch_all=True)
+
+def _build_summaries(user_ids, bucket, rows):
+    summaries = {}
+    for user_id in user_ids:
+        summaries[user_id] = {'user_id': user_id, **_empty_totals()}
+        if bucket:
+            summaries[user_id]['buckets'] = []
+
+    for row in rows:
+        summary = summaries[row['user_id']]
+        if bucket and not row['is_total']:
+            summary['buckets'].append({
+                'period': row['period'].date().isoformat(),
+                **_totals_from_row(row)
+            })
+        else:
+            summary.update(_totals_from_row(row))
+
+    return summaries
+
+def get_summary(user_id, bucket=None, start_date=None, end_date=None):
+    """Compute the summary for a single user (see get_summaries); all-time totals are cached."""
+    if user_id is not None and bucket is None and start_date is None and end_date is None:
+        return result_cache.get_or_compute(user_id, 'summary', lambda: get_summaries([user_id])[user_id])
+    return get_summaries([user_id], bucket, start_date, end_date)[user_id]
+
+def stream_transactions(user_id, start_date=None, end_date=None, transaction_type=None, chunk_size=1000):
+    """
+    Stream a user's transactions oldest first through a server-side cursor.
+
+    :param user_id: User ID
+    :param start_date: Optional inclusive lower bound on transaction date
+    :param end_date: Optional inclusive upper bound on transaction date
+    :param transaction_type: Optional 'income' or 'expense'
+    :return: Generator of dict rows (transaction_id, date, type, name, amount, emoji)
+    """
+    conditions = ["user_id = %s"]
+    params = [user_id]
+    if start_date:
+        conditions.append("date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("date <= %s")
+        params.append(end_date)
+    if transaction_type:
+        conditions.append("type = %s")
+        params.append(transaction_type)
+
+    query = f"""
+        SELECT transaction_id, date, type, name, amount, emoji
+        FROM transactions
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date, transaction_id
+    """
+    return stream_query(query, tuple(params), chunk_size)
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+def _timeseries_layout(bucket, start_day, end_day, max_points):
+    """
+    First period start, units per point and number of points covering
+    [start_day, end_day] with at most ``max_points`` points.
+    """
+    if bucket == 'month':
+        origin = start_day.replace(day=1)
+        units = _month_index(end_day) - _month_index(origin) + 1
+    elif bucket == 'week':
+        origin = start_day - timedelta(days=start_day.weekday())  # ISO weeks start on Monday
+        units = (end_day - origin).days // 7 + 1
+    else:
+        origin = start_day
+        units = (end_day - origin).days + 1
+    # Downsample by widening each point to several units (2 days, 3 months, ...)
+    step = -(-units // max_points)
+    return origin, step, -(-units // step)
+
+def get_timeseries(user_id, bucket='day', start_day=None, end_day=None, max_points=DEFAULT_TIMESERIES_POINTS):
+    """
+    Income, expenses and net per period for one user, computed in one grouped query.
+
+    Periods are aligned to the bucket (days, ISO weeks starting on Monday,
+    calendar months), so the first one may start before ``start_day``; only
+    transactions inside the range are counted. Periods without transactions
+    are filled with zeros. When the range holds more than ``max_points``
+    periods, each point covers ``step`` consecutive periods instead.
+
+    :param user_id: User ID
+    :param bucket: 'day', 'week' or 'month'
+    :param start_day: First date to include (default: TIMESERIES_DEFAULT_DAYS before end_day)
+    :param end_day: Last date to include (default: today)
+    :param max_points: Upper bound on the number of points returned
+    :return: Dict with bucket, step, start/end dates and the list of points
+    """
+    if bucket not in TIMESERIES_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(TIMESERIES_BUCKETS)}")
+    end_day = end_day or date.today()
+    for day in (start_day, end_day):
+        if day is not None and not TIMESERIES_FIRST_DAY <= day <= TIMESERIES_LAST_DAY:
+            raise ValueError(f'dates must be between {TIMESERIES_FIRST_DAY} and {TIMESERIES_LAST_DAY}')
+    start_day = start_day or end_day - timedelta(days=TIMESERIES_DEFAULT_DAYS[bucket] - 1)
+    if start_day > end_day:
+        raise ValueError('start_date must not be after end_date')
+
+    origin, step, points = _timeseries_layout(bucket, start_day, end_day, max_points)
+    params = {
+        'user_id': user_id,
+        'start': start_day,
+        'end': end_day + timedelta(days=1),
+        'origin': origin,
+        'origin_month': _month_index(origin),
+        'step': step,
+        'days': step * 7 if bucket == 'week' else step,
+        'points': points,
+    }
+    # Point index of a transaction, and the first day of a point; the bucket
+    # only selects between these fixed expressions
+    if bucket == 'month':
+        index = "((EXTRACT(YEAR FROM date)::int * 12 + EXTRACT(MONTH FROM date)::int - 1) - %(origin_month)s) / %(step)s"
+        period = "(%(origin)s::date + make_interval(months => s.i * %(step)s))::date"
+    else:
+        index = "(date::date - %(origin)s::date) / %(days)s"
+        period = "%(origin)s::date + s.i * %(days)s"
+
+    # The range condition is on date itself, so the (user_id, date) index and
+    # partition pruning apply; generate_series supplies the empty periods
+    query = f"""
+        WITH totals AS (
+            SELECT {index} as i,
+                   COALESCE(SUM(amount) FILTER (WHERE type = 'income'), 0) as income,
+                   COALESCE(SUM(amount) FILTER (WHERE type = 'expense'), 0) as expenses,
+                   COUNT(*) as transaction_count
+            FROM transactions
+            WHERE user_id = %(user_id)s AND date >= %(start)s AND date < %(end)s
+            GROUP BY 1
+        )
+        SELECT {period} as period,
+               COALESCE(t.income, 0) as income,
+               COALESCE(t.expenses, 0) as expenses,
+               COALESCE(t.transaction_count, 0) as transaction_count
+        FROM generate_series(0, %(points)s - 1) as s(i)
+        LEFT JOIN totals t USING (i)
+        ORDER BY s.i
+    """
+    rows = execute_query(query, params, fetch_all=True)
+
+    return {
+        'user_id': user_id,
+        'bucket': bucket,
+        'step': step,
+        'start_date': start_day.isoformat(),
+        'end_date': end_day.isoformat(),
+        'points': [
+            {
+                'period': row['period'].isoformat(),
+                'income': int(row['income']),
+                'expenses': int(row['expenses']),
+                'net': int(row['income']) - int(row['expenses']),
+                'transaction_count': int(row['transaction_count'])
+            }
+            for row in rows
+        ]
+    }
+
+def get_user_version(user_id):
+    """The user's data version from user_versions (bumped by fastapi-crud on every write); 0 if never written."""
+    row = execute_query(
+        "SELECT version FROM user_versions WHERE user_id = %s",
+        (user_id,),
+        fetch_one=True
+    )
+    return int(row['version']) if row else 0
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from flask import g, request
+from database import Config, get_replica_pool, replica_reads
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind, as defined by fastapi-crud's migration 0006
+# (README.md, "Cross-service contract")
+REPLICA_LAG_SQL = 'SELECT replica_lag_seconds()'
+
+# Lag checks missed in a row after which the last one no longer counts
+STALE_CHECKS = 3
+
+class ReplicaRouter:
+    """
+    Decides, per request, whether the replica may serve its reads.
+
+    Same rules as fastapi-crud's app.replica.ReplicaRouter (README.md, "Read
+    replica"): a request stays on the primary after a write by one of its
+    users, which record_write learns from the cache listener, and while the
+    replica is behind, failing or unchecked. The lag check thread, like the
+    cache listener's, is restarted by start() in each forked worker.
+    """
+
+    def __init__(self, measure_lag, max_lag=2.0, check_interval=1.0, read_your_writes=5.0):
+        self.measure_lag = measure_lag
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.read_your_writes = read_your_writes
+        self._lock = threading.Lock()
+        self._written_until = {}  # user_id -> monotonic deadline of their primary reads
+        self._everyone_until = 0.0
+        self._available = False
+        self._checked_at = None
+        self._state = None  # current, behind or unreachable, as of the last check
+        self.lag = None
+        self.replica_reads = 0
+        self.primary_reads_after_write = 0
+        self.primary_reads_unavailable = 0
+        self.failures = 0
+        self.check_failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        if self.enabled and read_your_writes <= max_lag + check_interval:
+            logger.warning(
+                'REPLICA_READ_YOUR_WRITES (%.1fs) should exceed REPLICA_MAX_LAG + REPLICA_CHECK_INTERVAL (%.1fs); '
+                'users may not see their own writes', read_your_writes, max_lag + check_interval
+            )
+
+    @property
+    def enabled(self):
+        return self.measure_lag is not None
+
+    def record_write(self, user_id):
+        """Keep ``user_id``'s reads on the primary for the read-your-writes window."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._written_until[user_id] = time.monotonic() + self.read_your_writes
+
+    def record_unknown_writes(self):
+        """Keep everyone's reads on the primary for the window, for when writes may have gone unrecorded."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._everyone_until = time.monotonic() + self.read_your_writes
+
+    def use_replica(self, user_ids):
+        """Whether a read of ``user_ids``' data may go to the replica."""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now < self._everyone_until or any(now < self._written_until.get(u, 0.0) for u in user_ids):
+                self.primary_reads_after_write += 1
+                return False
+            fresh = self._checked_at is not None and now - self._checked_at < STALE_CHECKS * self.check_interval
+            if not (self._available and fresh):
+                self.primary_reads_unavailable += 1
+                return False
+            self.replica_reads += 1
+            return True
+
+    def replica_failed(self):
+        """A read on the replica failed: use the primary until the next check succeeds."""
+        with self._lock:
+            self._available = False
+            self.failures += 1
+
+    def check(self):
+        """Measure the lag once and route by it until the next check."""
+        error = None
+        try:
+            lag = self.measure_lag()
+        except Exception as e:
+            lag, error = None, e
+        state = 'unreachable' if lag is None else 'behind' if lag > self.max_lag else 'current'
+        if state != self._state:
+            # Logged on changes only, not on every check of a replica that stays down
+            if state == 'current':
+                logger.info('Read replica is current; serving reads from it')
+            elif state == 'behind':
+                logger.warning('Read replica is %.1fs behind (limit %.1fs); reading from the primary', lag, self.max_lag)
+            else:
+                logger.warning('Read replica is unreachable; reading from the primary', exc_info=error)
+            self._state = state
+        with self._lock:
+            self.lag = lag
+            self._available = state == 'current'
+            self._checked_at = now = time.monotonic()
+            if lag is None:
+                self.check_failures += 1
+            self._written_until = {u: until for u, until in self._written_until.items() if until > now}
+
+    def start(self):
+        if not self.enabled:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()  # may have been held across a fork
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='replica-lag-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        stop = self._stop
+        while not stop.is_set():
+            self.check()
+            stop.wait(self.check_interval)
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self._lock:
+            return {
+                'enabled': True,
+                'available': self._available,
+                'lag_seconds': round(self.lag, 3) if self.lag is not None else None,
+                'max_lag_seconds': self.max_lag,
+                'read_your_writes_seconds': self.read_your_writes,
+                'recent_writers': len(self._written_until),
+                'replica_reads': self.replica_reads,
+                'primary_reads_after_write': self.primary_reads_after_write,
+                'primary_reads_unavailable': self.primary_reads_unavailable,
+                'failures': self.failures,
+                'check_failures': self.check_failures
+            }
+
+def measure_replica_lag():
+    with get_replica_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = cursor.fetchone()[0]
+        conn.rollback()
+    return float(lag)
+
+def _request_user_ids():
+    """The users named by the request's user_id / user_ids arguments; malformed values are left to the view."""
+    user_ids = []
+    for value in [request.args.get('user_id', '')] + request.args.get('user_ids', '').split(','):
+        try:
+            user_ids.append(int(value))
+        except ValueError:
+            pass
+    return user_ids
+
+def init_replica_routing(app, router):
+    """
+    Route the reads of each request naming users to the replica when
+    ``router`` allows it for all of them; other requests read the primary.
+    """
+    if not router.enabled:
+        return
+
+    @app.before_request
+    def route_reads():
+        user_ids = _request_user_ids()
+        if user_ids and router.use_replica(user_ids):
+            g.replica_reads_token = replica_reads.set(router.replica_failed)
+
+    @app.teardown_request
+    def reset_reads(exc):
+        token = g.pop('replica_reads_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+
+replica_router = ReplicaRouter(
+    measure_replica_lag if Config.DB_REPLICA_URL else None,
+    max_lag=Config.REPLICA_MAX_LAG,
+    check_interval=Config.REPLICA_CHECK_INTERVAL,
+    read_your_writes=Config.REPLICA_READ_YOUR_WRITES
+)
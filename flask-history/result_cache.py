@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+import psycopg2
+from database import Config, get_connection
+from replica import replica_router
+
+logger = logging.getLogger(__name__)
+
+class LRUBackend:
+    """Per-process backend; the same bounded, expiring LRU as fastapi-crud's."""
+
+    name = 'lru'
+
+    def __init__(self, maxsize=10000, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, name) -> (deadline, value)
+        self._names_by_user = {}
+        self.evictions = 0
+
+    def get(self, user_id, name):
+        key = (user_id, name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, user_id, name, value):
+        key = (user_id, name)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._names_by_user.setdefault(user_id, set()).add(name)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for name in list(self._names_by_user.get(user_id, ())):
+                self._remove((user_id, name))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._names_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'evictions': self.evictions}
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        names = self._names_by_user.get(key[0])
+        if names is not None:
+            names.discard(key[1])
+            if not names:
+                del self._names_by_user[key[0]]
+
+class RedisBackend:
+    """
+    Backend shared by all gunicorn workers through Redis (any redis-py
+    compatible ``client``). The key prefix keeps it apart from fastapi-crud's
+    entries when both services use the same Redis.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, ttl=60.0, prefix='flask-history:result-cache'):
+        self.client = client
+        self.ttl = max(1, int(ttl))
+        self.prefix = prefix
+
+    def _key(self, user_id, name=None):
+        return f'{self.prefix}:{user_id}' + (f':{name}' if name is not None else '')
+
+    def get(self, user_id, name):
+        raw = self.client.get(self._key(user_id, name))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, user_id, name, value):
+        index = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.set(self._key(user_id, name), json.dumps(value), ex=self.ttl)
+        pipe.sadd(index, name)
+        pipe.expire(index, self.ttl)
+        pipe.execute()
+
+    def invalidate_user(self, user_id):
+        index = self._key(user_id)
+        names = [n.decode() if isinstance(n, bytes) else n for n in self.client.smembers(index)]
+        self.client.delete(index, *(self._key(user_id, name) for name in names))
+
+    def clear(self):
+        # Shared entries are dropped per user as invalidations arrive; the TTL covers the rest
+        pass
+
+    def stats(self):
+        return {}
+
+class ResultCache:
+    """
+    Per-user cache of the all-time aggregates in queries.py.
+
+    Works like fastapi-crud's app.result_cache.ResultCache: values are JSON
+    and never None, and a failing backend only means computing the value.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.enabled = backend is not None
+        self._lock = threading.Lock()
+        self._invalidation_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def get_or_compute(self, user_id, name, compute):
+        """Return the cached value of ``name`` for ``user_id``, computing and storing it on a miss."""
+        if not self.enabled:
+            return compute()
+
+        try:
+            value = self.backend.get(user_id, name)
+        except Exception:
+            self._record_error('get')
+            return compute()
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        invalidations_before = self._invalidation_count
+        value = compute()
+        # An invalidation that came in meanwhile may be for a write the value missed
+        if value is not None and self._invalidation_count == invalidations_before:
+            try:
+                self.backend.set(user_id, name, value)
+            except Exception:
+                self._record_error('set')
+        return value
+
+    def invalidate_user(self, user_id):
+        """Drop every cached value of ``user_id``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._invalidation_count += 1
+            self.invalidations += 1
+        try:
+            self.backend.invalidate_user(user_id)
+        except Exception:
+            self._record_error('invalidate')
+
+    def clear(self):
+        """Drop everything this process cached (after missing invalidations)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._invalidation_count += 1
+        self.backend.clear()
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        stats = {
+            'enabled': True,
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'errors': self.errors
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+    def _record_error(self, operation):
+        self.errors += 1
+        logger.warning('Result cache %s failed; serving uncached', operation, exc_info=True)
+
+class InvalidationListener:
+    """
+    Consumes fastapi-crud's write notifications on ``channel``, as README.md
+    ("Cross-service contract") defines them: drops the user from ``cache``,
+    and tells ``replica_router`` (replica.py) about the write.
+
+    The thread has its own connection outside the pool. start() is a no-op
+    if this process already runs it, and starts a new one in a forked
+    gunicorn worker.
+    """
+
+    def __init__(self, cache, channel, poll_interval=5.0, replica_router=None):
+        self.cache = cache
+        self.replica_router = replica_router
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        routing = self.replica_router is not None and self.replica_router.enabled
+        if not (self.cache.enabled or routing):
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop = threading.Event()  # not clear(): the old one's lock may have been held across a fork
+        self._thread = threading.Thread(target=self._run, name='result-cache-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = get_connection()
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                self.cache.clear()
+                if self.replica_router is not None:
+                    self.replica_router.record_unknown_writes()
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            self._handle(conn.notifies.pop(0).payload)
+            except psycopg2.Error:
+                logger.warning('Result cache listener lost its connection; retrying in %.0fs', backoff, exc_info=True)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _handle(self, payload):
+        try:
+            user_id = int(payload.split(':', 1)[0])
+        except ValueError:
+            logger.warning('Ignoring malformed cache invalidation %r', payload)
+            return
+        self.cache.invalidate_user(user_id)
+        if self.replica_router is not None:
+            self.replica_router.record_write(user_id)
+
+def create_backend(config):
+    """The backend selected by RESULT_CACHE_BACKEND, or None when caching is off."""
+    kind = config.RESULT_CACHE_BACKEND
+    if kind == 'none':
+        return None
+    if kind == 'lru':
+        return LRUBackend(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+    if kind == 'redis':
+        import redis  # only needed for this backend
+        return RedisBackend(redis.Redis.from_url(config.RESULT_CACHE_REDIS_URL), config.RESULT_CACHE_TTL)
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND {kind!r} (use lru, redis or none)")
+
+result_cache = ResultCache(create_backend(Config()))
+cache_listener = InvalidationListener(result_cache, Config.RESULT_CACHE_CHANNEL, replica_router=replica_router)
@@ -1,7 +1,28 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from datetime import datetime, timedelta
-from database import execute_query
-from utils.validators import validate_user_id, validate_date_range, handle_errors
+from database import execute_query, get_pool_stats
+from queries import (
+    SUMMARY_BUCKETS,
+    TIMESERIES_BUCKETS,
+    DEFAULT_TIMESERIES_POINTS,
+    MAX_TIMESERIES_POINTS,
+    get_summaries,
+    get_summary,
+    get_timeseries,
+    stream_transactions
+)
+from utils.validators import (
+    validate_user_id,
+    validate_user_ids,
+    validate_choice,
+    validate_date_range,
+    validate_int,
+    MAX_PAGE_SIZE,
+    validate_cursor,
+    handle_errors
+)
+from utils.cursor import encode_cursor
+from utils.export import EXPORT_FORMATS, EXPORT_MIMETYPES, export_chunks
 
 history_bp = Blueprint('history', __name__)
 
@@ -11,7 +32,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'flask-history',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'pool': get_pool_stats()
     })
 
 @history_bp.route('/balance', methods=['GET'])
@@ -22,27 +44,15 @@ def get_total_balance():
     if isinstance(user_id, tuple):  # Error response
         return user_id
     
-    query = """
-        SELECT 
-            COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) as total_income,
-            COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) as total_expenses
-        FROM transactions 
-        WHERE user_id = %s
-    """
-    
-    result = execute_query(query, (user_id,), fetch_one=True)
-    
-    total_income = float(result['total_income'])
-    total_expenses = float(result['total_expenses'])
-    balance = total_income - total_expenses
+    summary = get_summary(user_id)
     
     return jsonify({
         'success': True,
         'data': {
             'user_id': user_id,
-            'balance': balance,
-            'total_income': total_income,
-            'total_expenses': total_expenses
+            'balance': float(summary['balance']),
+            'total_income': float(summary['total_income']),
+            'total_expenses': float(summary['total_expenses'])
         },
         'timestamp': datetime.now().isoformat()
     })
@@ -55,20 +65,13 @@ def get_total_income():
     if isinstance(user_id, tuple):  # Error response
         return user_id
     
-    query = """
-        SELECT COALESCE(SUM(amount), 0) as total_income
-        FROM transactions 
-        WHERE user_id = %s AND type = 'income'
-    """
-    
-    result = execute_query(query, (user_id,), fetch_one=True)
-    total_income = float(result['total_income'])
+    summary = get_summary(user_id)
     
     return jsonify({
         'success': True,
         'data': {
             'user_id': user_id,
-            'total_income': total_income
+            'total_income': float(summary['total_income'])
         },
         'timestamp': datetime.now().isoformat()
     })
@@ -81,24 +84,111 @@ def get_total_expenses():
     if isinstance(user_id, tuple):  # Error response
         return user_id
     
-    query = """
-        SELECT COALESCE(SUM(amount), 0) as total_expenses
-        FROM transactions 
-        WHERE user_id = %s AND type = 'expense'
+    summary = get_summary(user_id)
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'user_id': user_id,
+            'total_expenses': float(summary['total_expenses'])
+        },
+        'timestamp': datetime.now().isoformat()
+    })
+
+@history_bp.route('/summary', methods=['GET'])
+@handle_errors
+def get_user_summaries():
+    """
+    Get income, expenses, balance and counts in a single grouped query
+    
+    Query parameters:
+    - user_id or user_ids (required): User ID, or comma-separated list of user IDs
+    - bucket (optional): 'day' or 'month' to include per-period totals
+    - start_date (optional): Start date in ISO format
+    - end_date (optional): End date in ISO format
     """
+    user_ids = validate_user_ids()
+    if isinstance(user_ids, tuple):  # Error response
+        return user_ids
+    
+    bucket = validate_choice('bucket', SUMMARY_BUCKETS)
+    if isinstance(bucket, tuple):  # Error response
+        return bucket
+    
+    date_validation = validate_date_range()
+    if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+        return date_validation
     
-    result = execute_query(query, (user_id,), fetch_one=True)
-    total_expenses = float(result['total_expenses'])
+    start_date, end_date = date_validation
+    summaries = get_summaries(user_ids, bucket, start_date, end_date)
     
     return jsonify({
         'success': True,
         'data': {
-            'user_id': user_id,
-            'total_expenses': total_expenses
+            'summaries': [summaries[user_id] for user_id in user_ids],
+            'count': len(user_ids),
+            'filters': {
+                'bucket': bucket,
+                'start_date': start_date.isoformat() if start_date else None,
+                'end_date': end_date.isoformat() if end_date else None
+            }
         },
         'timestamp': datetime.now().isoformat()
     })
 
+@history_bp.route('/timeseries', methods=['GET'])
+@handle_errors
+def get_transaction_timeseries():
+    """
+    Get income, expenses and net per period for charts, computed in one grouped query
+    
+    Empty periods are returned with zeros. When the range holds more periods
+    than max_points, each point covers several periods (see 'step').
+    
+    Query parameters:
+    - user_id (required): User ID
+    - bucket (optional): 'day' (default), 'week' or 'month'
+    - start_date (optional): Start date in ISO format (default: 30 days, 12 weeks or a year before end_date)
+    - end_date (optional): End date in ISO format (default: today)
+    - max_points (optional): Most points to return (default: 366, at most 1000)
+    """
+    user_id = validate_user_id()
+    if isinstance(user_id, tuple):  # Error response
+        return user_id
+    
+    bucket = validate_choice('bucket', TIMESERIES_BUCKETS, default='day')
+    if isinstance(bucket, tuple):  # Error response
+        return bucket
+    
+    max_points = validate_int('max_points', DEFAULT_TIMESERIES_POINTS, maximum=MAX_TIMESERIES_POINTS)
+    if isinstance(max_points, tuple):  # Error response
+        return max_points
+    
+    date_validation = validate_date_range()
+    if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+        return date_validation
+    
+    start_date, end_date = date_validation
+    try:
+        series = get_timeseries(
+            user_id,
+            bucket,
+            start_date.date() if start_date else None,
+            end_date.date() if end_date else None,
+            max_points
+        )
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': str(e)
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'data': series,
+        'timestamp': datetime.now().isoformat()
+    })
+
 @history_bp.route('/transactions', methods=['GET'])
 @handle_errors
 def get_recent_transactions():
@@ -111,6 +201,7 @@ def get_recent_transactions():
     - end_date (optional): End date in ISO format
     - days (optional): Number of recent days (default: 10)
     - limit (optional): Limit number of results (default: 100)
+    - cursor (optional): next_cursor from the previous page
     """
     user_id = validate_user_id()
     if isinstance(user_id, tuple):  # Error response
@@ -123,63 +214,61 @@ def get_recent_transactions():
     
     start_date, end_date = date_validation
     
+    after = validate_cursor()
+    if isinstance(after, tuple) and hasattr(after[0], 'status_code'):
+        return after
+    
     # Get other optional parameters
     days = request.args.get('days', '10')
-    limit = request.args.get('limit', '100')
     
     try:
         days = int(days)
-        limit = int(limit)
     except ValueError:
         return jsonify({
             'error': 'Invalid parameter',
-            'message': 'days and limit must be valid integers'
+            'message': 'days must be a valid integer'
         }), 400
     
+    limit = validate_int('limit', 100, maximum=MAX_PAGE_SIZE)
+    if isinstance(limit, tuple):  # Error response
+        return limit
+    
     # Build query based on date parameters
-    if start_date and end_date:
-        # Custom date range
-        query = """
-            SELECT transaction_id, name, amount, date, type, emoji
-            FROM transactions 
-            WHERE user_id = %s AND date >= %s AND date <= %s
-            ORDER BY date DESC
-            LIMIT %s
-        """
-        params = (user_id, start_date, end_date, limit)
-    elif start_date:
-        # From start_date to now
-        query = """
-            SELECT transaction_id, name, amount, date, type, emoji
-            FROM transactions 
-            WHERE user_id = %s AND date >= %s
-            ORDER BY date DESC
-            LIMIT %s
-        """
-        params = (user_id, start_date, limit)
-    elif end_date:
-        # From beginning to end_date
-        query = """
-            SELECT transaction_id, name, amount, date, type, emoji
-            FROM transactions 
-            WHERE user_id = %s AND date <= %s
-            ORDER BY date DESC
-            LIMIT %s
-        """
-        params = (user_id, end_date, limit)
-    else:
+    conditions = ['user_id = %s']
+    params = [user_id]
+    if start_date:
+        conditions.append('date >= %s')
+        params.append(start_date)
+    if end_date:
+        conditions.append('date <= %s')
+        params.append(end_date)
+    if not start_date and not end_date:
         # Last N days (default behavior)
         start_date = datetime.now() - timedelta(days=days)
-        query = """
-            SELECT transaction_id, name, amount, date, type, emoji
-            FROM transactions 
-            WHERE user_id = %s AND date >= %s
-            ORDER BY date DESC
-            LIMIT %s
-        """
-        params = (user_id, start_date, limit)
+        conditions.append('date >= %s')
+        params.append(start_date)
+    
+    # Keyset pagination: continue strictly after the last row of the previous page
+    if after:
+        conditions.append('(date, transaction_id) < (%s, %s)')
+        params.extend(after)
+    
+    query = f"""
+        SELECT transaction_id, name, amount, date, type, emoji
+        FROM transactions 
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date DESC, transaction_id DESC
+        LIMIT %s
+    """
+    # Fetch one extra row to know whether there is a next page
+    params.append(limit + 1)
+    
+    results = execute_query(query, tuple(params), fetch_all=True)
     
-    results = execute_query(query, params, fetch_all=True)
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1]['date'], results[-1]['transaction_id'])
     
     # Format results
     transactions = []
@@ -199,6 +288,7 @@ def get_recent_transactions():
             'user_id': user_id,
             'transactions': transactions,
             'count': len(transactions),
+            'next_cursor': next_cursor,
             'filters': {
                 'start_date': start_date.isoformat() if start_date else None,
                 'end_date': end_date.isoformat() if end_date else None,
@@ -207,4 +297,45 @@ def get_recent_transactions():
             }
         },
         'timestamp': datetime.now().isoformat()
-    })
\ No newline at end of file
+    })
+
+@history_bp.route('/export', methods=['GET'])
+@handle_errors
+def export_transactions():
+    """
+    Stream a user's full transaction history, oldest first
+    
+    Rows are read through a server-side cursor and written as they arrive,
+    so memory use is flat regardless of history size.
+    
+    Query parameters:
+    - user_id (required): User ID
+    - format (optional): 'csv' (default) or 'ndjson'
+    - start_date (optional): Start date in ISO format
+    - end_date (optional): End date in ISO format
+    - type (optional): 'income' or 'expense'
+    """
+    user_id = validate_user_id()
+    if isinstance(user_id, tuple):  # Error response
+        return user_id
+    
+    export_format = validate_choice('format', EXPORT_FORMATS, default='csv')
+    if isinstance(export_format, tuple):  # Error response
+        return export_format
+    
+    transaction_type = validate_choice('type', ('income', 'expense'))
+    if isinstance(transaction_type, tuple):  # Error response
+        return transaction_type
+    
+    date_validation = validate_date_range()
+    if isinstance(date_validation, tuple) and len(date_validation) == 2 and hasattr(date_validation[0], 'status_code'):
+        return date_validation
+    
+    start_date, end_date = date_validation
+    rows = stream_transactions(user_id, start_date, end_date, transaction_type)
+    
+    return Response(
+        export_chunks(rows, export_format),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="transactions-{user_id}.{export_format}"'}
+    )
\ No newline at end of file
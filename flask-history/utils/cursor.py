@@ -0,0 +1,29 @@
+import base64
+import json
+from datetime import datetime
+
+def encode_cursor(date, transaction_id):
+    """
+    Encode the (date, transaction_id) keyset position of a row as an opaque cursor
+    
+    Uses the same format as fastapi-crud's /api/transactions/list/cursor.
+    """
+    payload = json.dumps({'d': date.isoformat(), 'id': transaction_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Returns:
+        tuple: (date, transaction_id)
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['d']), int(payload['id'])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
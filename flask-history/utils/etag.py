@@ -0,0 +1,63 @@
+import hashlib
+from datetime import date
+from functools import wraps
+from flask import make_response, request
+from queries import get_user_version
+
+# ETags, their Cache-Control and how the version is read follow
+# README.md, "Cross-service contract", like fastapi-crud's app.versions
+CACHE_CONTROL = 'private, no-cache'
+
+def user_etag(user_id, version, resource):
+    """
+    Strong ETag for ``resource`` (path and query string) of a user at a data version
+
+    Checked against fastapi-crud's by db/check_contract.py.
+    """
+    digest = hashlib.sha1(resource.encode()).hexdigest()[:16]
+    return f'"{user_id}-{version}-{digest}"'
+
+def _resource(today_unless=None):
+    query = request.query_string.decode()
+    resource = f"{request.path}?{'&'.join(sorted(query.split('&'))) if query else ''}"
+    if today_unless is not None and not request.args.get(today_unless):
+        resource += f"#today={date.today().isoformat()}"
+    return resource
+
+def conditional_on_user_version(f=None, *, today_unless=None):
+    """
+    Decorator answering If-None-Match for single-user endpoints from user_versions
+
+    When the request names exactly one user_id, the user's data version is
+    looked up first: a matching ETag gets 304 Not Modified without running
+    the view, otherwise the view's 200 response is tagged. Other requests
+    (no user_id, or a user_ids batch) pass through untouched.
+
+    ``today_unless`` names a query argument whose absence makes the view
+    read up to today (e.g. end_date): the ETag then also covers today's
+    date, so a poll after midnight gets the new day instead of a 304.
+    """
+    if f is None:
+        return lambda view: conditional_on_user_version(view, today_unless=today_unless)
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            user_id = int(request.args['user_id'])
+        except (KeyError, ValueError):
+            return f(*args, **kwargs)
+        if 'user_ids' in request.args:
+            return f(*args, **kwargs)
+
+        # Version first, then the view (see the contract)
+        etag = user_etag(user_id, get_user_version(user_id), _resource(today_unless))
+        if request.if_none_match.contains_weak(etag.strip('"')):
+            response = make_response('', 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        return response
+    return decorated_function
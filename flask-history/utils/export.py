@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_MIMETYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_COLUMNS = ('transaction_id', 'date', 'type', 'name', 'amount', 'emoji')
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def export_chunks(rows, export_format, chunk_size=1000):
+    """
+    Render dict rows as CSV (with a header line) or NDJSON, ``chunk_size`` rows per yielded string
+
+    Works on any iterable of rows, so with stream_query() nothing beyond one
+    chunk is held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow([_value(row[column]) for column in EXPORT_COLUMNS])
+        else:
+            buffer.write(json.dumps({column: _value(row[column]) for column in EXPORT_COLUMNS}))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,59 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+def _default(o):
+    """Types neither json nor orjson encode the way the API does"""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """
+    Flask's stock provider, except dates and datetimes are ISO 8601 (as in
+    fastapi-crud) instead of HTTP dates, so views can pass rows straight through
+    """
+
+    default = staticmethod(_default)
+
+class ORJSONProvider(JSONProvider):
+    """
+    JSON provider backed by orjson
+
+    Output matches ISOJSONProvider apart from non-ASCII text being written as
+    UTF-8 rather than \\u escapes: keys are sorted, datetimes are ISO 8601 and
+    the body ends with a newline. Rows from RealDictCursor are encoded
+    directly, without copying them into plain dicts first.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson  # only needed when JSON_SERIALIZER is orjson
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return self._orjson.dumps(obj, default=_default, option=self._options).decode()
+
+    def loads(self, s, **kwargs):
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._options | self._orjson.OPT_APPEND_NEWLINE
+        if self._app.debug:
+            option |= self._orjson.OPT_INDENT_2
+        return self._app.response_class(
+            self._orjson.dumps(obj, default=_default, option=option),
+            mimetype='application/json'
+        )
+
+JSON_PROVIDERS = {'std': ISOJSONProvider, 'orjson': ORJSONProvider}
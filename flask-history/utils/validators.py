@@ -1,6 +1,7 @@
 from flask import request, jsonify
 from datetime import datetime
 from functools import wraps
+from utils.cursor import decode_cursor
 
 def validate_user_id():
     """
@@ -26,6 +27,94 @@ def validate_user_id():
             'message': 'user_id must be a valid integer'
         }), 400
 
+MAX_BATCH_USER_IDS = 100
+
+# Largest page of transactions one request may ask for
+MAX_PAGE_SIZE = 1000
+
+def validate_user_ids():
+    """
+    Validate a batch of user IDs from request
+    
+    Accepts a comma-separated user_ids parameter and falls back to user_id.
+    
+    Returns:
+        list: Valid user IDs
+        tuple: Error response if validation fails
+    """
+    raw = request.args.get('user_ids')
+    if not raw:
+        user_id = validate_user_id()
+        if isinstance(user_id, tuple):  # Error response
+            return user_id
+        return [user_id]
+    
+    try:
+        user_ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': 'user_ids must be a comma-separated list of integers'
+        }), 400
+    
+    if not user_ids:
+        return jsonify({
+            'error': 'Missing required parameter',
+            'message': 'user_ids is required'
+        }), 400
+    
+    if len(user_ids) > MAX_BATCH_USER_IDS:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': f'At most {MAX_BATCH_USER_IDS} user_ids can be requested at once'
+        }), 400
+    
+    return user_ids
+
+def validate_choice(name, choices, default=None):
+    """
+    Validate an optional parameter that must be one of a fixed set of values
+    
+    Returns:
+        str: The chosen value (or default)
+        tuple: Error response if validation fails
+    """
+    value = request.args.get(name, default)
+    if value is not None and value not in choices:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': f"{name} must be one of: {', '.join(choices)}"
+        }), 400
+    return value
+
+def validate_int(name, default, minimum=1, maximum=None):
+    """
+    Validate an optional integer parameter within [minimum, maximum]
+    
+    Returns:
+        int: The value (or default)
+        tuple: Error response if validation fails
+    """
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    
+    try:
+        value = int(value)
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': f'{name} must be a valid integer'
+        }), 400
+    
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f'between {minimum} and {maximum}' if maximum is not None else f'at least {minimum}'
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': f'{name} must be {bounds}'
+        }), 400
+    return value
+
 def validate_date_range():
     """
     Validate date range parameters from request
@@ -51,6 +140,26 @@ def validate_date_range():
             'message': 'Dates should be in ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)'
         }), 400
 
+def validate_cursor():
+    """
+    Validate the optional keyset pagination cursor from request
+    
+    Returns:
+        tuple: (date, transaction_id) of the last row already seen, or None
+        tuple: Error response if validation fails
+    """
+    cursor = request.args.get('cursor')
+    if not cursor:
+        return None
+    
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        return jsonify({
+            'error': 'Invalid parameter',
+            'message': 'cursor is not valid'
+        }), 400
+
 def handle_errors(f):
     """
     Decorator to handle common database and application errors